@@ -0,0 +1,6 @@
+"""
+Offline benchmark suite for the EDA / training pipelines.
+
+    python -m benchmarks.run --quick --out bench/head.json
+    python -m benchmarks.compare bench/base.json bench/head.json --threshold 0.15
+"""
@@ -0,0 +1,63 @@
+import argparse
+import json
+import sys
+
+# Compare two `benchmarks.run` result files case by case:
+#
+#     python -m benchmarks.compare base.json head.json --threshold 0.15
+#
+# A case regresses when it got slower (or its peak memory grew) by more than
+# `threshold` relative to the base. Tiny absolute changes are ignored via the
+# --min-seconds / --min-mb floors, so timer noise on millisecond stages
+# doesn't fail CI. Exit status is 1 when anything regressed.
+
+METRICS = (('seconds', 'min_seconds'), ('peak_rss_mb', 'min_mb'))
+
+
+def load(path):
+    with open(path) as fh:
+        return {r['key']: r for r in json.load(fh)['results']}
+
+
+def compare(base, head, threshold=0.10, min_seconds=0.05, min_mb=5.0):
+    """Returns (rows, regressions); each row is (key, metric, base, head, change)."""
+    floors = {'min_seconds': min_seconds, 'min_mb': min_mb}
+    rows, regressions = [], []
+    for key in sorted(base.keys() & head.keys()):
+        for metric, floor in METRICS:
+            old, new = base[key].get(metric), head[key].get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            row = (key, metric, old, new, change)
+            rows.append(row)
+            if change > threshold and new - old > floors[floor]:
+                regressions.append(row)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative slowdown (0.10 = 10%%)')
+    parser.add_argument('--min-seconds', type=float, default=0.05)
+    parser.add_argument('--min-mb', type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    base, head = load(args.base), load(args.head)
+    rows, regressions = compare(base, head, args.threshold, args.min_seconds, args.min_mb)
+
+    print(f"{'case':<48} {'metric':<12} {'base':>10} {'head':>10} {'change':>8}")
+    for key, metric, old, new, change in rows:
+        flag = '  << REGRESSION' if (key, metric, old, new, change) in regressions else ''
+        print(f"{key:<48} {metric:<12} {old:>10} {new:>10} {change:>+8.1%}{flag}")
+    for key in sorted(base.keys() - head.keys()):
+        print(f"{key:<48} missing from head")
+
+    print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import numpy as np
+import polars as pl
+
+# Synthetic sales extracts shaped like real uploads: a `date`, product
+# name/type, a `sales` target that depends on a few of the features, and
+# the remaining width filled with numeric and (every fourth) string columns.
+
+SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+WIDTHS = (5, 20, 80)
+
+_FIXED = ('date', 'product_name', 'product_type', 'sales')
+
+
+def parse_size(label):
+    label = label.lower()
+    return SIZES[label] if label in SIZES else int(label)
+
+
+def make_sales_frame(rows: int, cols: int, seed: int = 0) -> pl.DataFrame:
+    """`rows` x `cols` synthetic dataset (cols >= 4), deterministic for a seed."""
+    if cols < len(_FIXED):
+        raise ValueError(f"need at least {len(_FIXED)} columns")
+    rng = np.random.default_rng(seed)
+
+    days = rng.integers(0, 730, rows)
+    dates = (np.datetime64('2023-01-01') + days).astype('datetime64[D]').astype(str)
+    products = rng.integers(0, 200, rows)
+    data = {
+        'date': dates,
+        'product_name': np.char.add('product_', products.astype(str)),
+        'product_type': np.array(['grocery', 'electronics', 'apparel', 'home', 'toys'])[products % 5],
+    }
+
+    signal = (products % 5) * 10.0 + np.sin(days / 58.0) * 20.0
+    for i in range(cols - len(_FIXED)):
+        if i % 4 == 3:
+            data[f'segment_{i}'] = np.char.add('s', rng.integers(0, 12, rows).astype(str))
+        else:
+            feature = rng.normal(size=rows)
+            data[f'feature_{i}'] = feature
+            if i < 4:
+                signal += (i + 1) * 5.0 * feature
+
+    data['sales'] = np.round(100.0 + signal + rng.normal(scale=5.0, size=rows), 2)
+    return pl.DataFrame(data)
@@ -0,0 +1,220 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Run with the backend directory as CWD:  python -m benchmarks.run --quick
+#
+# Every case runs in this process. Peak memory is the highest RSS seen by a
+# 5 ms sampling thread while the stage runs, minus the RSS just before it
+# (prediction.profiling.PeakRSS), so native (Polars / NumPy / torch)
+# allocations are counted too.
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sales_predictor.settings')
+
+MODELS = ('linear_regression', 'random_forest', 'decision_tree', 'xgboost', 'lightgbm', 'pytorch_nn')
+STAGES = ('ingest', 'eda_stats', 'eda_sketch', 'eda_graphs', 'train', 'process_and_predict', 'sanitize')
+QUICK = {'sizes': ['1k', '10k'], 'widths': [5, 20]}
+
+
+def measure(fn, repeat):
+    """Median wall time, max peak-RSS growth and the last return value of `fn()`."""
+    from prediction.profiling import PeakRSS
+
+    times, peaks, value = [], [], None
+    for _ in range(repeat):
+        gc.collect()
+        with PeakRSS() as mem:
+            start = time.perf_counter()
+            value = fn()
+            times.append(time.perf_counter() - start)
+        peaks.append(mem.delta_mb)
+    return round(statistics.median(times), 4), max(peaks, key=lambda mb: mb or 0.0), value
+
+
+# ─── STAGES ─────────────────────────────────────────────────
+
+def bench_ingest(frame, workdir):
+    from prediction.ingest import read_upload
+    from prediction.models import MAX_TRAINING_ROWS
+
+    path = os.path.join(workdir, f"{frame.height}x{frame.width}.csv")
+    if not os.path.exists(path):
+        frame.write_csv(path)
+    return lambda: read_upload(path, sample_rows=MAX_TRAINING_ROWS)
+
+
+def bench_eda_stats(frame, workdir):
+    from prediction.eda import eda_statistics, prepare_eda_frame
+
+    df, _ = prepare_eda_frame(frame)
+    return lambda: eda_statistics(df)
+
+
+def bench_eda_sketch(frame, workdir):
+    """Approximate-mode statistics: sketch every row of the CSV, then read the stats off it."""
+    from prediction.sketches import sketch_upload
+
+    path = os.path.join(workdir, f"{frame.height}x{frame.width}.csv")
+    if not os.path.exists(path):
+        frame.write_csv(path)
+    return lambda: sketch_upload(path, digest=None)[0].statistics()
+
+
+def bench_eda_graphs(frame, workdir):
+    from prediction.eda import generate_graphs, infer_product_columns, prepare_eda_frame
+
+    df, _ = prepare_eda_frame(frame)
+    name_col, type_col = infer_product_columns(df)
+    df_pd = df.to_pandas()
+    return lambda: generate_graphs(df_pd, name_col, type_col)
+
+
+def bench_process_and_predict(frame, workdir):
+    from prediction.utils import process_and_predict
+
+    df_pd = frame.to_pandas()
+    return lambda: process_and_predict(df_pd.copy())
+
+
+def bench_sanitize(frame, workdir):
+    """Sanitize + render a large EDA-shaped payload, as a response would be."""
+    from prediction.serialization import ORJSONRenderer, sanitize_for_json
+
+    payload = {
+        'example_rows': frame.head(10_000).to_pandas().to_dict(orient='records'),
+        'descriptive_stats': frame.to_pandas().describe(include='all').to_dict(),
+    }
+    renderer = ORJSONRenderer()
+    return lambda: renderer.render(sanitize_for_json(payload))
+
+
+def run_train(frame, model_name, repeat, diagnostics='full'):
+    """Time the whole pipeline plus each of its traced stages (prediction.profiling)."""
+    from prediction.models import train_model_pipeline
+    from prediction.profiling import Trace
+
+    substages = {}
+
+    def run():
+        trace = Trace(f"bench:{model_name}")
+        try:
+            train_model_pipeline(frame, model_name, trace=trace, diagnostics=diagnostics)
+        finally:
+            trace.finish()
+        for entry in trace.stages:
+            substages.setdefault(entry['name'], []).append(entry['wall_s'])
+
+    seconds, peak_mb, _ = measure(run, repeat)
+    return seconds, peak_mb, {k: round(statistics.median(v), 4) for k, v in substages.items()}
+
+
+STAGE_FACTORIES = {
+    'ingest': bench_ingest,
+    'eda_stats': bench_eda_stats,
+    'eda_sketch': bench_eda_sketch,
+    'eda_graphs': bench_eda_graphs,
+    'process_and_predict': bench_process_and_predict,
+    'sanitize': bench_sanitize,
+}
+
+
+# ─── DRIVER ─────────────────────────────────────────────────
+
+def case_key(stage, rows, cols, model=None):
+    return f"{stage}:{model or '-'}:{rows}x{cols}"
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=False).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_suite(sizes, widths, stages, models, repeat, seed=0, log=print, diagnostics='full'):
+    from .datasets import make_sales_frame, parse_size
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='revenue-bench-') as workdir:
+        for size in sizes:
+            rows = parse_size(size)
+            for cols in widths:
+                frame = make_sales_frame(rows, cols, seed)
+                for stage in stages:
+                    for model in (models if stage == 'train' else (None,)):
+                        record = {'key': case_key(stage, rows, cols, model), 'stage': stage,
+                                  'rows': rows, 'cols': cols, 'model': model}
+                        try:
+                            if stage == 'train':
+                                seconds, peak_mb, substages = run_train(frame, model, repeat, diagnostics)
+                                record['substages'] = substages
+                            else:
+                                seconds, peak_mb, _ = measure(STAGE_FACTORIES[stage](frame, workdir), repeat)
+                            record.update(seconds=seconds, peak_rss_mb=peak_mb)
+                        except Exception as e:  # keep going; record the failure
+                            record['error'] = f"{type(e).__name__}: {e}"
+                        log(json.dumps(record))
+                        results.append(record)
+                del frame
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the EDA and training pipelines.')
+    parser.add_argument('--sizes', default='1k,10k,100k,1m', help='row counts: 1k,10k,100k,1m or integers')
+    parser.add_argument('--widths', default='5,20,80', help='column counts')
+    parser.add_argument('--stages', default=','.join(STAGES))
+    parser.add_argument('--models', default=','.join(MODELS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--diagnostics', default='full', choices=('fast', 'standard', 'full'),
+                        help='training diagnostics tier')
+    parser.add_argument('--quick', action='store_true', help='1k/10k rows x 5/20 columns')
+    parser.add_argument('--out', help='write results JSON here (default: stdout only)')
+    args = parser.parse_args(argv)
+
+    import django
+    django.setup()
+    import matplotlib
+    matplotlib.use('Agg')
+
+    sizes = QUICK['sizes'] if args.quick else args.sizes.split(',')
+    widths = QUICK['widths'] if args.quick else [int(w) for w in args.widths.split(',')]
+    stages = args.stages.split(',')
+    models = args.models.split(',')
+    unknown = set(stages) - set(STAGES) | set(models) - set(MODELS)
+    if unknown:
+        parser.error(f"unknown stage/model: {', '.join(sorted(unknown))}")
+
+    report = {
+        'environment': environment(),
+        'config': {'sizes': sizes, 'widths': widths, 'stages': stages, 'models': models, 'repeat': args.repeat,
+                   'diagnostics': args.diagnostics},
+        'results': run_suite(sizes, widths, stages, models, args.repeat,
+                             log=lambda line: print(line, file=sys.stderr), diagnostics=args.diagnostics),
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w') as fh:
+            json.dump(report, fh, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
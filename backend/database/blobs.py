@@ -0,0 +1,138 @@
+import base64
+import hashlib
+import os
+import uuid
+from functools import lru_cache
+from django.conf import settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+# Graph images live in a content-addressed blob store instead of inside the
+# SavedResult JSON. The JSON keeps a small reference per graph:
+#
+#     {"blob": "<sha256>", "url": "/api/blobs/<sha256>/"}
+#
+# Identical PNGs (same plot re-rendered for another model or upload) are
+# stored once. Older rows may still hold raw base64 strings, and results
+# requested with charts='json' hold chart data instead of images;
+# resolve_graph() accepts all three.
+
+
+class FileSystemBlobStore:
+    """Stores blobs under `root/<2-char prefix>/<sha256>`."""
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+            with open(tmp_path, 'wb') as out:
+                out.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def exists(self, digest) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def size(self, digest) -> int:
+        return os.path.getsize(self._path(digest))
+
+    def open(self, digest):
+        return open(self._path(digest), 'rb')
+
+    def get(self, digest) -> bytes:
+        with self.open(digest) as fh:
+            return fh.read()
+
+    def delete(self, digest):
+        try:
+            os.remove(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+
+@lru_cache(maxsize=None)
+def _store_for(backend, options):
+    return import_string(backend)(**dict(options))
+
+
+def get_blob_store():
+    return _store_for(settings.BLOB_STORE_BACKEND, tuple(sorted(settings.BLOB_STORE_OPTIONS.items())))
+
+
+def get_artifact_store():
+    """Store for pickled model bundles – kept apart from the graph blobs that blob_view serves publicly."""
+    return _store_for(settings.ARTIFACT_STORE_BACKEND, tuple(sorted(settings.ARTIFACT_STORE_OPTIONS.items())))
+
+
+def is_valid_digest(digest) -> bool:
+    return isinstance(digest, str) and len(digest) == 64 and all(c in '0123456789abcdef' for c in digest)
+
+
+# ─── GRAPH REFERENCES ───────────────────────────────────────
+
+def graph_ref(digest):
+    return {"blob": digest, "url": reverse('blob', args=[digest])}
+
+
+def store_graph(value):
+    """base64 PNG → blob reference; references and None pass through."""
+    if not isinstance(value, str) or not value:
+        return value
+    return graph_ref(get_blob_store().put(base64.b64decode(value)))
+
+
+def resolve_graph(value) -> bytes:
+    """
+    Raw PNG bytes for a stored graph, whether it is a reference, legacy
+    base64 or chart data (prediction.charts, rasterized here for exports).
+    """
+    if isinstance(value, dict) and "blob" not in value:
+        from prediction.charts import chart_png
+        return chart_png(value)
+    if isinstance(value, dict):
+        return get_blob_store().get(value["blob"])
+    return base64.b64decode(value)
+
+
+def externalize_graphs(result):
+    """
+    Move every graph in an EDA or model payload into the blob store,
+    returning a copy whose JSON only holds references.
+    """
+    if not isinstance(result, dict):
+        return result
+
+    result = dict(result)
+    for key in ("graphs", "diagnostic_graphs"):
+        if isinstance(result.get(key), dict):
+            result[key] = {name: store_graph(img) for name, img in result[key].items()}
+
+    if isinstance(result.get("forecast_plot_base64"), str):
+        result["forecast_plot"] = store_graph(result["forecast_plot_base64"])
+        result["forecast_plot_base64"] = None
+    return result
+
+
+def collect_graphs(eda_result, model_result):
+    """{name: stored graph} across an EDA and a model payload, as used by exports."""
+    graphs = {}
+    graphs.update((eda_result or {}).get("graphs", {}))
+
+    model_result = model_result or {}
+    if "graphs" in model_result:
+        graphs.update(model_result["graphs"])
+    if "diagnostic_graphs" in model_result:
+        graphs.update(model_result["diagnostic_graphs"])
+    if model_result.get("forecast_plot"):
+        graphs["forecast_plot"] = model_result["forecast_plot"]
+    elif model_result.get("forecast_plot_base64"):
+        graphs["forecast_plot"] = model_result["forecast_plot_base64"]
+    return graphs
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from database.blobs import externalize_graphs
+from database.models import SavedResult
+
+
+class Command(BaseCommand):
+    help = "Move base64 graphs still embedded in SavedResult JSON into the blob store."
+
+    def handle(self, *args, **options):
+        updated = 0
+        for obj in SavedResult.objects.iterator(chunk_size=50):
+            eda_result = externalize_graphs(obj.eda_result)
+            model_result = externalize_graphs(obj.model_result)
+            if eda_result != obj.eda_result or model_result != obj.model_result:
+                obj.eda_result = eda_result
+                obj.model_result = model_result
+                obj.save(update_fields=['eda_result', 'model_result'])
+                updated += 1
+        self.stdout.write(f"Externalized graphs for {updated} saved result(s).")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0011_trainingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='dataset_digest',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0012_trainingjob_dataset_digest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='savedresult',
+            index=models.Index(fields=['owner', '-uploaded_at', '-id'], name='savedresult_owner_recent'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0013_savedresult_owner_recent_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainedModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=100)),
+                ('artifact', models.CharField(max_length=64)),
+                ('size_bytes', models.PositiveBigIntegerField(default=0)),
+                ('target_column', models.CharField(blank=True, max_length=255)),
+                ('features', models.JSONField(blank=True, default=list)),
+                ('pipeline_version', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('saved_result', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trained_model', to='database.savedresult')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0014_trainedmodel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='trace',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
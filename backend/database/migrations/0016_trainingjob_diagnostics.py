@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0015_trainingjob_trace'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='diagnostics',
+            field=models.CharField(default='standard', max_length=16),
+        ),
+    ]
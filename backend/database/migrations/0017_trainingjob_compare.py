@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0016_trainingjob_diagnostics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='kind',
+            field=models.CharField(choices=[('train', 'Train one model'), ('compare', 'Compare models')], default='train', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='trainingjob',
+            name='leaderboard',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainingjob',
+            name='model_names',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
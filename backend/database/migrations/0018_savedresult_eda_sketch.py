@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0017_trainingjob_compare'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedresult',
+            name='eda_sketch',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0018_savedresult_eda_sketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='sampling',
+            field=models.CharField(default='uniform', max_length=16),
+        ),
+    ]
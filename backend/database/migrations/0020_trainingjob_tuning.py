@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0019_trainingjob_sampling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='budget_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='trainingjob',
+            name='kind',
+            field=models.CharField(choices=[('train', 'Train one model'), ('compare', 'Compare models'), ('tune', 'Tune hyperparameters')], default='train', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0020_trainingjob_tuning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='charts',
+            field=models.CharField(default='png', max_length=8),
+        ),
+    ]
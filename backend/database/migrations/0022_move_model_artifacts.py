@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def move_artifacts(apps, schema_editor):
+    """Move pickled model bundles out of the public graph blob store into the artifact store."""
+    from database.blobs import get_artifact_store, get_blob_store
+
+    TrainedModel = apps.get_model('database', 'TrainedModel')
+    blobs, artifacts = get_blob_store(), get_artifact_store()
+    for digest in TrainedModel.objects.values_list('artifact', flat=True).distinct():
+        if not blobs.exists(digest):
+            continue
+        if not artifacts.exists(digest):
+            artifacts.put(blobs.get(digest))
+        blobs.delete(digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0021_trainingjob_charts'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_artifacts, migrations.RunPython.noop),
+    ]
@@ -15,6 +15,9 @@ class SavedResult(models.Model):
     model_result    = models.JSONField(default=dict, blank=True)
     model_name      = models.CharField(max_length=100, blank=True, null=True, default="")
     notes           = models.TextField(blank=True)
+    # Mergeable EDA statistics for the last upload (prediction.sketches);
+    # internal – never serialized to clients.
+    eda_sketch      = models.JSONField(null=True, blank=True)
 
     class Meta:
         constraints = [
@@ -24,10 +27,90 @@ class SavedResult(models.Model):
             )
         ]
         ordering = ['-uploaded_at']
+        indexes = [
+            # keyset pagination of an owner's history (see get_saved_results)
+            models.Index(fields=['owner', '-uploaded_at', '-id'], name='savedresult_owner_recent'),
+        ]
 
     def __str__(self):
         return f"{self.file_name} ({self.owner.username}) – {self.uploaded_at:%Y‑%m‑%d}"
 
+class TrainingJob(models.Model):
+    STATUS_QUEUED  = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE    = 'done'
+    STATUS_FAILED  = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    KIND_TRAIN   = 'train'
+    KIND_COMPARE = 'compare'
+    KIND_TUNE    = 'tune'
+    KIND_CHOICES = [
+        (KIND_TRAIN, 'Train one model'),
+        (KIND_COMPARE, 'Compare models'),
+        (KIND_TUNE, 'Tune hyperparameters'),
+    ]
+
+    owner           = models.ForeignKey(
+                        settings.AUTH_USER_MODEL,
+                        on_delete=models.CASCADE,
+                        related_name='training_jobs'
+                      )
+    file_name       = models.CharField(max_length=255)
+    kind            = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_TRAIN)
+    model_name      = models.CharField(max_length=100)
+    model_names     = models.JSONField(default=list, blank=True)  # compare jobs: models to fit; tune: the family
+    budget_seconds  = models.PositiveIntegerField(blank=True, null=True)  # tune jobs: wall-clock budget
+    diagnostics     = models.CharField(max_length=16, default='standard')  # prediction.models.DIAGNOSTICS_TIERS
+    sampling        = models.CharField(max_length=16, default='uniform')  # prediction.sampling.SAMPLING_STRATEGIES
+    charts          = models.CharField(max_length=8, default='png')  # prediction.charts.CHART_FORMATS
+    upload_path     = models.CharField(max_length=500)
+    dataset_digest  = models.CharField(max_length=64, blank=True, db_index=True)
+    status          = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    progress        = models.PositiveSmallIntegerField(default=0)
+    stage           = models.CharField(max_length=100, blank=True)
+    error           = models.TextField(blank=True)
+    trace           = models.JSONField(blank=True, null=True)  # prediction.profiling stage timings
+    leaderboard     = models.JSONField(blank=True, null=True)  # compare jobs: one row per model
+    saved_result    = models.ForeignKey(
+                        SavedResult,
+                        on_delete=models.SET_NULL,
+                        related_name='training_jobs',
+                        blank=True,
+                        null=True
+                      )
+    created_at      = models.DateTimeField(auto_now_add=True)
+    started_at      = models.DateTimeField(blank=True, null=True)
+    finished_at     = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.model_name} on {self.file_name} ({self.status})"
+
+class TrainedModel(models.Model):
+    """A fitted estimator (see prediction.registry) kept for scoring new data."""
+    saved_result     = models.OneToOneField(
+                         SavedResult,
+                         on_delete=models.CASCADE,
+                         related_name='trained_model'
+                       )
+    model_name       = models.CharField(max_length=100)
+    artifact         = models.CharField(max_length=64)  # artifact store digest
+    size_bytes       = models.PositiveBigIntegerField(default=0)
+    target_column    = models.CharField(max_length=255, blank=True)
+    features         = models.JSONField(default=list, blank=True)
+    pipeline_version = models.PositiveIntegerField(default=0)
+    created_at       = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.model_name} for {self.saved_result.file_name}"
+
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
@@ -3,7 +3,11 @@ from rest_framework.test import APITestCase, APIClient
 from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework import status
+from django.test import override_settings
 from .models import SavedResult, ContactMessage
+from .blobs import externalize_graphs
+import tempfile
+import base64
 import json
 
 # Create your tests here.
@@ -38,10 +42,37 @@ class SavedResultTests(APITestCase):
                 data_shape="(1,1)"
             )
         url = reverse('get-saved-results')  # -> /api/saved-results/
-        resp = self.client.get(url + "?page=1&page_size=10")
+        resp = self.client.get(url + "?page_size=10")
         self.assertEqual(resp.status_code, 200)
-        self.assertEqual(len(resp.json()['results']), 10)
-        self.assertEqual(resp.json()['current_page'], 1)
+        first = resp.json()
+        self.assertEqual(len(first['results']), 10)
+        self.assertNotIn('result_json', first['results'][0])  # summary projection
+        self.assertTrue(first['next_cursor'])
+
+        resp = self.client.get(url, {"page_size": 10, "cursor": first['next_cursor']})
+        second = resp.json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next_cursor'])
+        ids = [r['id'] for r in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 15)
+
+        self.assertEqual(self.client.get(url, {"cursor": "garbage"}).status_code, 400)
+
+    def test_saved_result_detail(self):
+        obj = SavedResult.objects.create(
+            owner=self.user,
+            file_name="d.csv",
+            data_shape="(1,1)",
+            model_result={"rmse": 0.5},
+        )
+        resp = self.client.get(reverse('saved-result-detail', args=[obj.id]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['result_json']['model_result'], {"rmse": 0.5})
+
+        other = User.objects.create_user(username="other", password="pw")
+        self.client.force_authenticate(other)
+        resp = self.client.get(reverse('saved-result-detail', args=[obj.id]))
+        self.assertEqual(resp.status_code, 404)
 
     def test_edit_saved_result(self):
         obj = SavedResult.objects.create(
@@ -88,6 +119,62 @@ class SavedResultTests(APITestCase):
         self.assertIn('model_result', resp.json())
 
 
+@override_settings(BLOB_STORE_OPTIONS={'root': tempfile.mkdtemp(prefix='blobs-test-')})
+class GraphBlobTests(APITestCase):
+    PNG = b"\x89PNG\r\n\x1a\nfake-image-bytes"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="blobber", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_externalize_graphs_dedups_and_serves_png(self):
+        b64 = base64.b64encode(self.PNG).decode()
+        payload = externalize_graphs({
+            "rmse": 1.0,
+            "diagnostic_graphs": {"residuals_plot": b64, "error_histogram": b64},
+            "forecast_plot_base64": b64,
+        })
+
+        refs = payload["diagnostic_graphs"]
+        self.assertEqual(refs["residuals_plot"], refs["error_histogram"])  # stored once
+        self.assertIsNone(payload["forecast_plot_base64"])
+        self.assertEqual(payload["forecast_plot"], refs["residuals_plot"])
+
+        self.client.logout()  # <img> tags load blobs without a token
+        resp = self.client.get(refs["residuals_plot"]["url"])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(b"".join(resp.streaming_content), self.PNG)
+        self.assertEqual(self.client.get(reverse('blob', args=["0" * 64])).status_code, 404)
+
+    def test_png_download_resolves_blob_references(self):
+        obj = SavedResult.objects.create(
+            owner=self.user,
+            file_name="g.csv",
+            data_shape="(1,1)",
+            model_result=externalize_graphs({"diagnostic_graphs": {
+                "residuals_plot": base64.b64encode(self.PNG).decode()
+            }}),
+        )
+        resp = self.client.get(f"/api/saved-results/download/{obj.id}/png/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, self.PNG)
+
+    def test_png_download_rasterizes_chart_data(self):
+        obj = SavedResult.objects.create(
+            owner=self.user,
+            file_name="c.csv",
+            data_shape="(3,1)",
+            model_result={"diagnostic_graphs": {"error_histogram": {
+                "type": "histogram", "title": "Errors",
+                "series": [{"name": "residuals", "edges": [0, 1, 2], "counts": [3, 1]}],
+            }}},
+        )
+        resp = self.client.get(f"/api/saved-results/download/{obj.id}/png/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.content.startswith(b"\x89PNG"))
+
+
 class ContactMessageTests(APITestCase):
     def test_save_contact_form(self):
         url = reverse('contact-form')  # -> /api/contact/
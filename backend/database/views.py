@@ -1,13 +1,17 @@
-import base64
 import io
+import base64
 import zipfile
+from datetime import datetime
 from django.shortcuts import render
-from django.core.paginator import Paginator
+from django.db.models import Q
 from django.http import FileResponse, JsonResponse, HttpResponse
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from .models import SavedResult, ContactMessage
+from .blobs import (
+    get_blob_store, is_valid_digest, externalize_graphs, collect_graphs, resolve_graph,
+)
 import polars as pl
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as XLImage
@@ -103,19 +107,7 @@ def download_saved_result(request, pk, file_type='json'):
             row += 1
 
         # Handle graph images (EDA + Model)
-        graphs = {}
-
-        # Include EDA graphs
-        graphs.update(combined_json.get("eda_result", {}).get("graphs", {}))
-
-        # Include model visualizations
-        model_result = combined_json.get("model_result", {})
-        if "graphs" in model_result:
-            graphs.update(model_result["graphs"])
-        if "diagnostic_graphs" in model_result:
-            graphs.update(model_result["diagnostic_graphs"])
-        if model_result.get("forecast_plot_base64"):
-            graphs["forecast_plot"] = model_result["forecast_plot_base64"]
+        graphs = collect_graphs(combined_json["eda_result"], combined_json["model_result"])
 
         if graphs:
             ws = wb.create_sheet("Graphs")
@@ -125,9 +117,9 @@ def download_saved_result(request, pk, file_type='json'):
             ws.cell(row=row, column=1, value="Graph Visualizations")
             row += 2
 
-            for name, b64 in graphs.items():
+            for name, stored in graphs.items():
                 try:
-                    img_data = base64.b64decode(b64)
+                    img_data = resolve_graph(stored)
                     pil_img = PILImage.open(io.BytesIO(img_data)).convert("RGB")
 
                     img_buffer = io.BytesIO()
@@ -156,25 +148,16 @@ def download_saved_result(request, pk, file_type='json'):
 
     # ─── Graph export (PNG or ZIP) ──────────
     if file_type == 'png':
-        graphs = {}
-        graphs.update(combined_json.get("eda_result", {}).get("graphs", {}))
-
-        model_result = combined_json.get("model_result", {})
-        if "graphs" in model_result:
-            graphs.update(model_result["graphs"])
-        if "diagnostic_graphs" in model_result:
-            graphs.update(model_result["diagnostic_graphs"])
-        if model_result.get("forecast_plot_base64"):
-            graphs["forecast_plot"] = model_result["forecast_plot_base64"]
+        graphs = collect_graphs(combined_json["eda_result"], combined_json["model_result"])
 
         if not graphs:
             return Response({"error": "No graphs available for PNG export"}, status=400)
 
         # Single graph → return one PNG
         if len(graphs) == 1:
-            name, b64 = list(graphs.items())[0]
+            name, stored = list(graphs.items())[0]
             try:
-                image_data = base64.b64decode(b64)
+                image_data = resolve_graph(stored)
                 return HttpResponse(
                     image_data,
                     content_type="image/png",
@@ -188,9 +171,9 @@ def download_saved_result(request, pk, file_type='json'):
         # Multiple graphs → return ZIP
         zip_buffer = io.BytesIO()
         with zipfile.ZipFile(zip_buffer, "w") as zipf:
-            for name, b64 in graphs.items():
+            for name, stored in graphs.items():
                 try:
-                    img_data = base64.b64decode(b64)
+                    img_data = resolve_graph(stored)
                     zipf.writestr(f"{name}.png", img_data)
                 except Exception:
                     continue
@@ -201,40 +184,118 @@ def download_saved_result(request, pk, file_type='json'):
     return JsonResponse(
         {"error": "Invalid file_type, use 'json', 'csv', 'xlsx', or 'png'."}, status=400)
 
+# ─── Graph blobs ─────────────────────────────────────────────
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def blob_view(request, digest):
+    """
+    Serve a stored graph PNG. The SHA-256 in the URL is the capability
+    (it is only handed out inside the owner's results), which lets plain
+    <img> tags load it without an Authorization header.
+    """
+    store = get_blob_store()
+    if not is_valid_digest(digest) or not store.exists(digest):
+        return Response({'error': 'Not found'}, status=404)
+
+    response = FileResponse(store.open(digest), content_type='image/png')
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+
+# ─── Saved results: list (summary) + detail ─────────────────
+# The history list only needs a handful of columns, so by default the
+# heavy eda_result / model_result JSON is never selected. Pages are keyset
+# paginated on (uploaded_at, id) – no COUNT(*) and no OFFSET scan, which
+# matters for owners with thousands of rows.
+
+SUMMARY_FIELDS = (
+    'id', 'file_name', 'inferred_target', 'data_shape',
+    'model_name', 'notes', 'uploaded_at',
+)
+MAX_PAGE_SIZE = 100
+
+
+def _encode_cursor(obj):
+    raw = json.dumps([obj.uploaded_at.isoformat(), obj.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    uploaded_at, pk = json.loads(raw)
+    return datetime.fromisoformat(uploaded_at), int(pk)
+
+
+def _summary(r):
+    return {
+        "id":             r.id,
+        "file_name":      r.file_name,
+        "inferred_target": r.inferred_target,
+        "data_shape":     r.data_shape,
+        "model_name": r.model_name,
+        "notes":      r.notes,
+        "created_at": r.uploaded_at.isoformat(),
+    }
+
+
+def _detail(r):
+    return {
+        **_summary(r),
+        "result_json": {
+            "eda_result":   r.eda_result or {},
+            "model_result": r.model_result or {},
+        },
+    }
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_saved_results(request):
-    page_size = int(request.GET.get('page_size', 10))
-    page = int(request.GET.get('page', 1))
-
-    qs = SavedResult.objects.filter(
-        owner=request.user).order_by('-uploaded_at')
-    paginator = Paginator(qs, page_size)
-    page_obj = paginator.page(page)
-
-    data = []
-    for r in page_obj.object_list:
-        data.append({
-            "id":             r.id,
-            "file_name":      r.file_name,
-            "inferred_target": r.inferred_target,
-            "data_shape":     r.data_shape,
-            "result_json": {
-                "eda_result":   r.eda_result or {},
-                "model_result": r.model_result or {},
-            },
-            "model_name": r.model_name,
-            "notes":      r.notes,
-            "created_at": r.uploaded_at.isoformat(),
-        })
-
+    """
+    ?page_size=N (≤ 100) &cursor=<next_cursor from the previous page>
+    &view=full to include result_json (off by default).
+    """
+    try:
+        page_size = min(max(int(request.GET.get('page_size', 10)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'page_size must be an integer'}, status=400)
+    full = request.GET.get('view') == 'full'
+
+    qs = SavedResult.objects.filter(owner=request.user).order_by('-uploaded_at', '-id')
+    if not full:
+        qs = qs.only(*SUMMARY_FIELDS)
+    else:
+        qs = qs.defer('eda_sketch')
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            uploaded_at, pk = _decode_cursor(cursor)
+        except (ValueError, TypeError):
+            return Response({'error': 'Invalid cursor'}, status=400)
+        qs = qs.filter(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=pk))
+
+    # One extra row tells us whether there is a next page.
+    rows = list(qs[:page_size + 1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    serialize = _detail if full else _summary
     return JsonResponse({
-        "results":      data,
-        "total_pages":  paginator.num_pages,
-        "current_page": page
+        "results":     [serialize(r) for r in rows],
+        "next_cursor": _encode_cursor(rows[-1]) if has_next else None,
     }, safe=False)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def saved_result_detail(request, pk):
+    obj = SavedResult.objects.filter(pk=pk, owner=request.user).first()
+    if not obj:
+        return Response({'error': 'Not found or not yours'}, status=404)
+    return JsonResponse(_detail(obj))
+
+
 @api_view(['POST'])
 def save_result_view(request):
     try:
@@ -247,6 +308,7 @@ def save_result_view(request):
 
         if isinstance(result_json, str):
             result_json = json.loads(result_json)
+        result_json = externalize_graphs(result_json)
 
         # Decide EDA vs Model payload
         eda_payload = {}
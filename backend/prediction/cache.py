@@ -0,0 +1,69 @@
+import os
+import diskcache
+from django.conf import settings
+
+# Content-addressed cache of training results. Keys are derived from the
+# SHA-256 of the uploaded bytes, the model name and PIPELINE_VERSION, so a
+# repeat upload of the same file short-circuits the whole pipeline. Entries
+# are tagged with the dataset digest for per-dataset invalidation; diskcache
+# enforces the size limit with least-recently-used eviction and is safe to
+# share between the web process and the training workers.
+
+_cache = None
+_cache_pid = None
+
+
+def get_result_cache():
+    global _cache, _cache_pid
+    # SQLite handles must not cross a fork, so open one per process.
+    if (_cache is None or _cache_pid != os.getpid()
+            or _cache.directory != settings.RESULT_CACHE_DIR):
+        _cache = diskcache.Cache(
+            settings.RESULT_CACHE_DIR,
+            size_limit=settings.RESULT_CACHE_MAX_BYTES,
+            eviction_policy='least-recently-used',
+            tag_index=True,
+        )
+        _cache_pid = os.getpid()
+    return _cache
+
+
+def result_cache_key(digest, model_name, **options):
+    from .models import PIPELINE_VERSION
+
+    extra = ''.join(f":{k}={options[k]}" for k in sorted(options))
+    return f"train:v{PIPELINE_VERSION}:{model_name}{extra}:{digest}"
+
+
+def get_cached_result(digest, model_name, **options):
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    return get_result_cache().get(result_cache_key(digest, model_name, **options))
+
+
+def cache_result(digest, model_name, result, **options):
+    if not settings.RESULT_CACHE_ENABLED:
+        return
+    get_result_cache().set(result_cache_key(digest, model_name, **options), result, tag=digest)
+
+
+def invalidate_results(digest=None, model_name=None, **options):
+    """
+    Drop cached results: one (digest, model) entry (every diagnostics tier,
+    sampling strategy and chart format unless they are given), every model
+    for a digest, or – with no arguments – the whole cache. Returns the count.
+    """
+    from .charts import CHART_FORMATS
+    from .models import DIAGNOSTICS_TIERS
+    from .sampling import SAMPLING_STRATEGIES
+
+    cache = get_result_cache()
+    if digest and model_name and options:
+        return int(cache.delete(result_cache_key(digest, model_name, **options)))
+    if digest and model_name:
+        return sum(int(cache.delete(result_cache_key(digest, model_name, diagnostics=tier, sampling=strategy,
+                                                     charts=charts)))
+                   for tier in DIAGNOSTICS_TIERS for strategy in SAMPLING_STRATEGIES for charts in CHART_FORMATS)
+    if digest:
+        return cache.evict(digest)
+    return cache.clear()
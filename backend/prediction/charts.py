@@ -0,0 +1,489 @@
+import base64
+import time
+from functools import lru_cache
+import numpy as np
+import polars as pl
+from django.conf import settings
+
+# Chart data instead of pictures. With charts='json' every graph – EDA,
+# training diagnostics, SHAP and forecasts – is returned as a small JSON
+# object that a client draws itself, and the server renders nothing:
+#
+#   histogram – series of {name, edges, counts}
+#   box       – series of {name, q1, median, q3, whiskers, outliers, …}
+#   violin    – groups of {name, box, x, y} (y = density on the x grid)
+#   line      – series of {name, x, y}; optional `band` {x, lower, upper}
+#               and `fill` (KDE curves)
+#   scatter   – {x, y}, downsampled to MAX_POINTS, with `rows` / `shown`
+#               and an optional reference line
+#   bar / pie – {labels, values}
+#   heatmap   – {rows, columns, values, domain} (correlations, fraction
+#               missing per band of rows)
+#   pairplot  – per-column histograms plus one shared point sample
+#   beeswarm  – per-feature SHAP values with the feature value scaled 0–1
+#
+# Every chart has `type` and `title`. Everything is computed with Polars
+# queries and NumPy, e.g. KDEs are binned onto KDE_GRID points and
+# convolved with the Gaussian kernel (Scott's bandwidth, as seaborn uses)
+# instead of summing one kernel per row. Each chart builder stands in for
+# one plot function (see _builders), so the graph ids and task lists of
+# the PNG path are reused unchanged. PNG stays the default and is what
+# exports use: render_chart() rasterizes a stored chart on demand.
+
+CHART_PNG = 'png'
+CHART_JSON = 'json'
+CHART_FORMATS = (CHART_PNG, CHART_JSON)
+
+MAX_POINTS = 1000        # scatter points kept per chart
+PAIRPLOT_POINTS = 500
+MAX_OUTLIERS = 100       # box-plot outliers listed (all are counted)
+MAX_GROUPS = 20          # violins, largest groups first
+KDE_GRID = 1024
+KDE_POINTS = 200
+MISSING_BANDS = 100      # row bands of the missing-values heatmap
+BEESWARM_FEATURES = 10
+SIGNIFICANT_DIGITS = 5
+
+
+def resolve_charts(charts=None):
+    """`charts` or the CHART_FORMAT setting; raises ValueError for unknown formats."""
+    charts = charts or settings.CHART_FORMAT
+    if charts not in CHART_FORMATS:
+        raise ValueError(f"charts must be one of {', '.join(CHART_FORMATS)}.")
+    return charts
+
+
+# ─── HELPERS ────────────────────────────────────────────────
+
+def _round(values, digits=SIGNIFICANT_DIGITS):
+    """Floats rounded to `digits` significant digits, non-finite values as None."""
+    values = np.asarray(values, dtype=float).ravel()
+    finite = np.isfinite(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = np.floor(np.log10(np.abs(np.where(finite & (values != 0), values, 1.0))))
+    scale = 10.0 ** (digits - 1 - magnitude)
+    rounded = np.round(values * scale) / scale
+    return [v if ok else None for v, ok in zip(rounded.tolist(), finite.tolist())]
+
+
+def _finite(values):
+    values = np.asarray(values, dtype=float).ravel()
+    return values[np.isfinite(values)]
+
+
+def _frame(df):
+    return df if isinstance(df, pl.DataFrame) else pl.from_pandas(df)
+
+
+def _column(df, col):
+    return _finite(df[col].cast(pl.Float64, strict=False).to_numpy())
+
+
+def _sample_index(n, limit, seed=42):
+    """Sorted positions of at most `limit` of `n` rows."""
+    if n <= limit:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(seed).choice(n, limit, replace=False))
+
+
+def histogram(values, bins=10):
+    values = _finite(values)
+    if not len(values):
+        return {'edges': [], 'counts': []}
+    counts, edges = np.histogram(values, bins=bins)
+    return {'edges': _round(edges), 'counts': counts.tolist()}
+
+
+def box_stats(values):
+    """Quartiles, 1.5×IQR whiskers and outliers, as a box plot draws them."""
+    values = np.sort(_finite(values))
+    if not len(values):
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    inside = values[(values >= low) & (values <= high)]
+    outliers = values[(values < low) | (values > high)]
+    shown = outliers[_sample_index(len(outliers), MAX_OUTLIERS)]
+    return {
+        'count': len(values),
+        'mean': _round([values.mean()])[0],
+        'min': _round([values[0]])[0],
+        'q1': _round([q1])[0],
+        'median': _round([median])[0],
+        'q3': _round([q3])[0],
+        'max': _round([values[-1]])[0],
+        'whiskers': _round([inside[0], inside[-1]]) if len(inside) else _round([q1, q3]),
+        'outliers': _round(shown),
+        'outlier_count': len(outliers),
+    }
+
+
+def kde(values, points=KDE_POINTS):
+    """Gaussian KDE (Scott's bandwidth, cut at 3 bandwidths) as (x, density) lists."""
+    values = _finite(values)
+    if len(values) < 2 or values.std() == 0:
+        return [], []
+    bandwidth = values.std(ddof=1) * len(values) ** (-1 / 5)
+    low, high = values.min() - 3 * bandwidth, values.max() + 3 * bandwidth
+    counts, edges = np.histogram(values, bins=KDE_GRID, range=(low, high))
+    step = edges[1] - edges[0]
+    half = int(np.ceil(4 * bandwidth / step))
+    kernel = np.exp(-0.5 * (np.arange(-half, half + 1) * step / bandwidth) ** 2)
+    density = np.convolve(counts, kernel)[half:half + KDE_GRID]
+    density /= len(values) * bandwidth * np.sqrt(2 * np.pi)
+    x = np.linspace(low, high, points)
+    return _round(x), _round(np.interp(x, (edges[:-1] + edges[1:]) / 2, density))
+
+
+def scatter(x, y, title, x_label, y_label, reference=None, limit=MAX_POINTS):
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    keep = _sample_index(len(x), limit)
+    chart = {'type': 'scatter', 'title': title, 'x_label': x_label, 'y_label': y_label,
+             'x': _round(x[keep]), 'y': _round(y[keep]), 'rows': len(x), 'shown': len(keep)}
+    if reference is not None:
+        chart['reference'] = reference
+    return chart
+
+
+def _top_counts(df, col, n=5):
+    counts = df[col].value_counts(sort=True).head(n)
+    return [str(v) for v in counts[col].to_list()], counts['count'].to_list()
+
+
+# ─── EDA ────────────────────────────────────────────────────
+# Each takes the EDA frame and the kwargs of the plot function it replaces.
+
+def _numeric(df):
+    from .eda import _numeric_columns
+
+    return _numeric_columns(df)
+
+
+def histogram_chart(df, bins=10):
+    df = _frame(df)
+    return {'type': 'histogram', 'title': 'Histograms',
+            'series': [{'name': col, **histogram(_column(df, col), bins)} for col in _numeric(df)]}
+
+
+def correlation_chart(df):
+    df = _frame(df)
+    columns = _numeric(df)
+    pairs = [(i, j) for i in range(len(columns)) for j in range(i + 1, len(columns))]
+    row = df.select([pl.corr(columns[i], columns[j]).alias(f"{i}|{j}") for i, j in pairs]).row(0) if pairs else ()
+    matrix = np.eye(len(columns))
+    for (i, j), value in zip(pairs, row):
+        matrix[i, j] = matrix[j, i] = np.nan if value is None else value
+    return {'type': 'heatmap', 'title': 'Correlation', 'rows': columns, 'columns': columns,
+            'values': [_round(r, 4) for r in matrix], 'domain': [-1, 1]}
+
+
+def scatter_chart(df, col, target_col):
+    df = _frame(df).select(col, target_col).drop_nulls()
+    return scatter(df[col].to_numpy(), df[target_col].to_numpy(), f"{col} vs {target_col}", col, target_col)
+
+
+def box_chart(df, col):
+    return {'type': 'box', 'title': f"Boxplot of {col}",
+            'series': [{'name': col, **(box_stats(_column(_frame(df), col)) or {})}]}
+
+
+def kde_chart(df, col):
+    x, y = kde(_column(_frame(df), col))
+    return {'type': 'line', 'title': f"KDE of {col}", 'fill': True, 'x_label': col, 'y_label': 'Density',
+            'series': [{'name': col, 'x': x, 'y': y}]}
+
+
+def missing_chart(df):
+    df = _frame(df)
+    bands = max(1, min(MISSING_BANDS, df.height))
+    band = (pl.int_range(pl.len()) * bands // pl.len()).alias('__band')
+    fractions = (df.select(band, *[pl.col(c).is_null().alias(c) for c in df.columns])
+                   .group_by('__band').agg(pl.col(df.columns).mean())
+                   .sort('__band'))
+    size = -(-df.height // bands) if df.height else 0
+    return {
+        'type': 'heatmap', 'title': 'Missing Values Overview',
+        'rows': [f"{i * df.height // bands}–{(i + 1) * df.height // bands - 1}" for i in fractions['__band']],
+        'columns': df.columns,
+        'values': [_round(r, 4) for r in fractions.drop('__band').rows()],
+        'domain': [0, 1],
+        'null_counts': dict(zip(df.columns, df.null_count().row(0))),
+        'band_rows': size,
+    }
+
+
+def violin_chart(df, product_type_col, target_col):
+    df = _frame(df).select(pl.col(product_type_col).cast(pl.String), target_col).drop_nulls()
+    names, _ = _top_counts(df, product_type_col, MAX_GROUPS)
+    groups = []
+    for name, part in df.filter(pl.col(product_type_col).is_in(names)).partition_by(
+            product_type_col, as_dict=True).items():
+        x, y = kde(part[target_col].to_numpy())
+        groups.append({'name': name[0], 'box': box_stats(part[target_col].to_numpy()), 'x': x, 'y': y})
+    groups.sort(key=lambda g: names.index(g['name']))
+    return {'type': 'violin', 'title': 'Value Distribution by Product Type',
+            'x_label': product_type_col, 'y_label': target_col, 'groups': groups,
+            'groups_total': df[product_type_col].n_unique()}
+
+
+def pairplot_chart(df, numeric_columns):
+    df = _frame(df).select(numeric_columns)
+    keep = _sample_index(df.height, PAIRPLOT_POINTS)
+    sample = df[keep]
+    return {'type': 'pairplot', 'title': 'Pairplot', 'columns': numeric_columns,
+            'histograms': [{'name': col, **histogram(_column(df, col))} for col in numeric_columns],
+            'points': {col: _round(sample[col].cast(pl.Float64).to_numpy()) for col in numeric_columns},
+            'rows': df.height, 'shown': len(keep)}
+
+
+def top_bar_chart(df, col, color, title):
+    labels, values = _top_counts(_frame(df), col)
+    return {'type': 'bar', 'title': title, 'labels': labels, 'values': values, 'color': color}
+
+
+def top_pie_chart(df, col, title):
+    labels, values = _top_counts(_frame(df), col)
+    return {'type': 'pie', 'title': title, 'labels': labels, 'values': values}
+
+
+def monthly_trend_chart(df, col, title):
+    df = _frame(df)
+    names, _ = _top_counts(df, col)
+    counts = (df.select(pl.col(col).cast(pl.String), 'month')
+                .filter(pl.col(col).is_in(names))
+                .group_by('month', col).len())
+    months = sorted(m for m in counts['month'].unique().to_list() if m is not None)
+    by_key = {(m, name): n for m, name, n in counts.select('month', col, 'len').iter_rows()}
+    return {'type': 'line', 'title': title, 'x_label': 'month', 'markers': True,
+            'series': [{'name': name, 'x': months, 'y': [by_key.get((m, name), 0) for m in months]}
+                       for name in names]}
+
+
+# ─── DIAGNOSTICS ────────────────────────────────────────────
+# Each takes the shared diagnostics `data` dict, like prediction.diagnostics.
+
+def residuals_chart(data):
+    return scatter(data['y_pred'], data['residuals'], 'Residuals vs Predicted', 'Predicted', 'Residuals',
+                   reference={'y': 0})
+
+
+def pred_vs_actual_chart(data):
+    y_test = _finite(data['y_test'])
+    low, high = (_round([y_test.min(), y_test.max()]) if len(y_test) else [None, None])
+    return scatter(data['y_test'], data['y_pred'], 'Predicted vs Actual', 'Actual', 'Predicted',
+                   reference={'from': [low, low], 'to': [high, high]})
+
+
+def feature_importance_chart(data, features, importances):
+    importances = np.asarray(importances, dtype=float)
+    order = np.argsort(importances)[::-1]
+    return {'type': 'bar', 'title': 'Feature Importances', 'orientation': 'horizontal',
+            'labels': [features[i] for i in order], 'values': _round(importances[order])}
+
+
+def learning_curve_chart(data, train_sizes, train_rmse, val_rmse):
+    x = [int(size) for size in train_sizes]
+    return {'type': 'line', 'title': 'Learning Curve', 'x_label': 'Training Size', 'y_label': 'RMSE',
+            'markers': True, 'series': [{'name': 'Train RMSE', 'x': x, 'y': _round(train_rmse)},
+                                        {'name': 'Validation RMSE', 'x': x, 'y': _round(val_rmse)}]}
+
+
+def error_histogram_chart(data):
+    return {'type': 'histogram', 'title': 'Error Distribution (Residuals)', 'x_label': 'Residual',
+            'series': [{'name': 'residuals', **histogram(data['residuals'], bins=20)}]}
+
+
+def month_forecast_chart(data, months, preds, target_col):
+    return {'type': 'line', 'title': f"{target_col} by Month (Other Features at Median)", 'x_label': 'Month',
+            'y_label': target_col, 'markers': True,
+            'series': [{'name': target_col, 'x': list(months), 'y': _round(preds)}]}
+
+
+def forecast_horizon_chart(data, target_col, coverage):
+    def dates(values):
+        return [v.isoformat() for v in values]
+
+    return {'type': 'line', 'title': f"{target_col} forecast", 'y_label': target_col,
+            'series': [{'name': 'history', 'x': dates(data['history_ds']), 'y': _round(data['history_y'])},
+                       {'name': 'forecast', 'x': dates(data['ds']), 'y': _round(data['prediction'])}],
+            'band': {'name': f"{coverage:.0%} interval", 'x': dates(data['ds']),
+                     'lower': _round(data['lower']), 'upper': _round(data['upper'])}}
+
+
+def beeswarm_chart(attributions, limit=BEESWARM_FEATURES):
+    """Per-feature SHAP values of prediction.explain.Attributions, most important first."""
+    values, data = np.asarray(attributions.values), np.asarray(attributions.data, dtype=float)
+    keep = _sample_index(len(values), MAX_POINTS)
+    importance = np.abs(values).mean(axis=0) if len(values) else np.zeros(len(attributions.features))
+    features = []
+    for i in np.argsort(importance)[::-1][:limit]:
+        column = data[keep, i]
+        span = np.nanmax(column) - np.nanmin(column) if len(column) else 0
+        scaled = (column - np.nanmin(column)) / span if span else np.full(len(column), 0.5)
+        features.append({'name': attributions.features[i], 'mean_abs': _round([importance[i]])[0],
+                         'shap': _round(values[keep, i]), 'value': _round(scaled, 3)})
+    return {'type': 'beeswarm', 'title': 'SHAP values', 'x_label': 'SHAP value',
+            'base_value': _round([attributions.base_value])[0], 'features': features}
+
+
+# ─── DISPATCH ───────────────────────────────────────────────
+
+@lru_cache(maxsize=1)
+def _builders():
+    from . import diagnostics, eda
+    from .forecasting import plot_forecast_horizon
+
+    return {
+        eda._plot_histogram: histogram_chart,
+        eda._plot_correlation_heatmap: correlation_chart,
+        eda._plot_scatter: scatter_chart,
+        eda._plot_boxplot: box_chart,
+        eda._plot_kde: kde_chart,
+        eda._plot_missing_values: missing_chart,
+        eda._plot_violin: violin_chart,
+        eda._plot_pairplot: pairplot_chart,
+        eda._plot_top_bar: top_bar_chart,
+        eda._plot_top_pie: top_pie_chart,
+        eda._plot_monthly_trend: monthly_trend_chart,
+        diagnostics.plot_residuals: residuals_chart,
+        diagnostics.plot_pred_vs_actual: pred_vs_actual_chart,
+        diagnostics.plot_feature_importance: feature_importance_chart,
+        diagnostics.plot_learning_curve: learning_curve_chart,
+        diagnostics.plot_error_histogram: error_histogram_chart,
+        diagnostics.plot_forecast: month_forecast_chart,
+        plot_forecast_horizon: forecast_horizon_chart,
+    }
+
+
+def build_chart(plot_fn, data, kwargs):
+    """The chart that stands in for `plot_fn(data, **kwargs)`."""
+    return _builders()[plot_fn](data, **kwargs)
+
+
+def build_all(data, tasks, trace=None):
+    """
+    {key: chart} for render tasks (key, plot_fn, kwargs), built in this
+    process; per-chart time is added to `trace` as `chart:<key>`.
+    """
+    charts = {}
+    for key, plot_fn, kwargs in tasks:
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        charts[key] = build_chart(plot_fn, data, kwargs)
+        if trace is not None:
+            trace.add(f"chart:{key}", time.perf_counter() - wall0, time.process_time() - cpu0)
+    return charts
+
+
+def draw_all(data, tasks, charts=CHART_PNG, trace=None):
+    """Render `tasks` as base64 PNGs (prediction.rendering) or build them as charts."""
+    from .rendering import render_all
+
+    if charts == CHART_JSON:
+        return build_all(data, tasks, trace=trace)
+    return render_all(data, tasks, trace=trace)
+
+
+def is_chart(value):
+    return isinstance(value, dict) and 'type' in value and 'blob' not in value
+
+
+# ─── RASTERIZE ──────────────────────────────────────────────
+# For exports: draw a stored chart with matplotlib, roughly as the PNG path
+# would have drawn the original figure.
+
+def _draw_series(ax, chart):
+    kind = chart['type']
+    if kind == 'histogram':
+        for series in chart['series']:
+            if series['edges']:
+                ax.stairs(series['counts'], series['edges'], fill=True, alpha=0.6, label=series['name'])
+    elif kind == 'line':
+        for series in chart['series']:
+            ax.plot(series['x'], series['y'], marker='o' if chart.get('markers') else None, label=series['name'])
+            if chart.get('fill'):
+                ax.fill_between(series['x'], series['y'], alpha=0.3)
+        if chart.get('band'):
+            band = chart['band']
+            ax.fill_between(band['x'], band['lower'], band['upper'], alpha=0.25, label=band['name'])
+    elif kind == 'scatter':
+        ax.scatter(chart['x'], chart['y'], alpha=0.6, s=12)
+        reference = chart.get('reference') or {}
+        if 'y' in reference:
+            ax.axhline(reference['y'], color='red')
+        if 'from' in reference:
+            ax.plot(*zip(reference['from'], reference['to']), 'r--')
+    elif kind == 'box':
+        stats = [{'label': s['name'], 'q1': s['q1'], 'med': s['median'], 'q3': s['q3'],
+                  'whislo': s['whiskers'][0], 'whishi': s['whiskers'][1], 'fliers': s['outliers']}
+                 for s in chart['series'] if 'q1' in s]
+        ax.bxp(stats, orientation='horizontal')
+    elif kind == 'violin':
+        for i, group in enumerate(chart['groups']):
+            if group['y']:
+                width = np.asarray(group['y']) / max(group['y']) * 0.4
+                ax.fill_betweenx(group['x'], i - width, i + width, alpha=0.6)
+        ax.set_xticks(range(len(chart['groups'])), [g['name'] for g in chart['groups']])
+    elif kind == 'bar':
+        if chart.get('orientation') == 'horizontal':
+            ax.barh(chart['labels'], chart['values'])
+            ax.invert_yaxis()
+        else:
+            ax.bar(chart['labels'], chart['values'], color=chart.get('color'))
+    elif kind == 'pie':
+        ax.pie(chart['values'], labels=chart['labels'], autopct='%1.1f%%')
+    elif kind == 'heatmap':
+        low, high = chart['domain']
+        image = ax.imshow(np.array(chart['values'], dtype=float), cmap='coolwarm' if low < 0 else 'Greys',
+                          vmin=low, vmax=high, aspect='auto')
+        ax.set_xticks(range(len(chart['columns'])), chart['columns'], rotation=90)
+        if len(chart['rows']) <= 30:
+            ax.set_yticks(range(len(chart['rows'])), chart['rows'])
+        ax.figure.colorbar(image, ax=ax)
+    elif kind == 'beeswarm':
+        rng = np.random.default_rng(0)
+        for i, feature in enumerate(chart['features']):
+            shap = np.array(feature['shap'], dtype=float)
+            ax.scatter(shap, i + rng.uniform(-0.3, 0.3, len(shap)), c=feature['value'], cmap='coolwarm', s=8)
+        ax.set_yticks(range(len(chart['features'])), [f['name'] for f in chart['features']])
+        ax.invert_yaxis()
+        ax.axvline(0, color='grey', linewidth=0.8)
+    if kind in ('line', 'histogram') and (len(chart['series']) > 1 or chart.get('band')):
+        ax.legend()
+
+
+def render_chart(chart):
+    """Base64 PNG of a stored chart."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from .eda import fig_to_base64
+
+    if chart['type'] == 'pairplot':
+        columns = chart['columns']
+        fig, axes = plt.subplots(len(columns), len(columns), figsize=(2 * len(columns), 2 * len(columns)),
+                                 squeeze=False)
+        for i, row in enumerate(columns):
+            for j, col in enumerate(columns):
+                ax = axes[i][j]
+                if i == j:
+                    hist = chart['histograms'][i]
+                    if hist['edges']:
+                        ax.stairs(hist['counts'], hist['edges'], fill=True)
+                else:
+                    ax.scatter(chart['points'][col], chart['points'][row], s=4, alpha=0.6)
+                if i == len(columns) - 1:
+                    ax.set_xlabel(col)
+                if j == 0:
+                    ax.set_ylabel(row)
+        return fig_to_base64(fig)
+
+    fig, ax = plt.subplots(figsize=(10, 6) if chart['type'] in ('heatmap', 'violin', 'histogram') else None)
+    _draw_series(ax, chart)
+    ax.set_title(chart.get('title', ''))
+    ax.set_xlabel(chart.get('x_label', ''))
+    ax.set_ylabel(chart.get('y_label', ''))
+    return fig_to_base64(fig)
+
+
+def chart_png(chart) -> bytes:
+    return base64.b64decode(render_chart(chart))
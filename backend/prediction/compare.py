@@ -0,0 +1,93 @@
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.conf import settings
+
+# Multi-model comparison. The upload is ingested, sampled, encoded and split
+# once (models.prepare_training_data); every model is then fitted on that
+# same split. Fits run side by side on a pool of spawned processes (see
+# prediction.rendering for why not fork), each asking the machine-wide
+# budget (prediction.compute) for an equal share of its cores, so n models
+# don't oversubscribe the machine. Workers return
+# metrics and plot data only – the figures are rendered afterwards in the
+# job process on the shared render pool.
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def compare_workers():
+    return max(1, int(settings.COMPARE_WORKERS))
+
+
+def threads_per_model(workers):
+    from .compute import compute_cores
+    return max(1, compute_cores() // workers)
+
+
+def _init_compare_worker(threads):
+    import django
+    import joblib
+    import torch
+    from django.apps import apps
+
+    if not apps.ready:  # spawn start method: fresh interpreter
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sales_predictor.settings')
+        django.setup()
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    torch.set_num_threads(threads)
+    joblib.parallel_config(backend='threading')
+
+    from .nn import warm_up
+    warm_up()
+
+
+def _fit(data, model_name, diagnostics, threads):
+    from .models import fit_model
+    return fit_model(data, model_name, diagnostics=diagnostics, n_jobs=threads, return_model=True)
+
+
+def get_compare_pool(workers):
+    global _pool, _pool_key
+    key = (os.getpid(), workers)
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_compare_worker,
+                initargs=(threads_per_model(workers),),
+            )
+            _pool_key = key
+            # Same reason as the render pool: stop our workers explicitly
+            # when this process is itself a multiprocessing child.
+            multiprocessing.util.Finalize(_pool, _pool.shutdown, exitpriority=20)
+        return _pool
+
+
+def compare_models(data, model_names, diagnostics):
+    """
+    Fit each of `model_names` on the shared TrainingData `data`. Yields
+    (model_name, FitResult or the exception it raised) as fits finish.
+    """
+    workers = min(compare_workers(), len(model_names))
+    if workers <= 1:
+        for model_name in model_names:
+            try:
+                yield model_name, _fit(data, model_name, diagnostics, threads_per_model(1))
+            except Exception as e:
+                yield model_name, e
+        return
+
+    pool = get_compare_pool(compare_workers())
+    threads = threads_per_model(compare_workers())
+    futures = {pool.submit(_fit, data, model_name, diagnostics, threads): model_name
+               for model_name in model_names}
+    for future in as_completed(futures):
+        try:
+            yield futures[future], future.result()
+        except Exception as e:
+            yield futures[future], e
@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Machine-wide CPU budget for training, forecasting and SHAP.
+#
+# The budget is COMPUTE_CORES slots, one lock file per core under
+# COMPUTE_LOCK_DIR, shared by every process on the host: the web server,
+# the training workers and their comparison pools. A CPU-bound call takes
+# compute_slot(want) and is granted as many free cores as it asked for (at
+# least one); when every core is held it waits, polling, until one is
+# released. Locks are released by the OS when a process dies, so a crashed
+# worker can't leak cores.
+#
+# Inside the slot the grant is applied everywhere a library could start
+# threads: threadpoolctl caps the BLAS / OpenMP pools, torch gets
+# set_num_threads, and the caller passes the grant on as n_jobs. Nested
+# slots on one thread reuse the outer grant.
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def compute_cores():
+    return max(1, int(settings.COMPUTE_CORES) or os.cpu_count() or 1)
+
+
+def default_threads():
+    """Cores one call asks for when it doesn't say: an equal share per training worker."""
+    if settings.COMPUTE_JOB_THREADS:
+        return int(settings.COMPUTE_JOB_THREADS)
+    return max(1, compute_cores() // max(1, settings.TRAINING_WORKERS))
+
+
+def _try_lock(fd):
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _slot_paths():
+    directory = settings.COMPUTE_LOCK_DIR
+    os.makedirs(directory, exist_ok=True)
+    return [os.path.join(directory, f"core-{i}.lock") for i in range(compute_cores())]
+
+
+def acquire_cores(want):
+    """Lock up to `want` free cores (at least one, waiting if none are free); returns their fds."""
+    want = max(1, min(want, compute_cores()))
+    paths = _slot_paths()
+    while True:
+        held = []
+        for path in paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            if _try_lock(fd):
+                held.append(fd)
+                if len(held) == want:
+                    return held
+            else:
+                os.close(fd)
+        if held:
+            return held
+        time.sleep(settings.COMPUTE_POLL_INTERVAL)
+
+
+def release_cores(fds):
+    for fd in fds:
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+
+def cores_in_use():
+    """How many cores are currently held, by any process."""
+    busy = 0
+    for path in _slot_paths():
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if _try_lock(fd):
+                _unlock(fd)
+            else:
+                busy += 1
+        finally:
+            os.close(fd)
+    return busy
+
+
+@contextmanager
+def compute_slot(want=None, trace=None):
+    """
+    Hold a share of the CPU budget; yields the number of threads granted.
+    Waiting time is added to `trace` as the `compute_wait` stage.
+    """
+    import torch
+    from threadpoolctl import threadpool_limits
+
+    outer = getattr(_local, 'threads', None)
+    if outer is not None:
+        yield outer
+        return
+
+    start = time.perf_counter()
+    fds = acquire_cores(want or default_threads())
+    threads = len(fds)
+    waited = time.perf_counter() - start
+    if trace is not None:
+        trace.add('compute_wait', waited)
+    if waited > 1:
+        logger.info("Waited %.1fs for %d core(s)", waited, threads)
+
+    previous = torch.get_num_threads()
+    _local.threads = threads
+    try:
+        with threadpool_limits(limits=threads):
+            torch.set_num_threads(threads)
+            yield threads
+    finally:
+        _local.threads = None
+        torch.set_num_threads(previous)
+        release_cores(fds)
@@ -0,0 +1,70 @@
+import matplotlib
+matplotlib.use('Agg')  # Use a non-GUI backend for servers
+import matplotlib.pyplot as plt
+import numpy as np
+from .eda import fig_to_base64
+
+# Training diagnostic figures. Each takes the shared `data` dict
+# (y_test / y_pred / residuals arrays) first so they can be fanned out
+# through prediction.rendering.render_all.
+
+
+def plot_residuals(data):
+    fig, ax = plt.subplots()
+    ax.scatter(data["y_pred"], data["residuals"], alpha=0.6)
+    ax.axhline(0, color="red")
+    ax.set_xlabel("Predicted")
+    ax.set_ylabel("Residuals")
+    ax.set_title("Residuals vs Predicted")
+    return fig_to_base64(fig)
+
+
+def plot_pred_vs_actual(data):
+    y_test, y_pred = data["y_test"], data["y_pred"]
+    fig, ax = plt.subplots()
+    ax.scatter(y_test, y_pred, alpha=0.6)
+    ax.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], "r--")
+    ax.set_xlabel("Actual")
+    ax.set_ylabel("Predicted")
+    ax.set_title("Predicted vs Actual")
+    return fig_to_base64(fig)
+
+
+def plot_feature_importance(data, features, importances):
+    importances = np.asarray(importances)
+    idx = np.argsort(importances)[::-1]
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.barh([features[i] for i in idx], importances[idx])
+    ax.set_title("Feature Importances")
+    ax.invert_yaxis()
+    return fig_to_base64(fig)
+
+
+def plot_learning_curve(data, train_sizes, train_rmse, val_rmse):
+    fig, ax = plt.subplots()
+    ax.plot(train_sizes, train_rmse, "o-", label="Train RMSE")
+    ax.plot(train_sizes, val_rmse, "o-", label="Validation RMSE")
+    ax.set_xlabel("Training Size")
+    ax.set_ylabel("RMSE")
+    ax.set_title("Learning Curve")
+    ax.legend()
+    return fig_to_base64(fig)
+
+
+def plot_error_histogram(data):
+    fig, ax = plt.subplots()
+    ax.hist(data["residuals"], bins=20, edgecolor="black")
+    ax.set_title("Error Distribution (Residuals)")
+    ax.set_xlabel("Residual")
+    return fig_to_base64(fig)
+
+
+def plot_forecast(data, months, preds, target_col):
+    # A sweep of the month feature, not a time-series forecast – that is
+    # /api/predict/forecast/ (prediction.forecasting).
+    fig, ax = plt.subplots()
+    ax.plot(months, preds, marker="o")
+    ax.set_title(f"{target_col} by Month (Other Features at Median)")
+    ax.set_xlabel("Month")
+    ax.set_ylabel(target_col)
+    return fig_to_base64(fig)
@@ -1,12 +1,202 @@
 import base64
 import io
+from functools import lru_cache
 import seaborn as sns
+import numpy as np
 import polars as pl
 import matplotlib.pyplot as plt
 import matplotlib
 matplotlib.use('Agg')  # Use a non-GUI backend for servers
 
 
+def prepare_eda_frame(df: pl.DataFrame):
+    """Parse the first date-like column and derive `month`; returns (df, date_column)."""
+    for col in df.columns:
+        if 'date' in col.lower():
+            dtype = df.schema[col]
+            if dtype == pl.String:
+                parsed = pl.col(col).str.strptime(pl.Datetime, strict=False)
+            elif dtype.is_temporal():
+                parsed = pl.col(col).cast(pl.Datetime)  # Parquet / Arrow keep native dates
+            else:
+                continue
+            try:
+                df = df.with_columns([parsed.alias(col)])
+                df = df.with_columns([
+                    df[col].dt.month().alias("month")
+                ])
+                return df, col
+            except Exception:
+                continue
+    return df, None
+
+
+def infer_product_columns(df):
+    """Return (product_name_col, product_type_col), either may be None."""
+    product_name_col = next((c for c in df.columns if 'product' in c.lower() and 'name' in c.lower()), None)
+    product_type_col = next((c for c in df.columns if 'product' in c.lower() and ('type' in c.lower() or 'category' in c.lower())), None)
+    return product_name_col, product_type_col
+
+
+@lru_cache(maxsize=4)
+def load_eda_frame(path, plot_rows=None):
+    """
+    Re-read a spooled upload for on-demand graph rendering (kept hot per
+    process); `plot_rows` draws graphs from a stratified sample of that size,
+    as approximate-mode EDA does.
+    """
+    from django.conf import settings
+    from .ingest import read_upload
+
+    # Same seed and size as eda_view, so lazy graphs see the same sample.
+    df, _ = read_upload(path, sample_rows=settings.EDA_SAMPLE_ROWS)
+    df, _ = prepare_eda_frame(df)
+    product_name_col, product_type_col = infer_product_columns(df)
+    if plot_rows:
+        df = stratified_sample(df, plot_strata(df, product_type_col), plot_rows)
+    return df.to_pandas(), product_name_col, product_type_col
+
+
+# ─── PLOT SAMPLES ───────────────────────────────────────────
+# Approximate-mode graphs are drawn from a stratified sample: every stratum
+# keeps a floor of rows (or all of its rows) and the rest of the budget is
+# shared in proportion to size, so small product types or months still
+# show up in per-group plots.
+
+def plot_strata(df, product_type_col=None):
+    """Column to stratify plot samples by: product type, else month, else None."""
+    if product_type_col:
+        return product_type_col
+    return 'month' if 'month' in df.columns else None
+
+
+def stratified_sample(df: pl.DataFrame, by, n, seed=42) -> pl.DataFrame:
+    """At most `n` rows of `df` in their original order, stratified by column `by` (None = uniform)."""
+    if df.height <= n:
+        return df
+    rng = np.random.default_rng(seed)
+    if by is None:
+        return df[np.sort(rng.choice(df.height, size=n, replace=False))]
+
+    sizes = df.group_by(by).len()
+    counts = sizes['len'].to_numpy()
+    base = np.minimum(counts, n // (2 * len(counts)))
+    spare = counts - base
+    extra = np.floor((n - base.sum()) * spare / max(spare.sum(), 1)).astype(np.int64)
+    quotas = sizes.select(by, pl.Series('__quota', base + extra))
+    return (df.with_columns(pl.Series('__key', rng.random(df.height)))
+              .join(quotas, on=by, how='left', nulls_equal=True, maintain_order='left')
+              .filter(pl.col('__key').rank('ordinal').over(by) <= pl.col('__quota'))
+              .drop('__key', '__quota'))
+
+
+# ─── STATISTICS ─────────────────────────────────────────────
+# The statistics half of the EDA payload, computed in one lazy Polars query
+# (no pandas copy of the frame). Output matches what the view used to build
+# from pandas: describe(include='all').fillna(''), corr(numeric_only=True)
+# rounded to 2 places, null counts, unique counts and the first rows.
+
+DESCRIBE_ROWS = ('count', 'unique', 'top', 'freq', 'mean', 'std', 'min', '25%', '50%', '75%', 'max')
+_QUANTILES = (('25%', 0.25), ('50%', 0.5), ('75%', 0.75))
+
+
+def _column_kind(dtype):
+    if dtype.is_numeric():
+        return 'numeric'
+    if dtype.is_temporal() and dtype != pl.Time and dtype != pl.Duration:
+        return 'datetime'
+    return 'categorical'
+
+
+def _describe_exprs(i, col, kind, dtype):
+    def alias(stat, expr):
+        return expr.alias(f"{i}|{stat}")
+
+    if kind == 'numeric':
+        x = pl.col(col).cast(pl.Float64).fill_nan(None)  # pandas counts NaN as missing
+        return [
+            alias('count', x.count().cast(pl.Float64)),
+            alias('mean', x.mean()),
+            alias('std', x.std()),
+            alias('min', x.min()),
+            *[alias(name, x.quantile(q, 'linear')) for name, q in _QUANTILES],
+            alias('max', x.max()),
+        ]
+    if kind == 'datetime':
+        # pandas describes dates as datetimes and interpolates quantiles
+        # between the underlying integers.
+        as_dtype = pl.Datetime('us') if dtype == pl.Date else dtype
+        x = pl.col(col).cast(as_dtype)
+        return [
+            alias('count', x.count()),
+            alias('mean', x.mean()),
+            alias('min', x.min()),
+            *[alias(name, x.to_physical().quantile(q, 'linear').cast(pl.Int64).cast(as_dtype))
+              for name, q in _QUANTILES],
+            alias('max', x.max()),
+        ]
+    x = pl.col(col) if dtype == pl.Boolean else pl.col(col).cast(pl.Utf8, strict=False)
+    top = x.drop_nulls().value_counts(sort=True, name='freq').first()
+    return [
+        alias('count', x.count()),
+        alias('unique', x.drop_nulls().n_unique()),
+        alias('top', top.struct.field(col)),
+        alias('freq', top.struct.field('freq')),
+    ]
+
+
+def _describe_rows(kinds):
+    rows = ['count']
+    if 'categorical' in kinds:
+        rows += ['unique', 'top', 'freq']
+    if kinds & {'numeric', 'datetime'}:
+        rows += ['mean', 'std', 'min', '25%', '50%', '75%', 'max'] if 'numeric' in kinds \
+            else ['mean', 'min', '25%', '50%', '75%', 'max']
+    return rows
+
+
+def _as_float(col):
+    return pl.col(col).cast(pl.Float64).fill_nan(None)
+
+
+def eda_statistics(df: pl.DataFrame):
+    """missing_values / descriptive_stats / correlation_matrix / unique_values / example_rows."""
+    kinds = {col: _column_kind(dtype) for col, dtype in df.schema.items()}
+    corr_columns = [col for col, dtype in df.schema.items() if dtype.is_numeric() or dtype == pl.Boolean]
+
+    exprs = []
+    for i, (col, dtype) in enumerate(df.schema.items()):
+        exprs += _describe_exprs(i, col, kinds[col], dtype)
+        exprs.append(pl.col(col).null_count().alias(f"{i}|nulls"))
+        exprs.append(pl.col(col).n_unique().alias(f"{i}|n_unique"))
+    for a, col_a in enumerate(corr_columns):
+        for b in range(a, len(corr_columns)):
+            exprs.append(pl.corr(_as_float(col_a), _as_float(corr_columns[b])).alias(f"corr|{a}|{b}"))
+    row = df.lazy().select(exprs).collect().row(0, named=True) if exprs else {}
+
+    rows = _describe_rows(set(kinds.values()))
+    describe = {
+        col: {stat: '' if row.get(f"{i}|{stat}") is None else row[f"{i}|{stat}"] for stat in rows}
+        for i, col in enumerate(df.columns)
+    }
+
+    correlation = {col: {} for col in corr_columns}
+    for a, col_a in enumerate(corr_columns):
+        for b in range(a, len(corr_columns)):
+            value = row[f"corr|{a}|{b}"]
+            value = None if value is None or np.isnan(value) else round(value, 2)
+            correlation[col_a][corr_columns[b]] = correlation[corr_columns[b]][col_a] = value
+    correlation = {col: {other: correlation[col][other] for other in corr_columns} for col in corr_columns}
+
+    return {
+        'missing_values': {col: [row[f"{i}|nulls"]] for i, col in enumerate(df.columns)},
+        'descriptive_stats': describe,
+        'correlation_matrix': correlation,
+        'unique_values': {col: row[f"{i}|n_unique"] for i, col in enumerate(df.columns)},
+        'example_rows': df.head(5).to_dicts(),
+    }
+
+
 def fig_to_base64(fig):
     buf = io.BytesIO()
     fig.savefig(buf, format="png", bbox_inches="tight")
@@ -16,125 +206,180 @@ def fig_to_base64(fig):
     return img_base64
 
 
-def generate_graphs(df: pl.DataFrame, product_name_col=None, product_type_col=None):
-    graphs = {}
-
-    # convert to pandas if it's polars
-    if isinstance(df, pl.DataFrame):
-        df_pd = df.to_pandas()
-    else:
-        df_pd = df  # already pandas
+# ─── GRAPH REGISTRY ─────────────────────────────────────────
+# Every EDA graph is addressable by an id so it can be rendered eagerly
+# (generate_graphs) or one at a time on demand (render_graph), as a PNG or
+# as chart data (prediction.charts).
 
-    # numeric columns detection (if using Polars, check dtypes)
+def _numeric_columns(df):
     if isinstance(df, pl.DataFrame):
-        numeric_columns = [
+        return [
             col for col, dtype in zip(df.columns, df.dtypes)
             if dtype in (pl.Int8, pl.Int16, pl.Int32, pl.Int64,
                          pl.UInt8, pl.UInt16, pl.UInt32, pl.UInt64,
                          pl.Float32, pl.Float64)
         ]
-    else:  # pandas
-        numeric_columns = df_pd.select_dtypes(include=["number"]).columns.tolist()
+    return df.select_dtypes(include=["number"]).columns.tolist()
 
-    target_col = numeric_columns[-1] if len(numeric_columns) > 1 else None
 
-    # Histogram
-    fig = df_pd.hist(figsize=(10, 6))
+def _plot_histogram(df_pd):
+    df_pd.hist(figsize=(10, 6))
     plt.tight_layout()
-    graphs["histogram"] = fig_to_base64(plt.gcf())
+    return fig_to_base64(plt.gcf())
+
 
-    # Correlation Heatmap
+def _plot_correlation_heatmap(df_pd):
     corr = df_pd.corr(numeric_only=True)
     fig, ax = plt.subplots(figsize=(8, 6))
     sns.heatmap(corr, annot=True, cmap="coolwarm", ax=ax)
-    graphs["correlation_heatmap"] = fig_to_base64(fig)
+    return fig_to_base64(fig)
+
+
+def _plot_scatter(df_pd, col, target_col):
+    fig, ax = plt.subplots()
+    sns.scatterplot(data=df_pd, x=col, y=target_col, ax=ax)
+    ax.set_title(f"{col} vs {target_col}")
+    return fig_to_base64(fig)
+
+
+def _plot_boxplot(df_pd, col):
+    fig, ax = plt.subplots()
+    sns.boxplot(x=df_pd[col], ax=ax)
+    ax.set_title(f"Boxplot of {col}")
+    return fig_to_base64(fig)
+
+
+def _plot_kde(df_pd, col):
+    fig, ax = plt.subplots()
+    sns.kdeplot(df_pd[col].dropna(), fill=True, ax=ax)
+    ax.set_title(f"KDE of {col}")
+    return fig_to_base64(fig)
+
+
+def _plot_missing_values(df_pd):
+    fig, ax = plt.subplots(figsize=(8, 6))
+    sns.heatmap(df_pd.isnull(), cbar=False, yticklabels=False, ax=ax)
+    ax.set_title("Missing Values Overview")
+    return fig_to_base64(fig)
+
+
+def _plot_violin(df_pd, product_type_col, target_col):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.violinplot(x=product_type_col, y=target_col, data=df_pd, ax=ax)
+    ax.set_title("Value Distribution by Product Type")
+    return fig_to_base64(fig)
+
+
+def _plot_pairplot(df_pd, numeric_columns):
+    pairplot = sns.pairplot(df_pd[numeric_columns])
+    return fig_to_base64(pairplot.fig)
+
+
+def _plot_top_bar(df_pd, col, color, title):
+    top = df_pd[col].value_counts().head(5)
+    fig, ax = plt.subplots()
+    top.plot(kind='bar', color=color, ax=ax)
+    ax.set_title(title)
+    return fig_to_base64(fig)
+
+
+def _plot_top_pie(df_pd, col, title):
+    top = df_pd[col].value_counts().head(5)
+    fig, ax = plt.subplots()
+    top.plot(kind='pie', autopct='%1.1f%%', ax=ax)
+    ax.set_ylabel('')
+    ax.set_title(title)
+    return fig_to_base64(fig)
+
+
+def _plot_monthly_trend(df_pd, col, title):
+    top = df_pd[col].value_counts().head(5)
+    trend = df_pd[df_pd[col].isin(top.index)]
+    monthly = trend.groupby(['month', col]).size().unstack(fill_value=0)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    monthly.plot(ax=ax, marker='o')
+    ax.set_title(title)
+    return fig_to_base64(fig)
+
+
+def graph_specs(df, product_name_col=None, product_type_col=None):
+    """Ordered {graph_id: (plot_fn, kwargs)} for every graph this frame supports."""
+    numeric_columns = _numeric_columns(df)
+    target_col = numeric_columns[-1] if len(numeric_columns) > 1 else None
+    specs = {}
+
+    specs["histogram"] = (_plot_histogram, {})
+    specs["correlation_heatmap"] = (_plot_correlation_heatmap, {})
 
     # Scatter plots
     if target_col:
         for col in numeric_columns[:-1]:
-            fig, ax = plt.subplots()
-            sns.scatterplot(data=df_pd, x=col, y=target_col, ax=ax)
-            ax.set_title(f"{col} vs {target_col}")
-            graphs[f"scatter_{col}_vs_{target_col}"] = fig_to_base64(fig)
+            specs[f"scatter_{col}_vs_{target_col}"] = (_plot_scatter, {"col": col, "target_col": target_col})
 
     # Boxplots
     for col in numeric_columns:
-        fig, ax = plt.subplots()
-        sns.boxplot(x=df_pd[col], ax=ax)
-        ax.set_title(f"Boxplot of {col}")
-        graphs[f"boxplot_{col}"] = fig_to_base64(fig)
+        specs[f"boxplot_{col}"] = (_plot_boxplot, {"col": col})
 
     # KDE / Density Plots
     for col in numeric_columns:
-        fig, ax = plt.subplots()
-        sns.kdeplot(df_pd[col].dropna(), fill=True, ax=ax)
-        ax.set_title(f"KDE of {col}")
-        graphs[f"kde_{col}"] = fig_to_base64(fig)
+        specs[f"kde_{col}"] = (_plot_kde, {"col": col})
 
-    # Missing value heatmap
-    fig, ax = plt.subplots(figsize=(8, 6))
-    sns.heatmap(df_pd.isnull(), cbar=False, yticklabels=False, ax=ax)
-    ax.set_title("Missing Values Overview")
-    graphs["missing_values_heatmap"] = fig_to_base64(fig)
+    specs["missing_values_heatmap"] = (_plot_missing_values, {})
 
     # Violin plot (target vs product type)
     if product_type_col and target_col:
-        fig, ax = plt.subplots(figsize=(10, 6))
-        sns.violinplot(x=product_type_col, y=target_col, data=df_pd, ax=ax)
-        ax.set_title("Value Distribution by Product Type")
-        graphs["violin_target_by_type"] = fig_to_base64(fig)
+        specs["violin_target_by_type"] = (_plot_violin, {"product_type_col": product_type_col,
+                                                         "target_col": target_col})
 
     # Pairplot (only if not too many columns)
     if len(numeric_columns) <= 10:
-        pairplot = sns.pairplot(df_pd[numeric_columns])
-        graphs["pairplot"] = fig_to_base64(pairplot.fig)
+        specs["pairplot"] = (_plot_pairplot, {"numeric_columns": numeric_columns})
 
     # Bar, Pie, Trend for product names
     if product_name_col:
-        top_names = df_pd[product_name_col].value_counts().head(5)
-
-        fig, ax = plt.subplots()
-        top_names.plot(kind='bar', color='skyblue', ax=ax)
-        ax.set_title("Top 5 Product Names (Bar)")
-        graphs["top_product_names_bar"] = fig_to_base64(fig)
-
-        fig, ax = plt.subplots()
-        top_names.plot(kind='pie', autopct='%1.1f%%', ax=ax)
-        ax.set_ylabel('')
-        ax.set_title("Top 5 Product Names (Pie)")
-        graphs["top_product_names_pie"] = fig_to_base64(fig)
-
+        specs["top_product_names_bar"] = (_plot_top_bar, {
+            "col": product_name_col, "color": 'skyblue', "title": "Top 5 Product Names (Bar)"})
+        specs["top_product_names_pie"] = (_plot_top_pie, {
+            "col": product_name_col, "title": "Top 5 Product Names (Pie)"})
         if 'month' in df.columns:
-            trend = df_pd[df_pd[product_name_col].isin(top_names.index)]
-            monthly = trend.groupby(
-                ['month', product_name_col]).size().unstack(fill_value=0)
-            fig, ax = plt.subplots(figsize=(10, 6))
-            monthly.plot(ax=ax, marker='o')
-            ax.set_title("Monthly Trend of Top 5 Product Names")
-            graphs["monthly_product_name_trend"] = fig_to_base64(fig)
+            specs["monthly_product_name_trend"] = (_plot_monthly_trend, {
+                "col": product_name_col, "title": "Monthly Trend of Top 5 Product Names"})
 
     # Bar, Pie, Trend for product types
     if product_type_col:
-        top_types = df_pd[product_type_col].value_counts().head(5)
+        specs["top_product_types_bar"] = (_plot_top_bar, {
+            "col": product_type_col, "color": 'lightgreen', "title": "Top 5 Product Types (Bar)"})
+        specs["top_product_types_pie"] = (_plot_top_pie, {
+            "col": product_type_col, "title": "Top 5 Product Types (Pie)"})
+        if 'month' in df.columns:
+            specs["monthly_product_type_trend"] = (_plot_monthly_trend, {
+                "col": product_type_col, "title": "Monthly Trend of Top 5 Product Types"})
 
-        fig, ax = plt.subplots()
-        top_types.plot(kind='bar', color='lightgreen', ax=ax)
-        ax.set_title("Top 5 Product Types (Bar)")
-        graphs["top_product_types_bar"] = fig_to_base64(fig)
+    return specs
 
-        fig, ax = plt.subplots()
-        top_types.plot(kind='pie', autopct='%1.1f%%', ax=ax)
-        ax.set_ylabel('')
-        ax.set_title("Top 5 Product Types (Pie)")
-        graphs["top_product_types_pie"] = fig_to_base64(fig)
 
-        if 'month' in df.columns:
-            trend = df_pd[df_pd[product_type_col].isin(top_types.index)]
-            monthly = trend.groupby(
-                ['month', product_type_col]).size().unstack(fill_value=0)
-            fig, ax = plt.subplots(figsize=(10, 6))
-            monthly.plot(ax=ax, marker='o')
-            ax.set_title("Monthly Trend of Top 5 Product Types")
-            graphs["monthly_product_type_trend"] = fig_to_base64(fig)
-
-    return graphs
+def graph_manifest(df, product_name_col=None, product_type_col=None):
+    return list(graph_specs(df, product_name_col, product_type_col))
+
+
+def _to_pandas(df):
+    return df.to_pandas() if isinstance(df, pl.DataFrame) else df
+
+
+def render_graph(df, graph_id, product_name_col=None, product_type_col=None, charts='png'):
+    """Render a single graph by id (or build its chart, prediction.charts); raises KeyError for unknown ids."""
+    from .charts import CHART_JSON, build_chart
+
+    plot_fn, kwargs = graph_specs(df, product_name_col, product_type_col)[graph_id]
+    if charts == CHART_JSON:
+        return build_chart(plot_fn, df, kwargs)
+    return plot_fn(_to_pandas(df), **kwargs)
+
+
+def generate_graphs(df: pl.DataFrame, product_name_col=None, product_type_col=None, trace=None, charts='png'):
+    from .charts import CHART_JSON, draw_all
+
+    specs = graph_specs(df, product_name_col, product_type_col)
+    tasks = [(graph_id, plot_fn, kwargs) for graph_id, (plot_fn, kwargs) in specs.items()]
+    # charts are built straight from the Polars frame; only PNGs need pandas
+    return draw_all(df if charts == CHART_JSON else _to_pandas(df), tasks, charts, trace=trace)
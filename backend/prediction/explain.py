@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+# SHAP attributions for fitted models.
+#
+# The explainer is picked per model family instead of letting
+# shap.Explainer guess (it can fall back to permutation sampling):
+#   xgboost / lightgbm            – the boosters' native pred_contribs
+#   random_forest / decision_tree – TreeExplainer, path-dependent (exact, and
+#                                   needs no background data)
+#   anything else                 – shap.Explainer over a k-means summary
+#                                   of the background rows
+# Explained rows are capped by the caller (sample_frame / SHAP_SAMPLE_ROWS).
+# Attributions for (trained model, dataset) pairs are kept in the result
+# cache, tagged with the dataset digest like training results.
+
+TREE_MODELS = ('random_forest', 'decision_tree', 'xgboost', 'lightgbm')
+NATIVE_CONTRIB_MODELS = ('xgboost', 'lightgbm')
+UNSUPPORTED_MODELS = ('pytorch_nn',)
+
+
+@dataclass
+class Attributions:
+    features: list
+    values: np.ndarray   # (rows, features) SHAP values
+    base_value: float
+    data: np.ndarray     # the explained feature rows
+    method: str
+
+    def mean_abs(self):
+        """Mean |SHAP| per feature, largest first."""
+        importance = np.abs(self.values).mean(axis=0) if len(self.values) else np.zeros(len(self.features))
+        order = np.argsort(importance)[::-1]
+        return {self.features[i]: round(float(importance[i]), 6) for i in order}
+
+    def explanation(self):
+        import shap
+
+        return shap.Explanation(
+            values=self.values,
+            base_values=np.full(len(self.values), self.base_value),
+            data=self.data,
+            feature_names=self.features,
+        )
+
+    def as_dict(self):
+        return {
+            'method': self.method,
+            'rows': len(self.values),
+            'base_value': round(self.base_value, 6),
+            'features': list(self.features),
+            'feature_attributions': self.mean_abs(),
+            'shap_values': np.round(self.values, 6).tolist(),
+        }
+
+
+# ─── SAMPLING ───────────────────────────────────────────────
+
+def sample_frame(X: pd.DataFrame, n, seed=42) -> pd.DataFrame:
+    return X if len(X) <= n else X.sample(n=n, random_state=seed)
+
+
+def summarize_background(X: pd.DataFrame, n, method='kmeans', seed=42) -> pd.DataFrame:
+    """At most `n` background rows: k-means centroids or a random sample."""
+    if len(X) <= n:
+        return X
+    if method == 'kmeans':
+        from sklearn.cluster import KMeans
+
+        centers = KMeans(n_clusters=n, n_init=1, random_state=seed).fit(X.to_numpy()).cluster_centers_
+        return pd.DataFrame(centers, columns=X.columns)
+    return sample_frame(X, n, seed)
+
+
+# ─── EXPLAIN ────────────────────────────────────────────────
+
+def _native_contribs(model, model_name, X):
+    if model_name == 'xgboost':
+        import xgboost
+
+        contribs = model.get_booster().predict(xgboost.DMatrix(X), pred_contribs=True)
+    else:
+        contribs = model.predict(X, pred_contrib=True)
+    contribs = np.asarray(contribs)
+    # Last column is the bias term (the expected value).
+    return contribs[:, :-1], float(contribs[0, -1]) if len(contribs) else 0.0
+
+
+def explain(model, model_name, X: pd.DataFrame, background=None, background_rows=None) -> Attributions:
+    """SHAP values of `model` for every row of `X` (sample it first)."""
+    import shap
+
+    if model_name in UNSUPPORTED_MODELS:
+        raise ValueError(f"SHAP attributions are not available for {model_name}.")
+
+    if model_name in NATIVE_CONTRIB_MODELS:
+        values, base_value = _native_contribs(model, model_name, X)
+        method = 'native'
+    elif model_name in TREE_MODELS:
+        explainer = shap.TreeExplainer(model, feature_perturbation='tree_path_dependent')
+        values = explainer.shap_values(X, check_additivity=False)
+        base_value = float(np.ravel(explainer.expected_value)[0])
+        method = 'tree'
+    else:
+        background_rows = background_rows or settings.SHAP_BACKGROUND_ROWS
+        background = summarize_background(X if background is None else background, background_rows)
+        explanation = shap.Explainer(model, background)(X)
+        values = explanation.values
+        base_value = float(np.ravel(explanation.base_values)[0]) if len(X) else 0.0
+        method = 'generic'
+
+    return Attributions(
+        features=list(X.columns),
+        values=np.asarray(values, dtype=float).reshape(len(X), X.shape[1]),
+        base_value=base_value,
+        data=X.to_numpy(),
+        method=method,
+    )
+
+
+def plot_beeswarm(attributions: Attributions):
+    import matplotlib.pyplot as plt
+    import shap
+    from .eda import fig_to_base64
+
+    # beeswarm draws on the current figure (it has no `ax` argument).
+    plt.figure()
+    shap.plots.beeswarm(attributions.explanation(), show=False)
+    return fig_to_base64(plt.gcf())
+
+
+# ─── CACHE ──────────────────────────────────────────────────
+
+def explanation_cache_key(artifact, digest, rows, charts='png'):
+    from .models import PIPELINE_VERSION
+
+    return f"explain:v{PIPELINE_VERSION}:{artifact}:{rows}:{charts}:{digest}"
+
+
+def get_cached_explanation(artifact, digest, rows, charts='png'):
+    from .cache import get_result_cache
+
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    return get_result_cache().get(explanation_cache_key(artifact, digest, rows, charts))
+
+
+def cache_explanation(artifact, digest, rows, payload, charts='png'):
+    from .cache import get_result_cache
+
+    if settings.RESULT_CACHE_ENABLED:
+        get_result_cache().set(explanation_cache_key(artifact, digest, rows, charts), payload, tag=digest)
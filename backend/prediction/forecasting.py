@@ -0,0 +1,452 @@
+import time
+from dataclasses import dataclass, asdict
+import numpy as np
+import polars as pl
+from django.conf import settings
+
+# Time-series forecasting on the date axis.
+#
+# The upload is aggregated lazily to one row per (series, period) – the
+# target summed per day / week / month, optionally split by a group column –
+# and gaps are filled with zeros. Features are vectorized Polars window
+# expressions over each series: lags, rolling means / stds of the shifted
+# target, calendar parts and a trend index. One global model is fitted
+# across every series (series id is a feature), on the target's deviation
+# from its recent rolling mean.
+#
+# Multi-step forecasts are recursive: each step's predictions are fed back
+# as the lags of the next. Accuracy comes from time-ordered backtests –
+# expanding windows cut `horizon` periods apart at the end of the history,
+# each forecasting the full horizon – compared with a seasonal-naive
+# baseline. Prediction intervals are empirical: quantiles of the backtest
+# errors scaled by √step, applied per series and to the total.
+
+FREQUENCIES = {'D': '1d', 'W': '1w', 'M': '1mo'}
+LAGS = {'D': (1, 2, 3, 7, 14, 28), 'W': (1, 2, 3, 4, 8, 13, 26, 52), 'M': (1, 2, 3, 6, 12)}
+WINDOWS = {'D': (7, 28), 'W': (4, 13), 'M': (3, 12)}
+SEASONS = {'D': 7, 'W': 52, 'M': 12}
+FORECAST_MODELS = ('lightgbm', 'xgboost', 'random_forest')
+
+_SERIES = '__series'
+
+
+@dataclass
+class ForecastSpec:
+    horizon: int
+    frequency: str = 'auto'       # D / W / M, or inferred from the dates
+    model_name: str = 'lightgbm'
+    coverage: float = 0.9         # prediction interval coverage
+    date_column: str = None       # None = first column with 'date' in its name
+    target_column: str = None     # None = inferred like training
+    group_column: str = None      # one series per value; None = a single series
+    charts: str = 'png'           # forecast plot as png or json (prediction.charts)
+
+    def cache_key(self, digest):
+        options = ':'.join(f"{k}={v}" for k, v in sorted(asdict(self).items()))
+        return f"forecast:v{FORECAST_VERSION}:{options}:{digest}"
+
+
+# Bump whenever the forecast output changes (cached results are keyed on it).
+FORECAST_VERSION = 1
+
+
+def parse_spec(data) -> ForecastSpec:
+    """ForecastSpec from request data; raises ValueError on bad options."""
+    from .charts import resolve_charts
+
+    try:
+        horizon = int(data.get('horizon') or settings.FORECAST_DEFAULT_HORIZON)
+        coverage = float(data.get('coverage') or 0.9)
+    except (TypeError, ValueError):
+        raise ValueError("horizon must be an integer and coverage a number.")
+    if not 1 <= horizon <= settings.FORECAST_MAX_HORIZON:
+        raise ValueError(f"horizon must be between 1 and {settings.FORECAST_MAX_HORIZON}.")
+    if not 0 < coverage < 1:
+        raise ValueError("coverage must be between 0 and 1.")
+    frequency = data.get('frequency') or 'auto'
+    if frequency != 'auto' and frequency not in FREQUENCIES:
+        raise ValueError(f"frequency must be auto or one of {', '.join(FREQUENCIES)}.")
+    model_name = data.get('model') or 'lightgbm'
+    if model_name not in FORECAST_MODELS:
+        raise ValueError(f"model must be one of {', '.join(FORECAST_MODELS)}.")
+    return ForecastSpec(horizon, frequency, model_name, coverage,
+                        data.get('date') or None, data.get('target') or None, data.get('group') or None,
+                        resolve_charts(data.get('charts')))
+
+
+# ─── HISTORY ────────────────────────────────────────────────
+
+def _resolve_columns(schema, spec):
+    from .views import inter_target_column
+
+    columns = list(schema.names())
+    date_col = spec.date_column or next((c for c in columns if 'date' in c.lower()), None)
+    target_col = spec.target_column or inter_target_column(pl.DataFrame(schema=schema))
+    for name, col in (('date', date_col), ('target', target_col), ('group', spec.group_column)):
+        if name != 'group' and not col:
+            raise ValueError(f"No {name} column found; pass `{name}`.")
+        if col and col not in columns:
+            raise ValueError(f"Column '{col}' not found.")
+    return date_col, target_col, spec.group_column
+
+
+def _parse_dates(col, dtype):
+    if dtype == pl.Utf8:
+        return pl.col(col).str.strptime(pl.Datetime, strict=False)
+    return pl.col(col).cast(pl.Datetime)
+
+
+def infer_frequency(dates: pl.Series):
+    """D / W / M from the median spacing of the distinct dates."""
+    gaps = dates.unique().sort().diff().dt.total_days().drop_nulls()
+    spacing = gaps.median() if len(gaps) else 1
+    return 'D' if spacing <= 1.5 else 'W' if spacing <= 10 else 'M'
+
+
+def load_history(lf: pl.LazyFrame, spec: ForecastSpec):
+    """
+    (history, date_col, target_col, frequency): one row per (series, period)
+    with columns __series / ds / y, gap-free from each series' first period
+    to the last period overall. Only the aggregate is materialized.
+    """
+    schema = lf.collect_schema()
+    date_col, target_col, group_col = _resolve_columns(schema, spec)
+    series = pl.col(group_col).cast(pl.Utf8).fill_null('(missing)') if group_col else pl.lit('all')
+    rows = (lf.select(
+                series.alias(_SERIES),
+                _parse_dates(date_col, schema[date_col]).alias('ds'),
+                pl.col(target_col).cast(pl.Float64, strict=False).alias('y'))
+              .drop_nulls(['ds', 'y']))
+
+    frequency = spec.frequency
+    if frequency == 'auto':
+        frequency = infer_frequency(rows.select(pl.col('ds').dt.date()).collect()['ds'])
+    every = FREQUENCIES[frequency]
+
+    history = (rows.group_by(_SERIES, pl.col('ds').dt.truncate(every).dt.date())
+                   .agg(pl.col('y').sum())
+                   .collect())
+    if history.is_empty():
+        raise ValueError("No rows with both a parseable date and a numeric target.")
+
+    last = history['ds'].max()
+    grid = (history.group_by(_SERIES)
+                   .agg(pl.date_range(pl.col('ds').min(), pl.lit(last), every).alias('ds'))
+                   .explode('ds'))
+    history = (grid.join(history, on=[_SERIES, 'ds'], how='left')
+                   .with_columns(pl.col('y').fill_null(0.0))
+                   .sort(_SERIES, 'ds'))
+    return history, date_col, target_col, frequency
+
+
+# ─── FEATURES ───────────────────────────────────────────────
+
+def feature_exprs(frequency, lags, windows, series_codes):
+    """
+    Feature expressions over a frame with a `level` column (the rolling mean
+    of the first window). Lags and longer rolling means are relative to the
+    level, so the features stay in range as a series trends.
+    """
+    y = pl.col('y')
+    ds = pl.col('ds')
+    level = pl.col('level')
+    past = y.shift(1)
+    exprs = [(y.shift(lag).over(_SERIES) - level).alias(f"lag_{lag}") for lag in lags]
+    exprs += [(past.rolling_mean(window, min_samples=1).over(_SERIES) - level).alias(f"roll_mean_{window}")
+              for window in windows[1:]]
+    exprs += [past.rolling_std(window, min_samples=2).over(_SERIES).alias(f"roll_std_{window}")
+              for window in windows]
+    exprs += [
+        ds.dt.month().alias('month'),
+        ds.dt.quarter().alias('quarter'),
+        ds.dt.year().alias('year'),
+        ds.dt.epoch('d').alias('trend'),
+        pl.col(_SERIES).replace_strict(series_codes, return_dtype=pl.Int32).alias('series_id'),
+    ]
+    if frequency == 'D':
+        exprs += [ds.dt.weekday().alias('weekday'), ds.dt.day().alias('day')]
+    elif frequency == 'W':
+        exprs.append(ds.dt.week().alias('week'))
+    return exprs
+
+
+@dataclass
+class FeatureSet:
+    frequency: str
+    lags: tuple
+    windows: tuple
+    series_codes: dict
+
+    @classmethod
+    def for_history(cls, history, frequency):
+        # Lags/windows longer than a third of the history are mostly nulls.
+        periods = history.group_by(_SERIES).len()['len'].max()
+        limit = max(1, periods // 3)
+        series = sorted(history[_SERIES].unique().to_list())
+        return cls(frequency,
+                   tuple(lag for lag in LAGS[frequency] if lag <= limit) or (1,),
+                   tuple(w for w in WINDOWS[frequency] if w <= limit) or (min(2, limit),),
+                   {name: i for i, name in enumerate(series)})
+
+    @property
+    def tail(self):
+        """Rows of history per series that the features of the next period depend on."""
+        return max(max(self.lags), max(self.windows)) + 1
+
+    def build(self, frame: pl.DataFrame) -> pl.DataFrame:
+        level = pl.col('y').shift(1).rolling_mean(self.windows[0], min_samples=1).over(_SERIES)
+        return (frame.with_columns(level.alias('level'))
+                     .with_columns(feature_exprs(self.frequency, self.lags, self.windows, self.series_codes)))
+
+    @property
+    def columns(self):
+        names = [f"lag_{lag}" for lag in self.lags]
+        names += [f"roll_mean_{window}" for window in self.windows[1:]]
+        names += [f"roll_std_{window}" for window in self.windows]
+        names += ['level', 'month', 'quarter', 'year', 'trend', 'series_id']
+        if self.frequency == 'D':
+            names += ['weekday', 'day']
+        elif self.frequency == 'W':
+            names.append('week')
+        return names
+
+
+# ─── MODEL ──────────────────────────────────────────────────
+
+def _fit(features: FeatureSet, train: pl.DataFrame, model_name, n_jobs):
+    from .models import make_model
+
+    rows = train.filter(pl.col('level').is_not_null())
+    if rows.height < 2:
+        raise ValueError("Not enough history to fit a forecasting model.")
+    model = make_model(model_name, n_jobs)
+    # Trees can't extrapolate a trend, so they learn the deviation from the
+    # recent level and the level carries the trend.
+    model.fit(rows.select(features.columns).to_pandas(), (rows['y'] - rows['level']).to_numpy())
+    return model
+
+
+def recursive_forecast(model, features: FeatureSet, history: pl.DataFrame, horizon):
+    """
+    Forecast `horizon` periods past the end of `history` (gap-free, every
+    series ending on the same period), feeding predictions back as lags.
+    Returns __series / step / ds / prediction.
+    """
+    every = FREQUENCIES[features.frequency]
+    frame = history.select(_SERIES, 'ds', 'y').group_by(_SERIES, maintain_order=True).tail(features.tail)
+    last = frame['ds'].max()
+    series = frame.select(pl.col(_SERIES).unique(maintain_order=True))
+    steps = []
+    for step in range(1, horizon + 1):
+        next_rows = series.with_columns(
+            pl.lit(last).dt.offset_by(f"{step}{every[1:]}").alias('ds'),
+            pl.lit(None, dtype=pl.Float64).alias('y'),
+        )
+        built = features.build(pl.concat([frame, next_rows]).sort(_SERIES, 'ds'))
+        target = built.filter(pl.col('y').is_null())
+        prediction = target['level'].to_numpy() + model.predict(target.select(features.columns).to_pandas())
+        predicted = target.select(_SERIES, 'ds').with_columns(pl.Series('y', prediction, dtype=pl.Float64))
+        frame = (pl.concat([frame, predicted]).sort(_SERIES, 'ds')
+                   .group_by(_SERIES, maintain_order=True).tail(features.tail))
+        steps.append(predicted.with_columns(pl.lit(step).alias('step')))
+    return pl.concat(steps).rename({'y': 'prediction'}).select(_SERIES, 'step', 'ds', 'prediction')
+
+
+# ─── BACKTEST ───────────────────────────────────────────────
+
+def _errors(forecast, history):
+    """Join a forecast with the actuals; adds y and error (actual − prediction)."""
+    return (forecast.join(history.select(_SERIES, 'ds', 'y'), on=[_SERIES, 'ds'], how='inner')
+                    .with_columns((pl.col('y') - pl.col('prediction')).alias('error')))
+
+
+def _totals(frame, value_cols):
+    return frame.group_by('step', 'ds').agg([pl.col(c).sum() for c in value_cols]).sort('step')
+
+
+def metrics(actual, predicted):
+    actual, predicted = np.asarray(actual, dtype=float), np.asarray(predicted, dtype=float)
+    error = actual - predicted
+    denominator = np.abs(actual) + np.abs(predicted)
+    smape = np.divide(2 * np.abs(error), denominator, out=np.zeros_like(error), where=denominator > 0)
+    return {
+        'mae': round(float(np.mean(np.abs(error))), 4),
+        'rmse': round(float(np.sqrt(np.mean(error ** 2))), 4),
+        'smape': round(float(np.mean(smape)) * 100, 2),
+    }
+
+
+def seasonal_naive(history, cutoff, horizon, frequency):
+    """Each series' value one season (or one period, for short histories) before each step."""
+    every = FREQUENCIES[frequency]
+    train = history.filter(pl.col('ds') <= cutoff)
+    periods = train.group_by(_SERIES).len()['len'].min()
+    season = SEASONS[frequency] if periods >= SEASONS[frequency] else 1
+    unit = every[1:]
+    steps = pl.DataFrame({'step': range(1, horizon + 1)}).with_columns(
+        pl.lit(cutoff).dt.offset_by(pl.format("{}" + unit, pl.col('step'))).alias('ds'),
+        # The same phase in the last observed season.
+        pl.lit(cutoff).dt.offset_by(
+            pl.format("{}" + unit, (pl.col('step') - 1) % season + 1 - season)).alias('source'))
+    return (train.select(_SERIES, pl.col('ds').alias('source'), pl.col('y').alias('prediction'))
+                 .join(steps, on='source', how='inner')
+                 .select(_SERIES, 'step', 'ds', 'prediction'))
+
+
+def backtest(features, history, spec, frequency, n_jobs):
+    """
+    Expanding-window backtest: up to FORECAST_FOLDS cutoffs `horizon`
+    periods apart. Returns (per-fold metrics, errors frame) – the errors
+    carry step / y / prediction / baseline for every forecast point.
+    """
+    periods = history['ds'].unique().sort()
+    built = features.build(history)
+    folds, errors = [], []
+    for k in range(settings.FORECAST_FOLDS, 0, -1):
+        cut = len(periods) - k * spec.horizon - 1
+        if cut < max(features.lags[0] + 1, spec.horizon):
+            continue
+        cutoff = periods[cut]
+        train = history.filter(pl.col('ds') <= cutoff)
+        model = _fit(features, built.filter(pl.col('ds') <= cutoff), spec.model_name, n_jobs)
+        fold = _errors(recursive_forecast(model, features, train, spec.horizon), history)
+        baseline = seasonal_naive(history, cutoff, spec.horizon, frequency).rename({'prediction': 'baseline'})
+        fold = fold.join(baseline.drop('step'), on=[_SERIES, 'ds'], how='left')
+        folds.append({'cutoff': cutoff.isoformat(), 'rows': train.height,
+                      **metrics(fold['y'], fold['prediction'])})
+        errors.append(fold.with_columns(pl.lit(len(folds)).alias('fold')))
+    if not errors:
+        raise ValueError(f"Not enough history to backtest a {spec.horizon}-period horizon.")
+    return folds, pl.concat(errors)
+
+
+def interval_quantiles(errors: pl.DataFrame, coverage):
+    """Quantiles of error / √step at (1 ± coverage) / 2."""
+    scaled = (errors['error'] / errors['step'].cast(pl.Float64).sqrt()).to_numpy()
+    alpha = (1 - coverage) / 2
+    return float(np.quantile(scaled, alpha)), float(np.quantile(scaled, 1 - alpha))
+
+
+def _with_interval(frame, quantiles, non_negative):
+    low, high = quantiles
+    root = pl.col('step').cast(pl.Float64).sqrt()
+    lower = pl.col('prediction') + low * root
+    frame = frame.with_columns(lower.alias('lower'), (pl.col('prediction') + high * root).alias('upper'))
+    if non_negative:
+        frame = frame.with_columns(pl.col('prediction', 'lower', 'upper').clip(lower_bound=0))
+    return frame
+
+
+# ─── FORECAST ───────────────────────────────────────────────
+
+def plot_forecast_horizon(data, target_col, coverage):
+    import matplotlib.pyplot as plt
+    from .eda import fig_to_base64
+
+    fig, ax = plt.subplots(figsize=(9, 4))
+    ax.plot(data['history_ds'], data['history_y'], label='history')
+    ax.plot(data['ds'], data['prediction'], marker='o', markersize=3, label='forecast')
+    ax.fill_between(data['ds'], data['lower'], data['upper'], alpha=0.25,
+                    label=f"{coverage:.0%} interval")
+    ax.set_title(f"{target_col} forecast")
+    ax.set_ylabel(target_col)
+    ax.legend()
+    fig.autofmt_xdate()
+    return fig_to_base64(fig)
+
+
+def forecast(lf: pl.LazyFrame, spec: ForecastSpec, trace=None, n_jobs=None):
+    """
+    Backtest, refit on the full history and forecast `spec.horizon` periods;
+    returns the JSON report. Runs in a prediction.compute slot of `n_jobs` threads.
+    """
+    from .compute import compute_slot
+
+    with compute_slot(n_jobs, trace) as threads:
+        return _forecast(lf, spec, trace, threads)
+
+
+def _forecast(lf, spec, trace, n_jobs):
+    from .charts import draw_all
+    from .profiling import trace_mark
+
+    start = time.perf_counter()
+    trace_mark(trace, 'history')
+    history, date_col, target_col, frequency = load_history(lf, spec)
+    features = FeatureSet.for_history(history, frequency)
+    non_negative = history['y'].min() >= 0
+    grouped = spec.group_column is not None
+
+    trace_mark(trace, 'backtest')
+    folds, errors = backtest(features, history, spec, frequency, n_jobs)
+    total_errors = _totals(errors, ['y', 'prediction']).with_columns(
+        (pl.col('y') - pl.col('prediction')).alias('error'))
+    baseline = errors.drop_nulls('baseline')
+
+    trace_mark(trace, 'fitting')
+    model = _fit(features, features.build(history), spec.model_name, n_jobs)
+    trace_mark(trace, 'forecast')
+    future = recursive_forecast(model, features, history, spec.horizon)
+    future = _with_interval(future, interval_quantiles(errors, spec.coverage), non_negative)
+    total = _with_interval(_totals(future, ['prediction']), interval_quantiles(total_errors, spec.coverage),
+                           non_negative)
+
+    trace_mark(trace, 'rendering')
+    history_total = history.group_by('ds').agg(pl.col('y').sum()).sort('ds').tail(8 * spec.horizon)
+    plot = draw_all({
+        'history_ds': history_total['ds'].to_list(), 'history_y': history_total['y'].to_numpy(),
+        'ds': total['ds'].to_list(), 'prediction': total['prediction'].to_numpy(),
+        'lower': total['lower'].to_numpy(), 'upper': total['upper'].to_numpy(),
+    }, [('forecast', plot_forecast_horizon, {'target_col': target_col, 'coverage': spec.coverage})],
+        spec.charts)['forecast']
+
+    def rows(frame):
+        columns = ['step', 'ds', 'prediction', 'lower', 'upper']
+        if _SERIES in frame.columns:
+            frame = frame.rename({_SERIES: spec.group_column})
+            columns.insert(0, spec.group_column)
+        return frame.select(columns).with_columns(pl.col('ds').dt.to_string('%Y-%m-%d'),
+                                                  pl.col('prediction', 'lower', 'upper').round(4)).to_dicts()
+
+    by_step = (errors.group_by('step')
+                     .agg(pl.col('error').abs().mean().round(4).alias('mae'))
+                     .sort('step').to_dicts())
+    return {
+        'target_column': target_col,
+        'date_column': date_col,
+        'group_column': spec.group_column,
+        'frequency': frequency,
+        'horizon': spec.horizon,
+        'model_name': spec.model_name,
+        'coverage': spec.coverage,
+        'history': {'periods': history['ds'].n_unique(), 'series': len(features.series_codes),
+                    'start': history['ds'].min().isoformat(), 'end': history['ds'].max().isoformat()},
+        'features': features.columns,
+        'backtest': {
+            'folds': folds,
+            **metrics(errors['y'], errors['prediction']),
+            'baseline': metrics(baseline['y'], baseline['baseline']) if baseline.height else None,
+            'by_step': by_step,
+        },
+        'forecast': rows(future if grouped else future.drop(_SERIES)),
+        'total': rows(total) if grouped else None,
+        'forecast_plot': plot,
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+
+
+# ─── CACHE ──────────────────────────────────────────────────
+
+def get_cached_forecast(spec, digest):
+    from .cache import get_result_cache
+
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    return get_result_cache().get(spec.cache_key(digest))
+
+
+def cache_forecast(spec, digest, payload):
+    from .cache import get_result_cache
+
+    if settings.RESULT_CACHE_ENABLED:
+        get_result_cache().set(spec.cache_key(digest), payload, tag=digest)
@@ -0,0 +1,221 @@
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict
+import uuid
+import numpy as np
+import polars as pl
+import pyarrow as pa
+from django.conf import settings
+from .spool import decompressed_path
+
+# Bounded-memory ingestion of spooled uploads.
+#
+# The format is sniffed from magic bytes, not the file name: Parquet and
+# Arrow IPC (Feather v2) are scanned lazily and memory-mapped, CSV through
+# `scan_csv`, and gzip/zstd CSV is stream-decompressed once next to the spool.
+# Schema and row count come from the lazy scan (projection pushdown, no data
+# materialized; free from the footer for columnar files). Files that fit the
+# requested sample are collected directly. Larger CSVs are streamed in
+# batches through a reservoir that keeps the k rows with the smallest random
+# keys – a uniform sample without replacement whose memory is O(k + batch),
+# independent of file size; columnar files gather k random row indices.
+
+logger = logging.getLogger(__name__)
+
+_ROW = '__ingest_row'
+_KEY = '__ingest_key'
+
+
+class IngestLimitError(ValueError):
+    """Upload exceeds INGEST_MAX_BYTES."""
+
+
+@dataclass
+class IngestStats:
+    format: str        # as uploaded: csv / gzip / zstd / parquet / ipc
+    rows: int          # rows in the file (after the INGEST_MAX_ROWS cap)
+    columns: int
+    bytes: int         # upload size on disk
+    rows_loaded: int   # rows actually materialized
+    sampled: bool
+    truncated: bool    # stopped at INGEST_MAX_ROWS
+    seconds: float
+
+    def as_dict(self):
+        seconds = max(self.seconds, 1e-9)
+        return {
+            **asdict(self),
+            'seconds': round(self.seconds, 4),
+            'rows_per_s': round(self.rows / seconds),
+            'mb_per_s': round(self.bytes / seconds / 1e6, 2),
+        }
+
+
+def check_upload_size(nbytes, max_bytes=None):
+    max_bytes = settings.INGEST_MAX_BYTES if max_bytes is None else max_bytes
+    if max_bytes and nbytes > max_bytes:
+        raise IngestLimitError(
+            f"Upload is {nbytes / 1e6:.1f} MB; the limit is {max_bytes / 1e6:.1f} MB."
+        )
+
+
+# ─── FORMAT DETECTION ───────────────────────────────────────
+
+FORMAT_CSV     = 'csv'
+FORMAT_PARQUET = 'parquet'
+FORMAT_IPC     = 'ipc'
+FORMAT_GZIP    = 'gzip'
+FORMAT_ZSTD    = 'zstd'
+
+_MAGIC = (
+    (b'PAR1', FORMAT_PARQUET),
+    (b'ARROW1', FORMAT_IPC),
+    (b'\x1f\x8b', FORMAT_GZIP),
+    (b'\x28\xb5\x2f\xfd', FORMAT_ZSTD),
+)
+COMPRESSED_FORMATS = (FORMAT_GZIP, FORMAT_ZSTD)
+
+
+def detect_format(path):
+    with open(path, 'rb') as fh:
+        head = fh.read(8)
+    return next((fmt for magic, fmt in _MAGIC if head.startswith(magic)), FORMAT_CSV)
+
+
+def decompress_upload(path, codec, max_bytes=None):
+    """
+    Stream-decompress a gzip/zstd CSV to `<spool>/decompressed/<name>.csv`
+    (reused on later reads). The byte limit applies to the decompressed size
+    too, so a small archive can't expand without bound.
+    """
+    max_bytes = settings.INGEST_MAX_BYTES if max_bytes is None else max_bytes
+    out_path = decompressed_path(path)
+    out_dir = os.path.dirname(out_path)
+    if os.path.exists(out_path):
+        check_upload_size(os.path.getsize(out_path), max_bytes)
+        return out_path
+
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_path = f"{out_path}.{uuid.uuid4().hex}.part"
+    written = 0
+    try:
+        with pa.input_stream(path, compression=codec) as src, open(tmp_path, 'wb') as out:
+            while chunk := src.read(1 << 20):
+                written += len(chunk)
+                check_upload_size(written, max_bytes)
+                out.write(chunk)
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return out_path
+
+
+def _resolve(path, max_bytes=None):
+    """(readable path, format) with compressed CSV unpacked; format is csv/parquet/ipc."""
+    fmt = detect_format(path)
+    if fmt in COMPRESSED_FORMATS:
+        return decompress_upload(path, fmt, max_bytes), FORMAT_CSV
+    return path, fmt
+
+
+def scan_upload(path, columns=None, max_rows=None):
+    """LazyFrame over a spooled upload, projected to `columns` and capped at `max_rows`."""
+    path, fmt = _resolve(path)
+    return _scan(path, fmt, columns, max_rows)
+
+
+def _scan(path, fmt, columns=None, max_rows=None):
+    n_rows = max_rows or None
+    if fmt == FORMAT_PARQUET:
+        lf = pl.scan_parquet(path, n_rows=n_rows)
+    elif fmt == FORMAT_IPC:
+        lf = pl.scan_ipc(path, n_rows=n_rows, memory_map=True)
+    else:
+        lf = pl.scan_csv(path, n_rows=n_rows)
+    return lf.select(columns) if columns else lf
+
+
+def reservoir_sample(path, k, columns=None, max_rows=None, seed=42, batch_rows=None):
+    """Uniform sample of `k` rows streamed from a CSV at `path`, in original file order."""
+    batch_rows = batch_rows or settings.INGEST_BATCH_ROWS
+    schema = _scan(path, FORMAT_CSV, columns).collect_schema()
+    reader = pl.read_csv_batched(
+        path,
+        columns=list(schema.names()),
+        schema_overrides=dict(schema),
+        batch_size=batch_rows,
+        n_rows=max_rows or None,
+    )
+
+    rng = np.random.default_rng(seed)
+    reservoir = None
+    seen = 0
+    while batches := reader.next_batches(4):
+        for batch in batches:
+            batch = batch.with_columns(
+                pl.int_range(seen, seen + batch.height, eager=True).alias(_ROW),
+                pl.Series(_KEY, rng.random(batch.height)),
+            )
+            seen += batch.height
+            if reservoir is not None:
+                batch = pl.concat([reservoir, batch], how='vertical_relaxed')
+            reservoir = batch.bottom_k(k, by=_KEY)
+
+    if reservoir is None:
+        return pl.DataFrame(schema=schema)
+    return reservoir.sort(_ROW).drop(_ROW, _KEY)
+
+
+def index_sample(lf, n_rows, k, seed=42):
+    """Uniform sample of `k` of `n_rows` rows by row index – for columnar scans."""
+    rng = np.random.default_rng(seed)
+    rows = pl.Series(_ROW, np.sort(rng.choice(n_rows, size=k, replace=False)), dtype=pl.UInt32)
+    return (lf.with_row_index(_ROW)
+              .filter(pl.col(_ROW).is_in(rows.implode()))
+              .drop(_ROW)
+              .collect(engine='streaming'))
+
+
+def read_upload(path, sample_rows=None, columns=None, max_rows=None, max_bytes=None, seed=42):
+    """
+    Load a spooled upload with bounded memory; returns (DataFrame, IngestStats).
+    At most `sample_rows` rows are materialized (None = all of them).
+    """
+    start = time.perf_counter()
+    nbytes = os.path.getsize(path)
+    check_upload_size(nbytes, max_bytes)
+    max_rows = settings.INGEST_MAX_ROWS if max_rows is None else max_rows
+
+    upload_format = detect_format(path)
+    path, fmt = _resolve(path, max_bytes)
+    lf = _scan(path, fmt, columns, max_rows)
+    n_columns = len(lf.collect_schema())
+    # Count one row past the cap: a file of exactly `max_rows` rows isn't truncated.
+    probe = _scan(path, fmt, columns, max_rows + 1) if max_rows else lf
+    n_rows = probe.select(pl.len()).collect().item()
+    truncated = bool(max_rows) and n_rows > max_rows
+    if truncated:
+        n_rows = max_rows
+
+    sampled = bool(sample_rows) and n_rows > sample_rows
+    if not sampled:
+        df = lf.collect()
+    elif fmt == FORMAT_CSV:
+        df = reservoir_sample(path, sample_rows, columns, max_rows, seed)
+    else:
+        df = index_sample(lf, n_rows, sample_rows, seed)
+
+    stats = IngestStats(
+        format=upload_format,
+        rows=n_rows,
+        columns=n_columns,
+        bytes=nbytes,
+        rows_loaded=df.height,
+        sampled=sampled,
+        truncated=truncated,
+        seconds=time.perf_counter() - start,
+    )
+    logger.info("Ingested %s: %s", os.path.basename(path), stats.as_dict())
+    return df, stats
@@ -0,0 +1,557 @@
+import logging
+import os
+import time
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+from django.utils import timezone
+from database.blobs import externalize_graphs
+from .cache import cache_result, get_cached_result
+from .ingest import check_upload_size, read_upload, scan_upload
+from .profiling import Trace
+from .spool import spool_upload, sweep_spool
+
+# NOTE: database models are imported inside functions so this module can be
+# unpickled by spawned pool workers before Django's app registry is ready.
+
+logger = logging.getLogger(__name__)
+
+
+# ─── ENQUEUE ────────────────────────────────────────────────
+
+def enqueue_training_job(owner, upload, model_name, diagnostics=None, sampling=None, charts=None):
+    """
+    Spool the upload and queue a job for it. If the same bytes were already
+    trained with this model, diagnostics tier, sampling strategy and chart
+    format, the job is completed from the result cache immediately and
+    never reaches a worker.
+    """
+    from database.models import TrainingJob
+    from .charts import resolve_charts
+    from .models import MODEL_NAMES, resolve_diagnostics
+    from .sampling import resolve_sampling
+
+    if model_name not in MODEL_NAMES:
+        raise ValueError(f"model must be one of {', '.join(MODEL_NAMES)}.")
+    diagnostics = resolve_diagnostics(diagnostics)
+    sampling = resolve_sampling(sampling)
+    charts = resolve_charts(charts)
+    check_upload_size(upload.size)
+    path, digest = spool_upload(upload)
+    job = TrainingJob.objects.create(
+        owner=owner,
+        file_name=upload.name,
+        model_name=model_name,
+        diagnostics=diagnostics,
+        sampling=sampling,
+        charts=charts,
+        upload_path=path,
+        dataset_digest=digest,
+    )
+
+    cached = get_cached_result(digest, model_name, **_cache_options(job))
+    if cached is not None:
+        job.started_at = timezone.now()
+        complete_job(job, cached["result"], cached["data_shape"], cached.get("artifact"))
+    return job
+
+
+def enqueue_comparison_job(owner, upload, model_names, diagnostics=None, sampling=None, charts=None):
+    """
+    Spool the upload and queue one job that fits every model in
+    `model_names` on a single parse/split. Completes immediately when every
+    model's result is already cached.
+    """
+    from database.models import TrainingJob
+    from .charts import resolve_charts
+    from .models import MODEL_NAMES, resolve_diagnostics
+    from .sampling import resolve_sampling
+
+    unknown = [name for name in model_names if name not in MODEL_NAMES]
+    if unknown or not model_names:
+        raise ValueError(f"models must be a non-empty subset of {', '.join(MODEL_NAMES)}.")
+    diagnostics = resolve_diagnostics(diagnostics)
+    sampling = resolve_sampling(sampling)
+    charts = resolve_charts(charts)
+    check_upload_size(upload.size)
+    path, digest = spool_upload(upload)
+    job = TrainingJob.objects.create(
+        owner=owner,
+        kind=TrainingJob.KIND_COMPARE,
+        file_name=upload.name,
+        model_name='compare',
+        model_names=list(dict.fromkeys(model_names)),
+        diagnostics=diagnostics,
+        sampling=sampling,
+        charts=charts,
+        upload_path=path,
+        dataset_digest=digest,
+    )
+
+    cached = {name: get_cached_result(digest, name, **_cache_options(job)) for name in job.model_names}
+    if all(entry is not None for entry in cached.values()):
+        job.started_at = timezone.now()
+        data_shape = next(iter(cached.values()))["data_shape"]
+        complete_comparison(job, {name: _cached_outcome(entry) for name, entry in cached.items()}, data_shape)
+    return job
+
+
+def enqueue_tuning_job(owner, upload, model_name, budget_seconds=None, diagnostics=None, sampling=None,
+                       charts=None):
+    """
+    Spool the upload and queue a hyperparameter search for `model_name`
+    within `budget_seconds` (prediction.tuning). The tuned model is saved
+    as `<model_name>_tuned` next to the untuned result.
+    """
+    from database.models import TrainingJob
+    from .charts import resolve_charts
+    from .models import MODEL_NAMES, resolve_diagnostics
+    from .sampling import resolve_sampling
+    from .tuning import resolve_budget
+
+    if model_name not in MODEL_NAMES:
+        raise ValueError(f"model must be one of {', '.join(MODEL_NAMES)}.")
+    budget_seconds = resolve_budget(budget_seconds)
+    diagnostics = resolve_diagnostics(diagnostics)
+    sampling = resolve_sampling(sampling)
+    charts = resolve_charts(charts)
+    check_upload_size(upload.size)
+    path, digest = spool_upload(upload)
+    job = TrainingJob.objects.create(
+        owner=owner,
+        kind=TrainingJob.KIND_TUNE,
+        file_name=upload.name,
+        model_name=f"{model_name}_tuned",
+        model_names=[model_name],
+        budget_seconds=budget_seconds,
+        diagnostics=diagnostics,
+        sampling=sampling,
+        charts=charts,
+        upload_path=path,
+        dataset_digest=digest,
+    )
+
+    cached = get_cached_result(digest, job.model_name, **_cache_options(job))
+    if cached is not None:
+        job.started_at = timezone.now()
+        complete_job(job, cached["result"], cached["data_shape"], cached.get("artifact"))
+    return job
+
+
+def _cache_options(job):
+    """Result-cache key options for `job` (prediction.cache)."""
+    options = {"diagnostics": job.diagnostics, "sampling": job.sampling, "charts": job.charts}
+    if job.budget_seconds:
+        options["budget"] = job.budget_seconds
+    return options
+
+
+def serialize_job(job, debug=False):
+    """Job status payload; `debug` adds the per-stage profiling trace."""
+    from database.models import TrainedModel, TrainingJob
+
+    payload = {
+        "job_id":     job.id,
+        "status":     job.status,
+        "progress":   job.progress,
+        "stage":      job.stage,
+        "file_name":  job.file_name,
+        "kind":       job.kind,
+        "model_name": job.model_name,
+        "diagnostics": job.diagnostics,
+        "sampling":   job.sampling,
+        "charts":     job.charts,
+        "dataset_hash": job.dataset_digest or None,
+        "error":      job.error or None,
+        "result_id":  job.saved_result_id,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == TrainingJob.STATUS_DONE and job.saved_result is not None:
+        payload["result"] = job.saved_result.model_result
+        if TrainedModel.objects.filter(saved_result=job.saved_result).exists():
+            payload["score_url"] = reverse('score-model', args=[job.saved_result_id])
+            payload["explain_url"] = reverse('explain-model', args=[job.saved_result_id])
+    if job.kind == TrainingJob.KIND_COMPARE:
+        payload["models"] = job.model_names
+        payload["leaderboard"] = job.leaderboard
+    if job.kind == TrainingJob.KIND_TUNE:
+        payload["budget_seconds"] = job.budget_seconds
+    if debug:
+        payload["trace"] = job.trace
+    return payload
+
+
+# ─── PERSIST ────────────────────────────────────────────────
+
+def persist_model_result(owner, file_name, model_name, result, data_shape):
+    """Create or update the SavedResult row for (owner, file, model)."""
+    from database.models import SavedResult
+
+    saved_obj = SavedResult.objects.filter(
+        owner=owner,
+        file_name=file_name,
+        model_name=model_name
+    ).first()
+
+    if saved_obj:
+        saved_obj.model_result = result
+        saved_obj.inferred_target = result.get('target_column') or saved_obj.inferred_target
+        saved_obj.data_shape = data_shape
+        saved_obj.save()
+        return saved_obj
+
+    return SavedResult.objects.create(
+        owner=owner,
+        file_name=file_name,
+        model_name=model_name,
+        model_result=result,
+        inferred_target=result.get('target_column') or '',
+        data_shape=data_shape
+    )
+
+
+# ─── EXECUTE ────────────────────────────────────────────────
+
+def claim_next_job():
+    """Atomically flip the oldest queued job to running; returns its id or None."""
+    from database.models import TrainingJob
+
+    while True:
+        job_id = (TrainingJob.objects
+                  .filter(status=TrainingJob.STATUS_QUEUED)
+                  .order_by('created_at')
+                  .values_list('id', flat=True)
+                  .first())
+        if job_id is None:
+            return None
+
+        # A conditional UPDATE is the claim: only one worker can win it,
+        # on Postgres and SQLite alike.
+        claimed = TrainingJob.objects.filter(
+            pk=job_id, status=TrainingJob.STATUS_QUEUED
+        ).update(status=TrainingJob.STATUS_RUNNING, stage='starting', started_at=timezone.now())
+        if claimed:
+            return job_id
+
+
+def run_job(job_id):
+    """Run one claimed training job to completion and record the outcome."""
+    from database.models import TrainingJob
+    from .models import train_model_pipeline
+    from .registry import store_bundle
+    from .sampling import plan_sample
+    from .serialization import sanitize_for_json
+
+    job = TrainingJob.objects.select_related('owner').get(pk=job_id)
+
+    def progress(percent, stage):
+        TrainingJob.objects.filter(pk=job_id).update(progress=percent, stage=stage)
+
+    try:
+        # A duplicate may have finished while this one sat in the queue.
+        cached = (get_cached_result(job.dataset_digest, job.model_name, **_cache_options(job))
+                  if job.dataset_digest else None)
+        if cached is not None:
+            return complete_job(job, cached["result"], cached["data_shape"], cached.get("artifact"))
+
+        trace = Trace(job.kind)
+        try:
+            progress(2, "ingesting")
+            trace.mark("ingest")
+            n_features = len(scan_upload(job.upload_path).collect_schema()) - 1
+            plan = plan_sample(job.sampling, job.model_names or [job.model_name], n_features)
+            df, stats = read_upload(job.upload_path, sample_rows=plan.ingest_rows)
+            if job.kind == TrainingJob.KIND_COMPARE:
+                return run_comparison(job, df, stats, progress, trace, plan)
+            if job.kind == TrainingJob.KIND_TUNE:
+                result, bundle = run_tuning(job, df, progress, trace, plan)
+            else:
+                result, bundle = train_model_pipeline(df, job.model_name, progress=progress,
+                                                      return_model=True, trace=trace,
+                                                      diagnostics=job.diagnostics, sampling=plan,
+                                                      charts=job.charts)
+            trace.mark("persist")
+            result["ingest"] = stats.as_dict()
+            result = externalize_graphs(sanitize_for_json(result))
+            data_shape = f"{stats.rows} rows, {stats.columns} columns"
+            artifact = store_bundle(bundle)
+
+            if job.dataset_digest:
+                cache_result(job.dataset_digest, job.model_name,
+                             {"result": result, "data_shape": data_shape, "artifact": artifact},
+                             **_cache_options(job))
+            return complete_job(job, result, data_shape, artifact)
+        finally:
+            TrainingJob.objects.filter(pk=job_id).update(trace=trace.finish())
+    except Exception as e:
+        logger.exception("Training job %s failed", job_id)
+        job.status = TrainingJob.STATUS_FAILED
+        job.error = str(e)
+        job.stage = 'failed'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'stage', 'error', 'finished_at'])
+        return job.status
+
+
+def complete_job(job, result, data_shape, artifact=None):
+    """Persist `result` (and the fitted model, if any) into SavedResult and mark the job done."""
+    from database.blobs import get_artifact_store
+    from database.models import TrainingJob
+    from .registry import register_model
+
+    job.saved_result = persist_model_result(
+        job.owner,
+        job.file_name,
+        job.model_name,
+        result,
+        data_shape
+    )
+    if artifact and get_artifact_store().exists(artifact):
+        register_model(job.saved_result, artifact, job.model_name, result)
+    job.status = TrainingJob.STATUS_DONE
+    job.progress = 100
+    job.stage = 'done'
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['saved_result', 'status', 'progress', 'stage', 'error', 'started_at', 'finished_at'])
+    return job.status
+
+
+# ─── TUNE ───────────────────────────────────────────────────
+
+def run_tuning(job, df, progress, trace, plan):
+    """Search hyperparameters within the job's budget, then fit the winner like any other model."""
+    from .models import fit_model, prepare_training_data, render_report
+    from .tuning import tune
+
+    model_name = job.model_names[0]
+    progress(5, "preprocessing")
+    trace.mark("preprocessing")
+    data = prepare_training_data(df, plan)
+
+    trace.mark("tuning")
+    params, tuning = tune(data, model_name, job.budget_seconds, progress=progress)
+    fit = fit_model(data, model_name, progress, trace, job.diagnostics, return_model=True, params=params)
+    result = render_report(fit, trace, job.charts)
+    result["tuning"] = tuning
+    return result, fit.bundle
+
+
+# ─── COMPARE ────────────────────────────────────────────────
+
+def _cached_outcome(entry):
+    return {"result": entry["result"], "artifact": entry.get("artifact"), "cached": True}
+
+
+def run_comparison(job, df, stats, progress, trace, plan=None):
+    """Fit every model of a compare job on one shared split and record the leaderboard."""
+    from .compare import compare_models
+    from .models import prepare_training_data, render_report
+    from .registry import store_bundle
+    from .serialization import sanitize_for_json
+
+    digest = job.dataset_digest
+    data_shape = f"{stats.rows} rows, {stats.columns} columns"
+    outcomes = {}
+    for name in job.model_names:
+        cached = get_cached_result(digest, name, **_cache_options(job)) if digest else None
+        if cached is not None:
+            outcomes[name] = _cached_outcome(cached)
+    pending = [name for name in job.model_names if name not in outcomes]
+
+    progress(5, "preprocessing")
+    trace.mark("preprocessing")
+    data = prepare_training_data(df, plan) if pending else None
+
+    trace.mark("fitting")
+    fits = []
+    for done, (name, fit) in enumerate(compare_models(data, pending, job.diagnostics), 1):
+        progress(10 + 70 * done // len(pending), f"fitted {name}")
+        if isinstance(fit, Exception):
+            logger.error("Comparison job %s: %s failed: %s", job.id, name, fit)
+            outcomes[name] = {"error": str(fit)}
+        else:
+            trace.add(f"fit:{name}", fit.seconds)
+            fits.append((name, fit))
+
+    if not fits and all("error" in outcome for outcome in outcomes.values()):
+        raise ValueError(next(iter(outcomes.values()))["error"])
+
+    progress(85, "rendering")
+    trace.mark("rendering")
+    for name, fit in fits:
+        result = render_report(fit, trace, job.charts)
+        result["ingest"] = stats.as_dict()
+        result = externalize_graphs(sanitize_for_json(result))
+        artifact = store_bundle(fit.bundle)
+        if digest:
+            cache_result(digest, name, {"result": result, "data_shape": data_shape, "artifact": artifact},
+                         **_cache_options(job))
+        outcomes[name] = {"result": result, "artifact": artifact, "cached": False,
+                          "fit_seconds": round(fit.fit_seconds, 4), "seconds": round(fit.seconds, 4)}
+
+    trace.mark("persist")
+    return complete_comparison(job, outcomes, data_shape)
+
+
+def complete_comparison(job, outcomes, data_shape):
+    """Save each model's result as its own SavedResult and store the ranked leaderboard."""
+    from database.blobs import get_artifact_store
+    from database.models import TrainingJob
+    from .registry import register_model
+
+    leaderboard = []
+    for name in job.model_names:
+        outcome = outcomes[name]
+        if "error" in outcome:
+            leaderboard.append({"model_name": name, "error": outcome["error"]})
+            continue
+        result = outcome["result"]
+        saved = persist_model_result(job.owner, job.file_name, name, result, data_shape)
+        if outcome["artifact"] and get_artifact_store().exists(outcome["artifact"]):
+            register_model(saved, outcome["artifact"], name, result)
+        leaderboard.append({
+            "model_name":  name,
+            "rmse":        result["rmse"],
+            "r2_score":    result["r2_score"],
+            "fit_seconds": outcome.get("fit_seconds"),
+            "seconds":     outcome.get("seconds"),
+            "cached":      outcome["cached"],
+            "result_id":   saved.id,
+            "score_url":   reverse('score-model', args=[saved.id]),
+        })
+
+    leaderboard.sort(key=lambda row: ("error" in row, row.get("rmse", 0)))
+    for rank, row in enumerate(leaderboard, 1):
+        row["rank"] = rank
+    job.leaderboard = leaderboard
+    job.status = TrainingJob.STATUS_DONE
+    job.progress = 100
+    job.stage = 'done'
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['leaderboard', 'status', 'progress', 'stage', 'error', 'started_at', 'finished_at'])
+    return job.status
+
+
+# ─── WORKER POOL ────────────────────────────────────────────
+
+def _init_worker():
+    import django
+    import joblib
+    from django.apps import apps
+
+    if not apps.ready:  # spawn start method: fresh interpreter
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sales_predictor.settings')
+        django.setup()
+    # Never share the parent's DB sockets across a fork.
+    connections.close_all()
+    # Jobs already run in their own processes; keep sklearn's n_jobs on
+    # threads so loky doesn't nest a second process pool inside each worker.
+    joblib.parallel_config(backend='threading')
+
+    from .nn import warm_up
+    from .rendering import warm_render_pool
+    warm_up()
+    warm_render_pool()
+
+
+def _run_job_in_worker(job_id):
+    try:
+        return run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def sweep_uploads(max_age_seconds=None):
+    """Expire old spooled uploads, keeping those of queued / running jobs."""
+    from database.models import TrainingJob
+
+    active = (TrainingJob.objects
+              .filter(status__in=[TrainingJob.STATUS_QUEUED, TrainingJob.STATUS_RUNNING])
+              .values_list('upload_path', flat=True))
+    removed = sweep_spool(max_age_seconds, keep=list(active))
+    if removed:
+        logger.info("Swept %d expired spooled upload(s)", removed)
+    return removed
+
+
+def reap_stale_jobs(exclude=(), max_minutes=None):
+    """
+    Fail `running` jobs started more than `max_minutes` (default
+    TRAINING_JOB_TIMEOUT_MINUTES) ago – their worker died without recording
+    an outcome. Jobs in `exclude` (this worker's own) are left alone.
+    """
+    from database.models import TrainingJob
+
+    max_minutes = settings.TRAINING_JOB_TIMEOUT_MINUTES if max_minutes is None else max_minutes
+    cutoff = timezone.now() - timedelta(minutes=max_minutes)
+    reaped = (TrainingJob.objects
+              .filter(status=TrainingJob.STATUS_RUNNING, started_at__lt=cutoff)
+              .exclude(pk__in=list(exclude))
+              .update(status=TrainingJob.STATUS_FAILED, stage='failed',
+                      error="Job timed out or its worker stopped.", finished_at=timezone.now()))
+    if reaped:
+        logger.warning("Reaped %d stale training job(s)", reaped)
+    return reaped
+
+
+# Stale jobs are reaped and the spool swept at startup, then at most this
+# often while polling.
+HOUSEKEEPING_INTERVAL = 600
+
+
+def run_worker(max_workers=None, poll_interval=None, once=False):
+    """
+    Poll the DB-backed queue and execute jobs on a bounded process pool.
+    At most `max_workers` jobs run at a time; the rest stay queued.
+    """
+    max_workers = max_workers or settings.TRAINING_WORKERS
+    poll_interval = poll_interval if poll_interval is not None else settings.TRAINING_POLL_INTERVAL
+
+    connections.close_all()
+    in_flight = {}
+    last_housekeeping = None
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+        while True:
+            if last_housekeeping is None or time.monotonic() - last_housekeeping > HOUSEKEEPING_INTERVAL:
+                reap_stale_jobs(exclude=in_flight.values())
+                sweep_uploads()
+                last_housekeeping = time.monotonic()
+            while len(in_flight) < max_workers:
+                job_id = claim_next_job()
+                if job_id is None:
+                    break
+                logger.info("Dispatching training job %s", job_id)
+                in_flight[pool.submit(_run_job_in_worker, job_id)] = job_id
+
+            if not in_flight:
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                job_id = in_flight.pop(future)
+                try:
+                    logger.info("Training job %s finished: %s", job_id, future.result())
+                except Exception:
+                    # The worker process itself died; don't leave the job "running".
+                    logger.exception("Training job %s crashed its worker", job_id)
+                    _mark_failed(job_id, "Worker process crashed.")
+
+
+def _mark_failed(job_id, message):
+    from database.models import TrainingJob
+
+    TrainingJob.objects.filter(pk=job_id).update(
+        status=TrainingJob.STATUS_FAILED,
+        stage='failed',
+        error=message,
+        finished_at=timezone.now(),
+    )
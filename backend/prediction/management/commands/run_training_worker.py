@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from prediction.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Run the local training worker pool against the DB-backed job queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Max concurrent training jobs (default: settings.TRAINING_WORKERS).")
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help="Seconds between queue polls (default: settings.TRAINING_POLL_INTERVAL).")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the queue and exit instead of polling forever.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Training worker started.")
+        run_worker(
+            max_workers=options['workers'],
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from prediction.jobs import sweep_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete spooled uploads older than UPLOAD_SPOOL_MAX_AGE_HOURS (except those of pending jobs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-hours', type=float, default=None,
+                            help="Override settings.UPLOAD_SPOOL_MAX_AGE_HOURS.")
+
+    def handle(self, *args, **options):
+        hours = options['max_age_hours']
+        removed = sweep_uploads(None if hours is None else hours * 3600)
+        self.stdout.write(f"Removed {removed} spooled upload file(s).")
@@ -1,74 +1,156 @@
-import os
+import time
+from dataclasses import dataclass
+import pandas as pd
 import polars as pl
-import io
-import base64
 import matplotlib.pyplot as plt
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.preprocessing import LabelEncoder
 from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.tree import DecisionTreeRegressor
 from xgboost import XGBRegressor
 from lightgbm import LGBMRegressor
-import torch
-import torch.nn as nn
-import torch.optim as optim
-from torch.utils.data import TensorDataset, DataLoader
-
-# Force CPU usage in PyTorch
-torch.set_num_threads(2)
-os.environ['OMP_NUM_THREADS'] = '2'
-
-
-def train_model_pipeline(df: pl.DataFrame, model_name='random_forest'):
+from .diagnostics import (
+    plot_residuals, plot_pred_vs_actual, plot_feature_importance,
+    plot_learning_curve, plot_error_histogram, plot_forecast,
+)
+from .preprocessing import CategoricalEncoder
+from .compute import compute_slot
+from .profiling import Trace, trace_mark
+from .sampling import (
+    STRATEGY_PROGRESSIVE, STRATEGY_UNIFORM, SamplePlan, draw_sample, progressive_rows, record_throughput,
+)
+from .explain import UNSUPPORTED_MODELS, explain, plot_beeswarm, sample_frame
+from .charts import CHART_JSON, beeswarm_chart, draw_all, resolve_charts
+# PyTorchNN stays importable from here: registry bundles pickled before
+# prediction.nn existed reference prediction.models.PyTorchNN.
+from .nn import NeuralRegressor, PyTorchNN  # noqa: F401
+
+# Bump whenever train_model_pipeline's output changes so cached results
+# (see prediction/cache.py) from older code are never served.
+PIPELINE_VERSION = 11
+
+# Training runs on a sample drawn by prediction.sampling. Jobs plan it from
+# the request's strategy and measured fit throughput; direct callers that
+# pass no plan get a uniform sample of at most this many rows.
+MAX_TRAINING_ROWS = 5000
+
+# Diagnostics tiers, cheapest first:
+#   fast     – metrics and sample predictions only, nothing rendered
+#   standard – plus the cheap plots (residuals, pred vs actual, importances,
+#              error histogram, forecast)
+#   full     – plus the learning curve (9 refits) and SHAP, explained on at
+#              most SHAP_SAMPLE_ROWS test rows against a SHAP_BACKGROUND_ROWS
+#              background sample
+DIAGNOSTICS_FAST = 'fast'
+DIAGNOSTICS_STANDARD = 'standard'
+DIAGNOSTICS_FULL = 'full'
+DIAGNOSTICS_TIERS = (DIAGNOSTICS_FAST, DIAGNOSTICS_STANDARD, DIAGNOSTICS_FULL)
+
+
+def report_progress(progress, percent, stage, trace=None):
+    """Forward a (percent, stage) update to an optional progress callback and trace."""
+    trace_mark(trace, stage)
+    if progress is not None:
+        progress(percent, stage)
+
+
+# ─── Shared preprocessing (training + registry scoring) ─────
+
+def derive_month(df: pl.DataFrame) -> pl.DataFrame:
+    """Replace a `date` column (text, or native Date / Datetime from Parquet / Arrow) with its month number."""
+    if "date" in df.columns:
+        date = pl.col("date")
+        if df.schema["date"] == pl.String:
+            date = date.str.strptime(pl.Date, strict=False)
+        else:
+            date = date.cast(pl.Date)
+        df = df.with_columns(date.dt.month().alias("month")).drop("date")
+    return df
+
+
+def resolve_diagnostics(tier=None):
+    """`tier` or the DEFAULT_DIAGNOSTICS setting; raises ValueError for unknown tiers."""
+    from django.conf import settings
+
+    tier = tier or settings.DEFAULT_DIAGNOSTICS
+    if tier not in DIAGNOSTICS_TIERS:
+        raise ValueError(f"diagnostics must be one of {', '.join(DIAGNOSTICS_TIERS)}.")
+    return tier
+
+
+def train_model_pipeline(df: pl.DataFrame, model_name='random_forest', progress=None,
+                         return_model=False, trace=None, diagnostics=None, sampling=None, charts=None):
+    """
+    Fit `model_name` on `df` and return the JSON report. With
+    `return_model=True` returns (report, ModelBundle) so the fitted
+    estimator can be stored in the registry (prediction.registry).
+    `diagnostics` picks the tier (see DIAGNOSTICS_TIERS); `sampling` is a
+    prediction.sampling.SamplePlan; `charts` is 'png' or 'json'
+    (prediction.charts).
+
+    Every stage is timed into `trace` (prediction.profiling); without one,
+    a trace is created here and finished (logged + exported) on return.
+    """
+    diagnostics = resolve_diagnostics(diagnostics)
+    charts = resolve_charts(charts)
+    if trace is not None:
+        return _train_model_pipeline(df, model_name, progress, return_model, trace, diagnostics, sampling, charts)
+    trace = Trace('train_model_pipeline')
+    try:
+        return _train_model_pipeline(df, model_name, progress, return_model, trace, diagnostics, sampling, charts)
+    finally:
+        trace.finish()
+
+
+def _train_model_pipeline(df, model_name, progress, return_model, trace, diagnostics, sampling, charts):
+    report_progress(progress, 5, "preprocessing", trace)
+    data = prepare_training_data(df, sampling)
+    fit = fit_model(data, model_name, progress, trace, diagnostics, return_model=return_model)
+    report = render_report(fit, trace, charts)
+    return (report, fit.bundle) if return_model else report
+
+
+# ─── Preprocessing (shared by every model in a comparison) ──
+
+@dataclass
+class TrainingData:
+    target_col: str
+    encoder: CategoricalEncoder
+    X: pd.DataFrame
+    y: pd.Series
+    X_train: pd.DataFrame
+    X_test: pd.DataFrame
+    y_train: pd.Series
+    y_test: pd.Series
+    sampling: dict = None  # prediction.sampling.draw_sample info
+
+
+def prepare_training_data(df: pl.DataFrame, plan=None) -> TrainingData:
+    """
+    Sample (per `plan`, a prediction.sampling.SamplePlan), encode and split
+    `df` once; the split is identical for every model.
+    """
     from .views import inter_target_column
-    import matplotlib.pyplot as plt
-    from sklearn.model_selection import learning_curve
-    import shap
-
-    def fig_to_base64(fig):
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        img = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close(fig)
-        return img
-
-    graphs = {}
-    df = df.clone()  # Polars copy
-
-    # ─── Downsample if too large ──────────────────────────────
-    if df.height > 5000:
-        df = df.sample(n=5000, seed=42)
 
     # ─── Identify target column ───────────────────────────────
     target_col = inter_target_column(df)
     if not target_col:
         raise ValueError("Target column not found.")
 
+    # ─── Sample ───────────────────────────────────────────────
+    plan = plan or SamplePlan(STRATEGY_UNIFORM, MAX_TRAINING_ROWS)
+    df, sampling = draw_sample(df, plan, target_col)
+
     df = df.filter(pl.col(target_col).is_not_null())
 
     # ─── Date handling ────────────────────────────────────────
-    if "date" in df.columns:
-        df = df.with_columns(
-            pl.col("date").str.strptime(pl.Date, strict=False).alias("date")
-        ).with_columns(
-            pl.col("date").dt.month().alias("month")
-        ).drop("date")
+    df = derive_month(df)
 
     # ─── Encode categorical ───────────────────────────────────
-    cat_cols = [
-        col
-        for col, dtype in zip(df.columns, df.dtypes)
-        if dtype == pl.Utf8 or dtype == pl.Categorical
-    ]
-
-    for col in cat_cols:
-        le = LabelEncoder()
-        encoded = le.fit_transform(df[col].to_pandas().fillna("MISSING"))
-        df = df.with_columns(pl.Series(col, encoded))
+    encoder = CategoricalEncoder()
+    df = encoder.fit_transform(df)
 
     # ─── Drop missing ─────────────────────────────────────────
     df = df.drop_nulls()
@@ -77,175 +159,228 @@ def train_model_pipeline(df: pl.DataFrame, model_name='random_forest'):
     X = df.drop(target_col).to_pandas()
     y = df[target_col].to_pandas()
 
+    if plan.strategy == STRATEGY_PROGRESSIVE:
+        rows, sampling['steps'] = progressive_rows(X, y, plan.probe_model)
+        X, y = X.iloc[rows].reset_index(drop=True), y.iloc[rows].reset_index(drop=True)
+        sampling['rows'] = len(X)
+
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42
     )
+    return TrainingData(target_col, encoder, X, y, X_train, X_test, y_train, y_test, sampling)
 
-    # ─── Model Selection ──────────────────────────────────────
-    if model_name == "linear_regression":
+
+# ─── Fitting ────────────────────────────────────────────────
+
+MODEL_NAMES = ('linear_regression', 'random_forest', 'decision_tree', 'xgboost', 'lightgbm', 'pytorch_nn')
+
+
+def make_model(model_name, n_jobs=1, params=None):
+    """
+    Unfitted estimator for `model_name` (anything unknown is a random forest)
+    using `n_jobs` threads – the caller's prediction.compute grant – with
+    `params` (e.g. tuned hyperparameters) over the defaults.
+    """
+    from django.conf import settings
+
+    if model_name == "pytorch_nn":
+        model = NeuralRegressor(inference=settings.NN_INFERENCE)
+    elif model_name == "linear_regression":
         model = LinearRegression()
     elif model_name == "decision_tree":
         model = DecisionTreeRegressor(random_state=42)
     elif model_name == "xgboost":
-        model = XGBRegressor(random_state=42, verbosity=0, n_jobs=2)
+        model = XGBRegressor(random_state=42, verbosity=0, n_jobs=n_jobs)
     elif model_name == "lightgbm":
-        model = LGBMRegressor(random_state=42, n_jobs=2)
-    elif model_name == "pytorch_nn":
-
-        class PyTorchNN(nn.Module):
-            def __init__(self, input_size):
-                super(PyTorchNN, self).__init__()
-                self.net = nn.Sequential(
-                    nn.Linear(input_size, 64),
-                    nn.ReLU(),
-                    nn.Linear(64, 32),
-                    nn.ReLU(),
-                    nn.Linear(32, 1),
-                )
-
-            def forward(self, x):
-                return self.net(x)
-
-        device = torch.device("cpu")
-        X_train_tensor = torch.tensor(X_train.values, dtype=torch.float32).to(device)
-        y_train_tensor = torch.tensor(y_train.values, dtype=torch.float32).view(
-            -1, 1
-        ).to(device)
-        X_test_tensor = torch.tensor(X_test.values, dtype=torch.float32).to(device)
-
-        dataset = TensorDataset(X_train_tensor, y_train_tensor)
-        loader = DataLoader(dataset, batch_size=16, shuffle=True)
-
-        model = PyTorchNN(X_train.shape[1]).to(device)
-        criterion = nn.MSELoss()
-        optimizer = optim.Adam(model.parameters(), lr=0.01)
-
-        model.train()
-        for epoch in range(50):
-            for batch_X, batch_y in loader:
-                optimizer.zero_grad()
-                outputs = model(batch_X)
-                loss = criterion(outputs, batch_y)
-                loss.backward()
-                optimizer.step()
-
-        model.eval()
-        with torch.no_grad():
-            y_pred_tensor = model(X_test_tensor)
-            y_pred = y_pred_tensor.cpu().numpy().flatten()
+        model = LGBMRegressor(random_state=42, n_jobs=n_jobs, verbose=-1)
     else:
-        model = RandomForestRegressor(random_state=42, n_jobs=2)
+        model = RandomForestRegressor(random_state=42, n_jobs=n_jobs)
+    return model.set_params(**params) if params else model
+
+
+@dataclass
+class FitResult:
+    report: dict          # everything but the rendered figures
+    plot_data: dict
+    plot_tasks: list
+    attributions: object = None  # prediction.explain.Attributions (full tier)
+    bundle: object = None  # ModelBundle when return_model=True
+    fit_seconds: float = 0.0
+    seconds: float = 0.0
+
+
+def fit_model(data: TrainingData, model_name, progress=None, trace=None,
+              diagnostics=DIAGNOSTICS_STANDARD, n_jobs=None, return_model=False, params=None) -> FitResult:
+    """
+    Fit one model on the shared split and compute its metrics and diagnostic
+    data. Figures are not rendered here (see render_report), so a comparison
+    can fit in worker processes and render in one place.
+
+    Runs inside a prediction.compute slot of `n_jobs` threads (default: the
+    per-job share), waiting for free cores if the machine is busy. `params`
+    override the model's default hyperparameters (prediction.tuning).
+    """
+    with compute_slot(n_jobs, trace) as threads:
+        return _fit_model(data, model_name, progress, trace, diagnostics, threads, return_model, params)
+
+
+def _fit_model(data, model_name, progress, trace, diagnostics, n_jobs, return_model, params=None):
+    from django.conf import settings
+    from sklearn.base import clone
+    from sklearn.model_selection import learning_curve
+
+    start = time.perf_counter()
+    X, y = data.X, data.y
+    X_train, X_test, y_train, y_test = data.X_train, data.X_test, data.y_train, data.y_test
+    target_col = data.target_col
+
+    # ─── Model Selection ──────────────────────────────────────
+    report_progress(progress, 20, "fitting", trace)
+    model = make_model(model_name, n_jobs, params)
 
     # ─── Fit / Predict ────────────────────────────────────────
-    if model_name != "pytorch_nn":
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    fit_seconds = time.perf_counter() - start
+    if not params:  # tuned hyperparameters (e.g. n_estimators) would skew the default model's estimate
+        record_throughput(model_name, len(X_train), X_train.shape[1], fit_seconds)
 
     # ─── Evaluation ──────────────────────────────────────────
+    report_progress(progress, 50, "evaluating", trace)
     rmse = mean_squared_error(y_test, y_pred) ** 0.5
     r2 = r2_score(y_test, y_pred)
     r2 = 0.0 if np.isnan(r2) else r2
 
     # ─── Diagnostic Plots ─────────────────────────────────────
+    # Numbers are computed here; the figures themselves are rendered in one
+    # batch on the process pool (prediction.rendering) by render_report.
     residuals = y_test - y_pred
-
-    fig, ax = plt.subplots()
-    ax.scatter(y_pred, residuals, alpha=0.6)
-    ax.axhline(0, color="red")
-    ax.set_xlabel("Predicted")
-    ax.set_ylabel("Residuals")
-    ax.set_title("Residuals vs Predicted")
-    graphs["residuals_plot"] = fig_to_base64(fig)
-
-    fig, ax = plt.subplots()
-    ax.scatter(y_test, y_pred, alpha=0.6)
-    ax.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], "r--")
-    ax.set_xlabel("Actual")
-    ax.set_ylabel("Predicted")
-    ax.set_title("Predicted vs Actual")
-    graphs["pred_vs_actual"] = fig_to_base64(fig)
-
-    if hasattr(model, "feature_importances_"):
-        importances = model.feature_importances_
-        idx = np.argsort(importances)[::-1]
-        fig, ax = plt.subplots(figsize=(8, 6))
-        ax.barh([X.columns[i] for i in idx], importances[idx])
-        ax.set_title("Feature Importances")
-        ax.invert_yaxis()
-        graphs["feature_importance"] = fig_to_base64(fig)
-
-    # Learning Curve
+    plot_data = {
+        "y_test": np.asarray(y_test),
+        "y_pred": np.asarray(y_pred),
+        "residuals": np.asarray(residuals),
+    }
+    plot_tasks = []
+    if diagnostics != DIAGNOSTICS_FAST:
+        plot_tasks += [
+            ("residuals_plot", plot_residuals, {}),
+            ("pred_vs_actual", plot_pred_vs_actual, {}),
+        ]
+
+    if diagnostics != DIAGNOSTICS_FAST and hasattr(model, "feature_importances_"):
+        plot_tasks.append(("feature_importance", plot_feature_importance, {
+            "features": list(X.columns),
+            "importances": np.asarray(model.feature_importances_),
+        }))
+
+    # Learning Curve (full tier only: refits the model 9 times)
+    if diagnostics == DIAGNOSTICS_FULL:
+        report_progress(progress, 60, "learning_curve", trace)
     try:
-        if model_name != "pytorch_nn":
+        if diagnostics == DIAGNOSTICS_FULL and model_name != "pytorch_nn":
+            # the 9 refits run side by side, so each one gets a single thread
+            curve_model = model
+            if "n_jobs" in model.get_params():
+                curve_model = clone(model).set_params(n_jobs=1)
             train_sizes, train_scores, val_scores = learning_curve(
-                model,
+                curve_model,
                 X,
                 y,
                 cv=3,
                 scoring="neg_root_mean_squared_error",
                 train_sizes=np.linspace(0.1, 1.0, 3),
-                n_jobs=2,
+                n_jobs=n_jobs,
             )
             train_scores = -train_scores
             val_scores = -val_scores
-            fig, ax = plt.subplots()
-            ax.plot(train_sizes, train_scores.mean(axis=1), "o-", label="Train RMSE")
-            ax.plot(train_sizes, val_scores.mean(axis=1), "o-", label="Validation RMSE")
-            ax.set_xlabel("Training Size")
-            ax.set_ylabel("RMSE")
-            ax.set_title("Learning Curve")
-            ax.legend()
-            graphs["learning_curve"] = fig_to_base64(fig)
+            plot_tasks.append(("learning_curve", plot_learning_curve, {
+                "train_sizes": train_sizes,
+                "train_rmse": train_scores.mean(axis=1),
+                "val_rmse": val_scores.mean(axis=1),
+            }))
     except Exception as e:
         print("Learning curve skipped:", e)
 
-    fig, ax = plt.subplots()
-    ax.hist(residuals, bins=20, edgecolor="black")
-    ax.set_title("Error Distribution (Residuals)")
-    ax.set_xlabel("Residual")
-    graphs["error_histogram"] = fig_to_base64(fig)
+    if diagnostics != DIAGNOSTICS_FAST:
+        plot_tasks.append(("error_histogram", plot_error_histogram, {}))
 
-    # SHAP (optional)
+    # SHAP (full tier only) – a bounded sample of the test rows, explained
+    # with the model family's fastest exact method (prediction.explain). The
+    # beeswarm is drawn by render_report in the calling process, since
+    # render workers don't import shap.
+    attributions = None
+    if diagnostics == DIAGNOSTICS_FULL:
+        report_progress(progress, 80, "shap", trace)
     try:
-        if model_name not in ["pytorch_nn", "linear_regression"]:
-            explainer = shap.Explainer(model, X)
-            shap_values = explainer(X_test)
-
-            fig, ax = plt.subplots()
-            shap.plots.beeswarm(shap_values, show=False, ax=ax)
-            graphs["shap_summary"] = fig_to_base64(fig)
+        if diagnostics == DIAGNOSTICS_FULL and model_name not in UNSUPPORTED_MODELS:
+            attributions = explain(model, model_name, sample_frame(X_test, settings.SHAP_SAMPLE_ROWS),
+                                   background=X_train)
     except Exception as e:
         print("SHAP skipped:", e)
 
-    # Forecast Plot
-    forecast_plot = None
-    if "month" in X.columns:
+    # Month sweep: predictions for months 1-5 with every other feature at its
+    # training median. Not a forecast – /api/predict/forecast/ is.
+    if diagnostics != DIAGNOSTICS_FAST:
+        report_progress(progress, 95, "forecast", trace)
+    if diagnostics != DIAGNOSTICS_FAST and "month" in X.columns:
         rows = []
         for i in range(1, 6):
             row = {col: (i if col == "month" else X_train[col].median()) for col in X.columns}
             rows.append(row)
         future_months = pl.DataFrame(rows).to_pandas()[X.columns]
 
-        if model_name == "pytorch_nn":
-            with torch.no_grad():
-                future_tensor = torch.tensor(future_months.values, dtype=torch.float32).to(device)
-                future_preds = model(future_tensor).cpu().numpy().flatten()
-        else:
-            future_preds = model.predict(future_months)
+        future_preds = model.predict(future_months)
 
-        fig, ax = plt.subplots()
-        ax.plot(range(1, 6), future_preds, marker="o")
-        ax.set_title("Future Forecast (Next 5 Months)")
-        ax.set_xlabel("Month")
-        ax.set_ylabel(target_col)
-        forecast_plot = fig_to_base64(fig)
+        plot_tasks.append(("forecast", plot_forecast, {
+            "months": list(range(1, 6)),
+            "preds": np.asarray(future_preds),
+            "target_col": target_col,
+        }))
 
-    return {
+    report = {
         "target_column": target_col,
         "features_used": list(X.columns),
         "rmse": round(rmse, 2),
         "r2_score": round(r2, 3),
         "sample_predictions": y_pred[:5].tolist(),
-        "forecast_plot_base64": forecast_plot,
-        "diagnostic_graphs": graphs,
+        "diagnostics": diagnostics,
+        "sampling": data.sampling,
     }
+    if attributions is not None:
+        report["feature_attributions"] = attributions.mean_abs()
+
+    bundle = None
+    if return_model:
+        from .registry import ModelBundle
+        bundle = ModelBundle(
+            model_name=model_name,
+            model=model,
+            features=list(X.columns),
+            target_column=target_col,
+            encoder=data.encoder,
+            fill_values={col: float(v) for col, v in X_train.median().items()},
+        )
+    return FitResult(report, plot_data, plot_tasks, attributions, bundle,
+                     fit_seconds, time.perf_counter() - start)
+
+
+def render_report(fit: FitResult, trace=None, charts='png') -> dict:
+    """Render `fit`'s figures (or build them as charts) and return the complete JSON report."""
+    if fit.plot_tasks:
+        trace_mark(trace, "rendering")
+    rendered = draw_all(fit.plot_data, fit.plot_tasks, charts, trace=trace)
+    forecast_plot = rendered.pop("forecast", None)
+    graphs = dict(rendered)
+    if fit.attributions is not None:
+        draw = beeswarm_chart if charts == CHART_JSON else plot_beeswarm
+        graphs["shap_summary"] = draw(fit.attributions)
+
+    report = dict(fit.report)
+    if charts == CHART_JSON:
+        report["forecast_plot_base64"] = None
+        report["forecast_plot"] = forecast_plot
+    else:
+        report["forecast_plot_base64"] = forecast_plot
+    report["diagnostic_graphs"] = graphs
+    report["charts"] = charts
+    return report
@@ -0,0 +1,148 @@
+import copy
+import warnings
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.base import BaseEstimator, RegressorMixin
+
+# The pytorch_nn model as a scikit-learn style regressor, so the training
+# pipeline, registry and scoring treat it like every other estimator.
+#
+# Inputs and target are standardized with the training statistics (kept on
+# the estimator, so scoring applies the same scaling). Each epoch shuffles
+# once and walks the training tensor in large batches by slicing it
+# directly – no DataLoader, so a few thousand rows are a handful of
+# optimizer steps per epoch. A held-out `validation_fraction` of the rows
+# drives early stopping; the weights from the best epoch are restored.
+# The first optimizer built in a process imports torch._dynamo (~1 s);
+# worker pools call warm_up() at start so no job pays for it.
+#
+# `inference` picks how predict runs the network: 'eager' (plain module),
+# 'torchscript' (torch.jit.trace) or 'compile' (torch.compile). Traced and
+# compiled modules are built lazily on first predict and never pickled.
+
+INFERENCE_MODES = ('eager', 'torchscript', 'compile')
+
+
+class PyTorchNN(nn.Module):
+    # Module level (not nested in the pipeline) so fitted networks pickle
+    # into the model registry like any other estimator.
+    def __init__(self, input_size):
+        super(PyTorchNN, self).__init__()
+        self.net = nn.Sequential(
+            nn.Linear(input_size, 64),
+            nn.ReLU(),
+            nn.Linear(64, 32),
+            nn.ReLU(),
+            nn.Linear(32, 1),
+        )
+
+    def forward(self, x):
+        return self.net(x)
+
+
+def warm_up():
+    torch.optim.Adam(nn.Linear(1, 1).parameters())
+
+
+def _scale(values):
+    mean = values.mean(axis=0)
+    std = values.std(axis=0)
+    return mean, np.where(std > 0, std, 1.0)
+
+
+class NeuralRegressor(RegressorMixin, BaseEstimator):
+    """Standardized mini-batch MLP regressor with early stopping."""
+
+    def __init__(self, batch_size=256, max_epochs=200, patience=5, learning_rate=1e-2,
+                 validation_fraction=0.1, inference='eager', random_state=42):
+        self.batch_size = batch_size
+        self.max_epochs = max_epochs
+        self.patience = patience
+        self.learning_rate = learning_rate
+        self.validation_fraction = validation_fraction
+        self.inference = inference
+        self.random_state = random_state
+
+    def _tensor(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        return torch.from_numpy((X - self.x_mean_) / self.x_scale_)
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float32)
+        y = np.asarray(y, dtype=np.float32).reshape(-1, 1)
+        self.x_mean_, self.x_scale_ = (a.astype(np.float32) for a in _scale(X))
+        self.y_mean_, self.y_scale_ = (float(a[0]) for a in _scale(y))
+        X_all = self._tensor(X)
+        y_all = torch.from_numpy((y - self.y_mean_) / self.y_scale_)
+
+        generator = torch.Generator().manual_seed(self.random_state)
+        order = torch.randperm(len(X_all), generator=generator)
+        n_val = int(len(X_all) * self.validation_fraction) if len(X_all) >= 50 else 0
+        val, train = order[:n_val], order[n_val:]
+        X_train, y_train = X_all[train], y_all[train]
+        X_val, y_val = X_all[val], y_all[val]
+
+        with torch.random.fork_rng():
+            torch.manual_seed(self.random_state)
+            model = PyTorchNN(X.shape[1])
+        optimizer = torch.optim.Adam(model.parameters(), lr=self.learning_rate)
+        criterion = nn.MSELoss()
+
+        best_loss, best_state, best_epoch = float('inf'), None, 0
+        self.loss_curve_ = []
+        for epoch in range(self.max_epochs):
+            model.train()
+            perm = torch.randperm(len(X_train), generator=generator)
+            X_epoch, y_epoch = X_train[perm], y_train[perm]
+            for start in range(0, len(X_epoch), self.batch_size):
+                optimizer.zero_grad(set_to_none=True)
+                loss = criterion(model(X_epoch[start:start + self.batch_size]),
+                                 y_epoch[start:start + self.batch_size])
+                loss.backward()
+                optimizer.step()
+
+            if not n_val:
+                continue
+            model.eval()
+            with torch.inference_mode():
+                val_loss = criterion(model(X_val), y_val).item()
+            self.loss_curve_.append(val_loss)
+            if val_loss < best_loss - 1e-6:
+                best_loss, best_epoch = val_loss, epoch
+                best_state = copy.deepcopy(model.state_dict())
+            elif epoch - best_epoch >= self.patience:
+                break
+
+        if best_state is not None:
+            model.load_state_dict(best_state)
+        model.eval()
+        self.model_ = model
+        self.n_epochs_ = epoch + 1
+        self.best_epoch_ = best_epoch + 1 if n_val else self.n_epochs_
+        self.n_features_in_ = X.shape[1]
+        self._runner = None
+        return self
+
+    def _get_runner(self):
+        if getattr(self, '_runner', None) is None:
+            mode = getattr(self, 'inference', 'eager')
+            if mode == 'torchscript':
+                with warnings.catch_warnings():  # deprecated in favour of torch.compile, still far cheaper
+                    warnings.simplefilter('ignore', FutureWarning)
+                    self._runner = torch.jit.trace(self.model_, torch.zeros(1, self.n_features_in_))
+            elif mode == 'compile':
+                self._runner = torch.compile(self.model_, dynamic=True)
+            else:
+                self._runner = self.model_
+        return self._runner
+
+    def predict(self, X):
+        with torch.inference_mode():
+            out = self._get_runner()(self._tensor(X)).numpy().ravel()
+        return out.astype(np.float64) * self.y_scale_ + self.y_mean_
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_runner'] = None  # traced / compiled modules are rebuilt on load
+        return state
@@ -0,0 +1,61 @@
+import polars as pl
+
+# Fitted preprocessing shared by training and registry scoring.
+#
+# CategoricalEncoder learns every string column's category dictionary in a
+# single Polars query (instead of one LabelEncoder + to_pandas() round-trip
+# per column) and encodes by casting to an Enum of those categories and
+# taking the physical codes. Categories are sorted, so codes are identical to
+# sklearn's LabelEncoder; values unseen at fit time encode to -1.
+
+MISSING = "MISSING"
+UNSEEN = -1
+
+
+def categorical_columns(df: pl.DataFrame):
+    return [col for col, dtype in df.schema.items() if dtype in (pl.Utf8, pl.Categorical, pl.Enum)]
+
+
+class CategoricalEncoder:
+    def __init__(self, categories=None):
+        self.categories = dict(categories or {})  # column → sorted list of categories
+
+    @property
+    def columns(self):
+        return list(self.categories)
+
+    def _as_text(self, col):
+        return pl.col(col).cast(pl.Utf8).fill_null(MISSING)
+
+    def fit(self, df: pl.DataFrame, columns=None):
+        columns = categorical_columns(df) if columns is None else list(columns)
+        if not columns:
+            self.categories = {}
+            return self
+        row = df.select([
+            self._as_text(col).unique().sort().implode() for col in columns
+        ]).row(0, named=True)
+        self.categories = {col: list(values) for col, values in row.items()}
+        return self
+
+    def transform(self, df: pl.DataFrame) -> pl.DataFrame:
+        return df.with_columns([
+            self._as_text(col)
+                .cast(pl.Enum(values), strict=False)
+                .to_physical()
+                .cast(pl.Int32)
+                .fill_null(UNSEEN)
+            for col, values in self.categories.items() if col in df.columns
+        ])
+
+    def fit_transform(self, df: pl.DataFrame, columns=None) -> pl.DataFrame:
+        return self.fit(df, columns).transform(df)
+
+    # ─── Serialization ──────────────────────────────────────
+
+    def to_dict(self):
+        return {"categories": self.categories}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("categories"))
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+import diskcache
+from django.conf import settings
+
+# Stage-level profiling for the training / EDA pipelines.
+#
+# A Trace records wall time, process CPU time and peak RSS per named stage.
+# Stages are opened either with `with trace.stage(name):` or sequentially
+# with `trace.mark(name)` (which closes the previous one – this is what the
+# pipeline's progress reports drive). RSS is sampled by one background
+# thread per trace, so native allocations (Polars, NumPy, torch) count.
+#
+# Finished traces are logged and folded into Prometheus-style counters and
+# histograms kept in a small diskcache, which the web process and every
+# training worker share; metrics_view renders them at /metrics.
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def rss_bytes():
+    """
+    Current RSS from /proc (Linux). Elsewhere, the process's high-water mark
+    from getrusage (so per-stage peaks degrade to the process peak so far);
+    None where neither exists (Windows).
+    """
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+def _mb(nbytes):
+    return None if nbytes is None else round(nbytes / 1e6, 1)
+
+
+class PeakRSS:
+    """Context manager tracking peak RSS growth during the block (peak is None if RSS can't be read)."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = self.peak = 0
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start = self.peak = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.peak = max(self.peak, rss_bytes())
+
+    def reset(self):
+        """Start a new peak window from the current RSS."""
+        self.peak = rss_bytes()
+
+    @property
+    def delta_mb(self):
+        return None if self.start is None else round((self.peak - self.start) / 1e6, 1)
+
+
+# ─── TRACE ──────────────────────────────────────────────────
+
+class Trace:
+    def __init__(self, name, interval=0.01):
+        self.name = name
+        self.stages = []
+        self._open = None
+        self._rss = PeakRSS(interval)
+        self._rss.__enter__()
+        self._wall0, self._cpu0 = time.perf_counter(), time.process_time()
+        self.total = None
+
+    def _close_open(self):
+        if self._open is None:
+            return
+        name, wall0, cpu0, rss0 = self._open
+        self.stages.append({
+            'name': name,
+            'wall_s': round(time.perf_counter() - wall0, 4),
+            'cpu_s': round(time.process_time() - cpu0, 4),
+            'rss_start_mb': _mb(rss0),
+            'peak_rss_mb': _mb(self._rss.peak),
+        })
+        self._open = None
+
+    def mark(self, name):
+        """Close the current stage (if any) and start `name`."""
+        self._close_open()
+        self._rss.reset()
+        self._open = (name, time.perf_counter(), time.process_time(), self._rss.peak)
+
+    @contextmanager
+    def stage(self, name):
+        self.mark(name)
+        try:
+            yield
+        finally:
+            self._close_open()
+
+    def add(self, name, wall_s, cpu_s=None):
+        """Record a stage measured elsewhere (e.g. a figure rendered in a pool worker)."""
+        self.stages.append({'name': name, 'wall_s': round(wall_s, 4),
+                            'cpu_s': None if cpu_s is None else round(cpu_s, 4)})
+
+    def finish(self):
+        """Close everything, log the trace, export metrics; returns as_dict()."""
+        if self.total is None:
+            self._close_open()
+            self._rss.__exit__(None, None, None)
+            self.total = {
+                'wall_s': round(time.perf_counter() - self._wall0, 4),
+                'cpu_s': round(time.process_time() - self._cpu0, 4),
+                'peak_rss_mb': _mb(self._rss.peak),
+            }
+            logger.info("trace %s", json.dumps(self.as_dict()))
+            try:
+                record_trace(self)
+            except Exception:  # metrics must never fail a request
+                logger.exception("Could not export trace metrics")
+        return self.as_dict()
+
+    def as_dict(self):
+        return {'name': self.name, 'total': self.total, 'stages': list(self.stages)}
+
+
+def trace_mark(trace, stage):
+    if trace is not None:
+        trace.mark(stage)
+
+
+# ─── METRICS ────────────────────────────────────────────────
+
+_store = None
+_store_pid = None
+
+
+def get_metrics_store():
+    global _store, _store_pid
+    # SQLite handles must not cross a fork, so open one per process.
+    if _store is None or _store_pid != os.getpid() or _store.directory != settings.METRICS_DIR:
+        _store = diskcache.Cache(settings.METRICS_DIR, eviction_policy='none')
+        _store_pid = os.getpid()
+    return _store
+
+
+# Series are keyed by the escaped label string; "series:v2" skips entries
+# recorded before labels were bounded and escaped.
+SERIES_KEY = 'series:v2'
+
+
+def _label_value(value):
+    """Escape a label value as the Prometheus text format requires."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pipeline, stage):
+    # Only the part before ':' is a label: per-graph / per-model stages
+    # ("render:<graph>", "chart:<graph>", "fit:<model>") carry column names
+    # and other request data, which would leak through an unbounded set of
+    # series. They stay in the trace itself.
+    pipeline, stage = pipeline.split(':', 1)[0], stage.split(':', 1)[0]
+    return f'pipeline="{_label_value(pipeline)}",stage="{_label_value(stage)}"'
+
+
+def record_trace(trace):
+    if not settings.METRICS_ENABLED:
+        return
+    store = get_metrics_store()
+    with store.transact():
+        series = store.get(SERIES_KEY, set())
+        for entry in trace.stages + [dict(trace.total, name='total')]:
+            labels = _labels(trace.name, entry['name'])
+            series.add(labels)
+            store.incr(f'count|{labels}', 1)
+            store.incr(f'wall|{labels}', entry['wall_s'])
+            if entry.get('cpu_s') is not None:
+                store.incr(f'cpu|{labels}', entry['cpu_s'])
+            for bound in DURATION_BUCKETS:
+                if entry['wall_s'] <= bound:
+                    store.incr(f'bucket|{labels}|{bound}', 1)
+            if entry.get('peak_rss_mb') is not None:
+                key = f'rss|{labels}'
+                store.set(key, max(store.get(key, 0.0), entry['peak_rss_mb'] * 1e6))
+        store.set(SERIES_KEY, series)
+
+
+def render_metrics():
+    """Prometheus text exposition (format 0.0.4) of everything recorded so far."""
+    store = get_metrics_store()
+    series = sorted(store.get(SERIES_KEY, set()))
+    lines = [
+        '# HELP revenue_stage_duration_seconds Wall time per pipeline stage.',
+        '# TYPE revenue_stage_duration_seconds histogram',
+    ]
+    for labels in series:
+        count = store.get(f'count|{labels}', 0)
+        for bound in DURATION_BUCKETS:
+            lines.append(f'revenue_stage_duration_seconds_bucket{{{labels},le="{bound}"}} '
+                         f'{store.get(f"bucket|{labels}|{bound}", 0)}')
+        lines.append(f'revenue_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f'revenue_stage_duration_seconds_sum{{{labels}}} {store.get(f"wall|{labels}", 0)}')
+        lines.append(f'revenue_stage_duration_seconds_count{{{labels}}} {count}')
+
+    lines += [
+        '# HELP revenue_stage_cpu_seconds_total Process CPU time per pipeline stage.',
+        '# TYPE revenue_stage_cpu_seconds_total counter',
+    ]
+    lines += [f'revenue_stage_cpu_seconds_total{{{labels}}} {store.get(f"cpu|{labels}")}'
+              for labels in series if store.get(f'cpu|{labels}') is not None]
+
+    lines += [
+        '# HELP revenue_stage_peak_rss_bytes Highest RSS seen during a pipeline stage.',
+        '# TYPE revenue_stage_peak_rss_bytes gauge',
+    ]
+    lines += [f'revenue_stage_peak_rss_bytes{{{labels}}} {int(store.get(f"rss|{labels}"))}'
+              for labels in series if store.get(f'rss|{labels}') is not None]
+    return '\n'.join(lines) + '\n'
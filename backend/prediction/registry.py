@@ -0,0 +1,126 @@
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import joblib
+import numpy as np
+import polars as pl
+import torch
+from django.conf import settings
+from database.blobs import get_artifact_store
+from .models import PyTorchNN, derive_month
+from .preprocessing import CategoricalEncoder
+
+# Trained-model registry. The fitted estimator is pickled together with its
+# categorical encoder, feature list and null-fill values into a ModelBundle,
+# stored in the artifact store (content-addressed, so re-registering an
+# identical model is free) and linked to its SavedResult by a TrainedModel
+# row. The artifact store is separate from the graph blob store, so
+# blob_view never serves a pickled model, and artifact digests are still
+# never returned by the API.
+#
+# Loaded bundles are kept in a small per-process LRU so repeat scoring
+# requests skip deserialization.
+
+
+@dataclass
+class ModelBundle:
+    model_name: str
+    model: object
+    features: list
+    target_column: str
+    encoder: CategoricalEncoder = field(default_factory=CategoricalEncoder)
+    fill_values: dict = field(default_factory=dict)
+
+    def __setstate__(self, state):
+        # Bundles pickled before CategoricalEncoder carry {column: LabelEncoder};
+        # LabelEncoder classes are sorted too, so the codes are unchanged.
+        encoders = state.pop('encoders', None)
+        if encoders is not None:
+            state['encoder'] = CategoricalEncoder({col: [str(value) for value in le.classes_]
+                                                   for col, le in encoders.items()})
+        self.__dict__.update(state)
+
+    def transform(self, df: pl.DataFrame) -> pl.DataFrame:
+        """Raw upload → feature matrix with the training columns, encodings and fills."""
+        df = self.encoder.transform(derive_month(df))
+        missing = [col for col in self.features if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+        return df.select([
+            pl.col(col).cast(pl.Float64, strict=False).fill_null(self.fill_values.get(col, 0.0))
+            for col in self.features
+        ])
+
+    def predict(self, df: pl.DataFrame, batch_rows=None) -> np.ndarray:
+        """Score `df` in vectorized batches of `batch_rows` rows."""
+        batch_rows = batch_rows or settings.SCORING_BATCH_ROWS
+        X = self.transform(df)
+        return np.concatenate([
+            self._predict_batch(batch) for batch in X.iter_slices(n_rows=batch_rows)
+        ]) if X.height else np.empty(0)
+
+    def _predict_batch(self, X: pl.DataFrame) -> np.ndarray:
+        if isinstance(self.model, PyTorchNN):  # bundles stored before prediction.nn
+            with torch.no_grad():
+                return self.model(torch.from_numpy(X.to_numpy().astype(np.float32))).numpy().ravel()
+        return np.asarray(self.model.predict(X.to_pandas())).ravel()
+
+
+def dump_bundle(bundle: ModelBundle) -> bytes:
+    if isinstance(bundle.model, PyTorchNN):
+        bundle.model.eval()
+    buffer = io.BytesIO()
+    joblib.dump(bundle, buffer, compress=3)
+    return buffer.getvalue()
+
+
+def load_bundle(data: bytes) -> ModelBundle:
+    return joblib.load(io.BytesIO(data))
+
+
+# ─── HOT MODEL CACHE ────────────────────────────────────────
+
+_hot = OrderedDict()
+_hot_lock = threading.Lock()
+
+
+def get_bundle(digest) -> ModelBundle:
+    """Load a bundle by artifact digest, keeping the most recent ones in memory."""
+    with _hot_lock:
+        if digest in _hot:
+            _hot.move_to_end(digest)
+            return _hot[digest]
+
+    bundle = load_bundle(get_artifact_store().get(digest))
+    with _hot_lock:
+        _hot[digest] = bundle
+        while len(_hot) > settings.MODEL_CACHE_SIZE:
+            _hot.popitem(last=False)
+    return bundle
+
+
+# ─── REGISTRY ───────────────────────────────────────────────
+
+def store_bundle(bundle: ModelBundle) -> str:
+    """Serialize `bundle` into the artifact store; returns the artifact digest."""
+    return get_artifact_store().put(dump_bundle(bundle))
+
+
+def register_model(saved_result, artifact, model_name, result):
+    """Link an already-stored artifact to `saved_result` (replacing any previous model)."""
+    from database.models import TrainedModel
+    from .models import PIPELINE_VERSION
+
+    trained, _ = TrainedModel.objects.update_or_create(
+        saved_result=saved_result,
+        defaults={
+            'model_name': model_name,
+            'artifact': artifact,
+            'size_bytes': get_artifact_store().size(artifact),
+            'target_column': result.get('target_column') or '',
+            'features': result.get('features_used') or [],
+            'pipeline_version': PIPELINE_VERSION,
+        },
+    )
+    return trained
@@ -0,0 +1,101 @@
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+
+# Matplotlib is not thread-safe, so independent figures are fanned out to a
+# process pool instead. Workers are started with `spawn` (forking a process
+# that already holds torch/OpenMP threads can deadlock) and pre-warmed with
+# matplotlib + seaborn imported so the first figure doesn't pay for it.
+#
+# A render task is (key, plot_fn, kwargs) where plot_fn(data, **kwargs)
+# returns a base64 PNG and is a module-level function (picklable).
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _warm_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+    import seaborn  # noqa: F401
+
+
+def _noop():
+    return os.getpid()
+
+
+def _render_timed(data, plot_fn, kwargs):
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    image = plot_fn(data, **kwargs)
+    return image, time.perf_counter() - wall0, time.process_time() - cpu0
+
+
+def _render_chunk(data, chunk):
+    return [(index, *_render_timed(data, plot_fn, kwargs)) for index, plot_fn, kwargs in chunk]
+
+
+def render_workers():
+    return max(1, int(settings.GRAPH_RENDER_WORKERS))
+
+
+def get_render_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=render_workers(),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_warm_worker,
+            )
+            _pool_pid = os.getpid()
+            # Inside a multiprocessing child (e.g. a training job worker) the
+            # atexit hook that stops executors never runs, and the child would
+            # block forever joining our idle workers; shut down explicitly.
+            # Priority must beat the call queue's own close finalizer (10),
+            # or the shutdown sentinels are never fed to the workers.
+            multiprocessing.util.Finalize(_pool, _pool.shutdown, exitpriority=20)
+        return _pool
+
+
+def warm_render_pool():
+    """Start every render worker now rather than on the first request."""
+    if render_workers() > 1:
+        pool = get_render_pool()
+        for future in [pool.submit(_noop) for _ in range(render_workers())]:
+            future.result()
+
+
+def render_all(data, tasks, trace=None):
+    """
+    Render `tasks` against `data` and return {key: base64_png} in task order.
+    The data is pickled once per chunk rather than once per figure; chunks
+    are dealt round-robin so one heavy figure (e.g. a pairplot) doesn't
+    serialize a whole worker's share. Per-figure wall/CPU time (measured
+    where the figure was drawn) is added to `trace` as `render:<key>`.
+    """
+    tasks = list(tasks)
+    workers = render_workers()
+    if workers <= 1 or len(tasks) <= 1:
+        rendered = [_render_timed(data, plot_fn, kwargs) for _, plot_fn, kwargs in tasks]
+    else:
+        n_chunks = min(len(tasks), workers * 2)
+        chunks = [[] for _ in range(n_chunks)]
+        for index, (_, plot_fn, kwargs) in enumerate(tasks):
+            chunks[index % n_chunks].append((index, plot_fn, kwargs))
+
+        pool = get_render_pool()
+        rendered = [None] * len(tasks)
+        for future in [pool.submit(_render_chunk, data, chunk) for chunk in chunks]:
+            for index, *timed in future.result():
+                rendered[index] = timed
+
+    if trace is not None:
+        for (key, _, _), (_, wall_s, cpu_s) in zip(tasks, rendered):
+            trace.add(f"render:{key}", wall_s, cpu_s)
+    return {key: image for (key, _, _), (image, _, _) in zip(tasks, rendered)}
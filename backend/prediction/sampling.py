@@ -0,0 +1,194 @@
+import numpy as np
+import polars as pl
+from dataclasses import dataclass
+from django.conf import settings
+from .eda import stratified_sample
+
+# Training-set sampling. A SamplePlan is made before ingestion: the strategy
+# (SAMPLING_STRATEGIES) and a row budget – enough rows for the slowest
+# model in the job to fit in about SAMPLING_FIT_SECONDS at its fit
+# throughput (feature cells per second), clamped to
+# [SAMPLING_MIN_ROWS, SAMPLING_MAX_ROWS]. Throughput is measured on every
+# fit and kept as a moving average in the result cache; until a model has
+# been measured, DEFAULT_THROUGHPUT is assumed.
+#
+#   none        – every row (still capped by INGEST_MAX_ROWS)
+#   uniform     – a uniform sample of the budget
+#   stratified  – proportional to target deciles, drawn from a uniform pool
+#                 of POOL_FACTOR × budget rows
+#   time        – proportional to calendar month of the date column, every
+#                 month keeping a floor of rows (same pool)
+#   progressive – grow a uniform sample from PROGRESSIVE_START rows,
+#                 doubling, until the validation RMSE of the job's model
+#                 improves by less than PROGRESSIVE_TOLERANCE
+#
+# The outcome is reported in the result's `sampling` block.
+
+STRATEGY_NONE = 'none'
+STRATEGY_UNIFORM = 'uniform'
+STRATEGY_STRATIFIED = 'stratified'
+STRATEGY_TIME = 'time'
+STRATEGY_PROGRESSIVE = 'progressive'
+SAMPLING_STRATEGIES = (STRATEGY_NONE, STRATEGY_UNIFORM, STRATEGY_STRATIFIED, STRATEGY_TIME, STRATEGY_PROGRESSIVE)
+
+# Feature cells (rows × features) fitted per second, measured on one core.
+DEFAULT_THROUGHPUT = {
+    'linear_regression': 20_000_000,
+    'random_forest': 12_000,
+    'decision_tree': 800_000,
+    'xgboost': 1_000_000,
+    'lightgbm': 1_000_000,
+    'pytorch_nn': 300_000,
+}
+POOL_FACTOR = 4
+PROGRESSIVE_START = 1000
+PROGRESSIVE_TOLERANCE = 0.01
+TARGET_BINS = 10
+_STRATUM = '__stratum'
+
+
+def resolve_sampling(strategy=None):
+    """`strategy` or the SAMPLING_STRATEGY setting; raises ValueError for unknown strategies."""
+    strategy = strategy or settings.SAMPLING_STRATEGY
+    if strategy not in SAMPLING_STRATEGIES:
+        raise ValueError(f"sampling must be one of {', '.join(SAMPLING_STRATEGIES)}.")
+    return strategy
+
+
+# ─── BUDGET ─────────────────────────────────────────────────
+
+def _throughput_key(model_name):
+    return f"throughput:{model_name}"
+
+
+def fit_throughput(model_name):
+    """(cells per second, 'measured' or 'default') for `model_name`."""
+    from .cache import get_result_cache
+
+    if settings.RESULT_CACHE_ENABLED:
+        measured = get_result_cache().get(_throughput_key(model_name))
+        if measured:
+            return measured, 'measured'
+    return DEFAULT_THROUGHPUT.get(model_name, DEFAULT_THROUGHPUT['random_forest']), 'default'
+
+
+def record_throughput(model_name, rows, features, seconds, weight=0.3):
+    """Fold one fit's cells-per-second into `model_name`'s moving average."""
+    from .cache import get_result_cache
+
+    if not settings.RESULT_CACHE_ENABLED or seconds <= 0 or not rows:
+        return
+    cache = get_result_cache()
+    observed = rows * max(features, 1) / seconds
+    previous = cache.get(_throughput_key(model_name))
+    cache.set(_throughput_key(model_name),
+              observed if previous is None else (1 - weight) * previous + weight * observed)
+
+
+def row_budget(model_names, n_features):
+    """(rows, source): what the slowest of `model_names` fits in SAMPLING_FIT_SECONDS."""
+    rates = [fit_throughput(name) for name in model_names]
+    rate = min(rate for rate, _ in rates)
+    rows = int(settings.SAMPLING_FIT_SECONDS * rate / max(n_features, 1))
+    rows = min(max(rows, settings.SAMPLING_MIN_ROWS), settings.SAMPLING_MAX_ROWS)
+    return rows, 'measured' if all(source == 'measured' for _, source in rates) else 'default'
+
+
+@dataclass
+class SamplePlan:
+    strategy: str
+    budget: int
+    budget_source: str = 'fixed'
+    probe_model: str = None   # progressive: the model whose validation error is tracked
+
+    @property
+    def ingest_rows(self):
+        """Rows to stream out of the upload (None = all of them)."""
+        if self.strategy == STRATEGY_NONE:
+            return None
+        if self.strategy in (STRATEGY_STRATIFIED, STRATEGY_TIME):
+            return self.budget * POOL_FACTOR
+        return self.budget
+
+
+def plan_sample(strategy, model_names, n_features):
+    strategy = resolve_sampling(strategy)
+    budget, source = row_budget(model_names, n_features)
+    probe = 'lightgbm' if len(model_names) > 1 and 'lightgbm' in model_names else model_names[0]
+    return SamplePlan(strategy, budget, source, probe)
+
+
+# ─── DRAW ───────────────────────────────────────────────────
+
+def date_column(df: pl.DataFrame):
+    """The column to stratify `time` samples by: `date`, else the first temporal column."""
+    if 'date' in df.columns:
+        return 'date'
+    return next((col for col, dtype in df.schema.items() if dtype.is_temporal()), None)
+
+
+def _months(df, col):
+    values = pl.col(col)
+    if df.schema[col] == pl.String:
+        values = values.str.strptime(pl.Date, strict=False)
+    return values.dt.truncate('1mo')
+
+
+def draw_sample(df: pl.DataFrame, plan: SamplePlan, target_col):
+    """(sample, info): `plan` applied to `df`, rows kept in their original order."""
+    info = {'strategy': plan.strategy, 'budget': plan.budget, 'budget_source': plan.budget_source,
+            'rows_available': df.height}
+    n = plan.budget
+    if plan.strategy == STRATEGY_NONE:
+        sample = df
+    elif plan.strategy == STRATEGY_STRATIFIED:
+        bins = pl.col(target_col).rank('ordinal') * TARGET_BINS // (pl.col(target_col).count() + 1)
+        sample = stratified_sample(df.with_columns(bins.alias(_STRATUM)), _STRATUM, n).drop(_STRATUM)
+        info['strata'] = min(TARGET_BINS, df.height)
+    elif plan.strategy == STRATEGY_TIME and (col := date_column(df)) is not None:
+        keyed = df.with_columns(_months(df, col).alias(_STRATUM))
+        sample = stratified_sample(keyed, _STRATUM, n).drop(_STRATUM)
+        info['strata'] = keyed[_STRATUM].n_unique()
+    else:
+        if plan.strategy == STRATEGY_TIME:  # no date column to stratify by
+            info['strategy'] = STRATEGY_UNIFORM
+        sample = stratified_sample(df, None, n)
+    info['rows'] = sample.height
+    return sample, info
+
+
+def progressive_rows(X, y, model_name, seed=42):
+    """
+    Positions of the rows of (X, y) a progressive sample keeps, and the
+    (rows, validation RMSE) steps that chose its size. Samples are nested
+    prefixes of one shuffle; the last 20% of it is the validation set.
+    """
+    from sklearn.metrics import mean_squared_error
+    from .compute import compute_slot
+    from .models import make_model
+
+    order = np.random.default_rng(seed).permutation(len(X))
+    n_val = len(order) // 5
+    val, pool = order[len(order) - n_val:], order[:len(order) - n_val]
+    if len(pool) <= PROGRESSIVE_START or not n_val:
+        return np.sort(order), []
+
+    steps, best = [], None
+    size = PROGRESSIVE_START
+    with compute_slot() as threads:
+        while True:
+            rows = pool[:size]
+            model = make_model(model_name, threads).fit(X.iloc[rows], y.iloc[rows])
+            rmse = mean_squared_error(y.iloc[val], model.predict(X.iloc[val])) ** 0.5
+            steps.append({'rows': int(size), 'rmse': round(float(rmse), 4)})
+            if best is not None and rmse > (1 - PROGRESSIVE_TOLERANCE) * best:
+                size = steps[-2]['rows']
+                break
+            best = rmse if best is None else min(best, rmse)
+            if size == len(pool):
+                break
+            size = min(2 * size, len(pool))
+    # the chosen rows plus their share of validation rows, so the 80/20 split
+    # that follows trains on about `size` rows
+    keep = size + size // 4
+    return np.sort(order[:keep] if size < len(pool) else order), steps
@@ -0,0 +1,79 @@
+import datetime
+import numpy as np
+import orjson
+import polars as pl
+from rest_framework.renderers import JSONRenderer
+
+# JSON-safe payloads without a Python-level walk over every element.
+#
+# sanitize_for_json round-trips the payload through orjson: NumPy scalars
+# and arrays are serialized natively (NaN/±inf become null in C, per array,
+# not per element), dates become ISO strings and non-string keys become
+# strings – the same JSON a client always received. Anything orjson can't
+# take falls back to the original recursive walk, which leaves unknown
+# objects untouched. ORJSONRenderer renders DRF responses with the same
+# encoder.
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    # Only reached for types orjson doesn't handle itself.
+    if isinstance(obj, (datetime.date, datetime.datetime)):  # pd.Timestamp / NaT
+        return obj.isoformat()
+    if isinstance(obj, np.ndarray):  # object / string arrays
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, pl.Series):
+        return obj.to_list()
+    if isinstance(obj, pl.DataFrame):
+        return obj.to_dict(as_series=False)
+    raise TypeError
+
+
+def dumps(data) -> bytes:
+    return orjson.dumps(data, option=OPTIONS, default=_default)
+
+
+def sanitize_for_json(data):
+    """`data` with NaN/inf → None, NumPy → Python, dates → ISO strings, tuples → lists."""
+    try:
+        return orjson.loads(dumps(data))
+    except orjson.JSONEncodeError:
+        return _sanitize_walk(data)
+
+
+def _sanitize_walk(data):
+    if isinstance(data, dict):
+        return {k: _sanitize_walk(v) for k, v in data.items()}
+
+    elif isinstance(data, (list, tuple)):
+        return [_sanitize_walk(i) for i in data]
+
+    elif isinstance(data, (datetime.date, datetime.datetime)):
+        return data.isoformat()
+
+    elif isinstance(data, np.integer):
+        return int(data)
+
+    elif isinstance(data, (np.floating, float)):
+        if np.isnan(data) or np.isinf(data):
+            return None
+        return float(data)
+
+    return data
+
+
+class ORJSONRenderer(JSONRenderer):
+    """DRF JSON renderer backed by orjson; falls back to the stock encoder for odd types."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return dumps(data)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
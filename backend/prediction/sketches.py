@@ -0,0 +1,633 @@
+import base64
+import datetime
+import hashlib
+import io
+import logging
+import math
+import os
+import time
+import zlib
+import numpy as np
+import polars as pl
+from django.conf import settings
+
+# Mergeable EDA statistics.
+#
+# A FrameSketch summarizes every row of a dataset in O(columns²) space:
+#   numeric / datetime  – count, mean, M2, min, max (Chan's parallel update)
+#                         and a t-digest for quartiles
+#   every column        – null count and a HyperLogLog for distinct values
+#   string / boolean    – a capped frequency table for top / freq
+#   numeric pairs       – pairwise-complete sums, sums of squares and
+#                         co-moments (about a per-column shift) for Pearson r
+# Sketches update batch by batch and merge, so statistics for a file that
+# only grew by appended rows are refreshed by sketching just the new rows
+# (sketch_upload; CSV only – other formats are re-sketched in full). Small
+# inputs are exact: the t-digest and top-k table keep one entry per
+# distinct value until they overflow, and distinct counts come from them
+# rather than the HyperLogLog while they do. error_bounds() reports the
+# worst-case error of everything else.
+# statistics() returns the same shape as eda.eda_statistics.
+
+logger = logging.getLogger(__name__)
+
+SKETCH_VERSION = 2
+
+
+# ─── SCALAR SKETCHES ────────────────────────────────────────
+
+class Moments:
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None):
+        self.count, self.mean, self.m2 = count, mean, m2
+        self.minimum, self.maximum = minimum, maximum
+
+    def update(self, values):
+        if len(values):
+            mean = float(values.mean())
+            self.merge(Moments(len(values), mean, float(((values - mean) ** 2).sum()),
+                               float(values.min()), float(values.max())))
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        if not self.count:
+            self.__dict__.update(other.__dict__)
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class TDigest:
+    """
+    Merging t-digest (k1 scale). Equal values share a centroid, so the digest
+    stays exact – one centroid per distinct value – until it holds more than
+    `buffer` centroids.
+    """
+
+    def __init__(self, means=(), weights=(), compression=200, buffer=500, exact=True):
+        self.means = np.asarray(means, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.compression, self.buffer, self.exact = compression, buffer, exact
+
+    def update(self, values):
+        self.merge(TDigest(values, np.ones(len(values))))
+
+    def merge(self, other):
+        means, ids = np.unique(np.concatenate([self.means, other.means]), return_inverse=True)
+        self.weights = np.bincount(ids, weights=np.concatenate([self.weights, other.weights]))
+        self.means = means
+        self.exact = self.exact and other.exact
+        if len(self.means) > self.buffer:
+            self._compress()
+        return self
+
+    def _compress(self):
+        # Centroids whose left edge falls in the same unit of k = δ/2π·asin(2q−1)
+        # merge, so each spans at most one k unit: ≈ δ/2 centroids, densest
+        # near the tails.
+        total = self.weights.sum()
+        q_left = (np.cumsum(self.weights) - self.weights) / total
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * q_left - 1)
+        bucket = np.floor(k - k[0]).astype(np.int64)
+        ids = np.concatenate([[0], np.cumsum(np.diff(bucket) != 0)])
+        weights = np.bincount(ids, weights=self.weights)
+        self.means = np.bincount(ids, weights=self.weights * self.means) / weights
+        self.weights = weights
+        self.exact = False
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def rank_error(self, q):
+        """Bound on |rank(quantile(q)) / n − q|: half of the widest centroid allowed at q (two k units)."""
+        return 0.0 if self.exact else 2 * math.pi * math.sqrt(q * (1 - q)) / self.compression
+
+    def quantile(self, q):
+        """Linear-interpolated quantile (pandas' default on exact data)."""
+        if not len(self.means):
+            return None
+        last = np.cumsum(self.weights) - 1
+        if self.exact:
+            # A value repeated w times occupies ranks [last − w + 1, last].
+            positions = np.column_stack([last - self.weights + 1, last]).ravel()
+            return float(np.interp(q * (self.count - 1), positions, np.repeat(self.means, 2)))
+        positions = last - (self.weights - 1) / 2  # centroid mass at its middle rank
+        return float(np.interp(q * (self.count - 1), positions, self.means))
+
+    def to_dict(self):
+        return {'means': self.means.tolist(), 'weights': self.weights.tolist(),
+                'compression': self.compression, 'buffer': self.buffer, 'exact': self.exact}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class HyperLogLog:
+    """HyperLogLog over Polars' 64-bit value hashes; ≈1.04/√(2^p) relative error."""
+
+    def __init__(self, p=12, registers=None):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8) if registers is None else registers
+
+    def update(self, series: pl.Series):
+        hashes = series.drop_nulls().hash(seed=0, seed_1=1, seed_2=2, seed_3=3).to_numpy()
+        if not len(hashes):
+            return
+        bits = 64 - self.p
+        index = (hashes >> np.uint64(bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << bits) - 1)
+        _, bit_length = np.frexp(rest.astype(np.float64))  # exact: rest < 2**53
+        rank = (bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        zeros = int((self.registers == 0).sum())
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(2.0 ** -self.registers.astype(float))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))  # linear counting
+        return int(round(raw))
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def to_dict(self):
+        return {'p': self.p, 'registers': base64.b64encode(zlib.compress(self.registers.tobytes())).decode()}
+
+    @classmethod
+    def from_dict(cls, data):
+        registers = np.frombuffer(zlib.decompress(base64.b64decode(data['registers'])), dtype=np.uint8).copy()
+        return cls(data['p'], registers)
+
+
+class TopK:
+    """
+    Value frequencies, trimmed to the `k` most frequent (exact until first
+    trimmed). A trimmed value's count is lost, so a later batch restarts it
+    from zero; `error` bounds that undercount for any value (as in
+    Misra-Gries): merging adds the two bounds, and trimming adds the largest
+    count dropped.
+    """
+
+    def __init__(self, items=(), k=1000, exact=True, error=0):
+        self.counts = {value: count for value, count in items}
+        self.k, self.exact, self.error = k, exact, error
+
+    def update(self, series: pl.Series):
+        counts = series.drop_nulls().value_counts(name='count')
+        self.merge(TopK(counts.iter_rows(), self.k))
+
+    def merge(self, other):
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        self.exact = self.exact and other.exact
+        self.error += other.error
+        if len(self.counts) > self.k:
+            ranked = sorted(self.counts.items(), key=lambda item: -item[1])
+            self.counts = dict(ranked[:self.k])
+            self.error += ranked[self.k][1]
+            self.exact = False
+        return self
+
+    def top(self):
+        if not self.counts:
+            return None, None
+        return max(self.counts.items(), key=lambda item: item[1])
+
+    def to_dict(self):
+        return {'items': [[value, count] for value, count in self.counts.items()],
+                'k': self.k, 'exact': self.exact, 'error': self.error}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['items'], data['k'], data['exact'], data['error'])
+
+
+class CoMoments:
+    """Pairwise-complete Pearson correlation from shifted sums (n, Σx, Σx², Σxy per pair)."""
+
+    def __init__(self, width, shift=None, n=None, s=None, q=None, p=None):
+        zeros = lambda: np.zeros((width, width))  # noqa: E731
+        self.shift = None if shift is None else np.asarray(shift, dtype=float)
+        self.n = zeros() if n is None else np.asarray(n, dtype=float)
+        self.s = zeros() if s is None else np.asarray(s, dtype=float)  # s[a, b] = Σ x_a where b present
+        self.q = zeros() if q is None else np.asarray(q, dtype=float)
+        self.p = zeros() if p is None else np.asarray(p, dtype=float)
+
+    def update(self, X):
+        """X: rows × columns float matrix, NaN for missing."""
+        present = ~np.isnan(X)
+        if self.shift is None:
+            counts = present.sum(axis=0)
+            self.shift = np.where(counts, np.nansum(X, axis=0) / np.maximum(counts, 1), 0.0)
+        W = present.astype(float)
+        Xc = np.where(present, X - self.shift, 0.0)
+        self.n += W.T @ W
+        self.s += Xc.T @ W
+        self.q += (Xc * Xc).T @ W
+        self.p += Xc.T @ Xc
+
+    def correlation(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n = self.n
+            cov = self.p - self.s * self.s.T / n
+            var_a = self.q - self.s ** 2 / n
+            var_b = var_a.T
+            corr = cov / np.sqrt(var_a * var_b)
+        corr[(n < 2) | (var_a <= 0) | (var_b <= 0)] = np.nan
+        return corr
+
+    def to_dict(self):
+        return {key: None if value is None else value.tolist()
+                for key, value in (('shift', self.shift), ('n', self.n), ('s', self.s),
+                                   ('q', self.q), ('p', self.p))}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(len(data['n']), **data)
+
+
+# ─── FRAME SKETCH ───────────────────────────────────────────
+
+def _schema_to_text(schema):
+    buffer = io.BytesIO()
+    pl.DataFrame(schema=schema).write_ipc(buffer)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def _schema_from_text(text):
+    return pl.read_ipc(io.BytesIO(base64.b64decode(text))).schema
+
+
+def _epoch_us_to_datetime(value):
+    return None if value is None else datetime.datetime(1970, 1, 1) + datetime.timedelta(microseconds=int(value))
+
+
+class FrameSketch:
+    def __init__(self):
+        self.rows = 0
+        self.schema = None        # prepared (post prepare_eda_frame) schema
+        self.raw_schema = None    # as parsed from the CSV
+        self.kinds = {}
+        self.example_rows = []
+        self.date_column = None
+        self.nulls = {}
+        self.nans = {}
+        self.distinct = {}
+        self.moments = {}
+        self.digests = {}
+        self.top = {}
+        self.corr_columns = []
+        self.comoments = None
+        self.source = None        # {'bytes', 'digest', 'header'} of the sketched file
+
+    @property
+    def columns(self):
+        return list(self.schema) if self.schema is not None else []
+
+    @property
+    def exact(self):
+        """True while every quartile digest and top-k table still holds each distinct value."""
+        return all(d.exact for d in self.digests.values()) and all(t.exact for t in self.top.values())
+
+    def _start(self, df):
+        from .eda import _column_kind
+
+        self.schema = df.schema
+        self.kinds = {col: _column_kind(dtype) for col, dtype in df.schema.items()}
+        self.nulls = {col: 0 for col in df.columns}
+        self.nans = {col: 0 for col in df.columns}
+        self.distinct = {col: HyperLogLog() for col in df.columns}
+        for col, kind in self.kinds.items():
+            if kind == 'categorical':
+                self.top[col] = TopK()
+            else:
+                self.moments[col] = Moments()
+                self.digests[col] = TDigest()
+        self.corr_columns = [col for col, dtype in df.schema.items()
+                             if dtype.is_numeric() or dtype == pl.Boolean]
+        self.comoments = CoMoments(len(self.corr_columns))
+
+    def update(self, df: pl.DataFrame):
+        """Fold a prepared batch (same columns as every earlier batch) into the sketch."""
+        if self.schema is None:
+            self._start(df)
+        elif df.columns != self.columns:
+            raise ValueError("Batch columns differ from the sketched columns.")
+        df = df.cast(dict(self.schema), strict=False)
+
+        if len(self.example_rows) < 5:
+            self.example_rows += df.head(5 - len(self.example_rows)).to_dicts()
+        self.rows += df.height
+
+        for col, kind in self.kinds.items():
+            series = df[col]
+            self.nulls[col] += series.null_count()
+            if kind == 'categorical':
+                self.distinct[col].update(series)
+                self.top[col].update(series if series.dtype == pl.Boolean else series.cast(pl.Utf8))
+                continue
+            if kind == 'datetime':
+                values = series.cast(pl.Datetime('us')).to_physical().cast(pl.Float64)
+            else:
+                values = series.cast(pl.Float64)
+                self.nans[col] += int(values.is_nan().sum())
+                values = values.fill_nan(None)
+            values = values.drop_nulls()
+            self.distinct[col].update(values)
+            values = values.to_numpy()
+            self.moments[col].update(values)
+            self.digests[col].update(values)
+
+        if self.corr_columns:
+            X = df.select([pl.col(col).cast(pl.Float64).fill_nan(None) for col in self.corr_columns])
+            self.comoments.update(X.to_numpy())
+
+    # ─── Statistics ─────────────────────────────────────────
+
+    def distinct_count(self, col):
+        """Distinct non-null values: exact while the column's digest / top-k is, else HyperLogLog."""
+        exact = self.digests.get(col) or self.top.get(col)
+        if exact is not None and exact.exact:
+            return len(exact.means) if col in self.digests else len(exact.counts)
+        return self.distinct[col].estimate()
+
+    def error_bounds(self):
+        """
+        Per column: the bound on quartile rank error, the relative standard
+        error of `unique` and the most `freq` (in rows) can undercount the
+        top value's frequency (0 = exact; quantile_rank is None for columns
+        without quartiles, freq for columns without top / freq).
+        """
+        bounds = {}
+        for col in self.columns:
+            digest, top = self.digests.get(col), self.top.get(col)
+            exact_distinct = (digest or top).exact
+            bounds[col] = {
+                'quantile_rank': None if digest is None else round(digest.rank_error(0.5), 4),
+                'unique_relative': 0.0 if exact_distinct else round(self.distinct[col].relative_error, 4),
+                'freq': None if top is None else top.error,
+            }
+        return bounds
+
+    def _describe(self, col):
+        kind = self.kinds[col]
+        if kind == 'categorical':
+            top, freq = self.top[col].top()
+            return {'count': self.rows - self.nulls[col], 'unique': self.distinct_count(col),
+                    'top': top, 'freq': freq}
+
+        moments, digest = self.moments[col], self.digests[col]
+        stats = {
+            'count': float(moments.count) if kind == 'numeric' else moments.count,
+            'mean': moments.mean if moments.count else None,
+            'std': moments.std,
+            'min': moments.minimum,
+            '25%': digest.quantile(0.25),
+            '50%': digest.quantile(0.5),
+            '75%': digest.quantile(0.75),
+            'max': moments.maximum,
+        }
+        if kind == 'datetime':
+            stats = {key: value if key == 'count' else _epoch_us_to_datetime(value)
+                     for key, value in stats.items() if key != 'std'}
+        return stats
+
+    def statistics(self):
+        """Same keys and layout as eda.eda_statistics, from the sketch alone."""
+        from .eda import _describe_rows
+
+        rows = _describe_rows(set(self.kinds.values()))
+        describe = {}
+        for col in self.columns:
+            stats = self._describe(col)
+            describe[col] = {stat: '' if stats.get(stat) is None else stats[stat] for stat in rows}
+
+        corr = self.comoments.correlation() if self.corr_columns else np.empty((0, 0))
+        correlation = {
+            col_a: {col_b: None if np.isnan(corr[a, b]) else round(float(corr[a, b]), 2)
+                    for b, col_b in enumerate(self.corr_columns)}
+            for a, col_a in enumerate(self.corr_columns)
+        }
+        return {
+            'missing_values': {col: [self.nulls[col]] for col in self.columns},
+            'descriptive_stats': describe,
+            'correlation_matrix': correlation,
+            'unique_values': {col: self.distinct_count(col) + bool(self.nulls[col]) + bool(self.nans[col])
+                              for col in self.columns},
+            'example_rows': self.example_rows,
+        }
+
+    def empty_frame(self):
+        """Zero-row frame with the prepared schema (for graph manifests)."""
+        return pl.DataFrame(schema=self.schema)
+
+    # ─── Serialization ──────────────────────────────────────
+
+    def to_dict(self):
+        from .serialization import sanitize_for_json
+
+        return {
+            'version': SKETCH_VERSION,
+            'polars': pl.__version__,  # value hashes are only stable within a Polars version
+            'rows': self.rows,
+            'schema': _schema_to_text(self.schema),
+            'raw_schema': _schema_to_text(self.raw_schema),
+            'example_rows': sanitize_for_json(self.example_rows),
+            'date_column': self.date_column,
+            'nulls': self.nulls,
+            'nans': self.nans,
+            'distinct': {col: sketch.to_dict() for col, sketch in self.distinct.items()},
+            'moments': {col: sketch.to_dict() for col, sketch in self.moments.items()},
+            'digests': {col: sketch.to_dict() for col, sketch in self.digests.items()},
+            'top': {col: sketch.to_dict() for col, sketch in self.top.items()},
+            'corr_columns': self.corr_columns,
+            'comoments': self.comoments.to_dict(),
+            'source': self.source,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a stored sketch; None if it was written by an incompatible version."""
+        if not data or data.get('version') != SKETCH_VERSION or data.get('polars') != pl.__version__:
+            return None
+        from .eda import _column_kind
+
+        sketch = cls()
+        sketch.rows = data['rows']
+        sketch.schema = _schema_from_text(data['schema'])
+        sketch.raw_schema = _schema_from_text(data['raw_schema'])
+        sketch.kinds = {col: _column_kind(dtype) for col, dtype in sketch.schema.items()}
+        sketch.example_rows = data['example_rows']
+        sketch.date_column = data['date_column']
+        sketch.nulls = data['nulls']
+        sketch.nans = data['nans']
+        sketch.distinct = {col: HyperLogLog.from_dict(d) for col, d in data['distinct'].items()}
+        sketch.moments = {col: Moments.from_dict(d) for col, d in data['moments'].items()}
+        sketch.digests = {col: TDigest.from_dict(d) for col, d in data['digests'].items()}
+        sketch.top = {col: TopK.from_dict(d) for col, d in data['top'].items()}
+        sketch.corr_columns = data['corr_columns']
+        sketch.comoments = CoMoments.from_dict(data['comoments'])
+        sketch.source = data['source']
+        return sketch
+
+
+# ─── UPLOADS ────────────────────────────────────────────────
+
+def _file_digest(path, nbytes):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        remaining = nbytes
+        while remaining > 0 and (chunk := fh.read(min(1 << 20, remaining))):
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def _header(path):
+    with open(path, 'rb') as fh:
+        return fh.readline()
+
+
+def append_offset(path, source):
+    """
+    Byte offset where new rows start if the file at `path` is the sketched
+    file plus appended rows (same leading bytes, ending on a full line);
+    otherwise None.
+    """
+    if not source:
+        return None
+    offset = source['bytes']
+    if os.path.getsize(path) <= offset:
+        return None
+    with open(path, 'rb') as fh:
+        fh.seek(offset - 1)
+        if fh.read(1) != b'\n':
+            return None
+    return offset if _file_digest(path, offset) == source['digest'] else None
+
+
+def _write_delta(path, offset):
+    """Header line + bytes from `offset` on, as a CSV next to the spool."""
+    out_dir = os.path.join(os.path.dirname(path), 'delta')
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, os.path.basename(path).split('.')[0] + f'.{offset}.csv')
+    with open(path, 'rb') as src, open(out_path, 'wb') as out:
+        out.write(src.readline())
+        src.seek(offset)
+        while chunk := src.read(1 << 20):
+            out.write(chunk)
+    return out_path
+
+
+def _csv_batches(sketch, path, batch_rows):
+    if sketch.raw_schema is None:
+        sketch.raw_schema = pl.scan_csv(path).collect_schema()
+    reader = pl.read_csv_batched(
+        path,
+        columns=list(sketch.raw_schema.names()),
+        schema_overrides=dict(sketch.raw_schema),
+        batch_size=batch_rows,
+    )
+    while batches := reader.next_batches(4):
+        yield from batches
+
+
+def _scan_batches(sketch, path, fmt, batch_rows):
+    from .ingest import _scan
+
+    lf = _scan(path, fmt)
+    sketch.raw_schema = lf.collect_schema()
+    n_rows = lf.select(pl.len()).collect().item()
+    for offset in range(0, n_rows, batch_rows):
+        yield lf.slice(offset, batch_rows).collect()
+
+
+def _sketch_batches(sketch, batches):
+    from .eda import prepare_eda_frame
+
+    rows = 0
+    for batch in batches:
+        prepared, date_column = prepare_eda_frame(batch)
+        sketch.date_column = sketch.date_column or date_column
+        sketch.update(prepared)
+        rows += batch.height
+    return rows
+
+
+def sketch_upload(path, digest, previous=None, batch_rows=None):
+    """
+    Sketch a spooled upload in batches, reusing `previous` (a stored
+    FrameSketch dict) when a CSV upload only appends rows to the file it
+    describes. Returns (FrameSketch, info) – (None, None) when
+    INGEST_MAX_ROWS caps ingestion or the file can't be sketched, in which
+    case callers fall back to exact statistics on a loaded frame.
+    """
+    from .ingest import FORMAT_CSV, _resolve, detect_format
+
+    # Row-capped ingestion describes a prefix of the file, not all of it.
+    if settings.INGEST_MAX_ROWS:
+        return None, None
+    start = time.perf_counter()
+    batch_rows = batch_rows or settings.INGEST_BATCH_ROWS
+    size = os.path.getsize(path)
+
+    sketch = FrameSketch.from_dict(previous)
+    if sketch is not None and sketch.source and sketch.source['digest'] == digest:
+        return sketch, {'mode': 'unchanged', 'rows': sketch.rows, 'rows_processed': 0,
+                        'seconds': round(time.perf_counter() - start, 4)}
+    offset = None
+    if sketch is not None and detect_format(path) == FORMAT_CSV:
+        offset = append_offset(path, sketch.source)
+    try:
+        if offset is not None:
+            delta_path = _write_delta(path, offset)
+            try:
+                processed = _sketch_batches(sketch, _csv_batches(sketch, delta_path, batch_rows))
+            finally:
+                os.remove(delta_path)
+        else:
+            sketch = FrameSketch()
+            readable, fmt = _resolve(path)
+            batches = (_csv_batches(sketch, readable, batch_rows) if fmt == FORMAT_CSV
+                       else _scan_batches(sketch, readable, fmt, batch_rows))
+            processed = _sketch_batches(sketch, batches)
+    except (pl.exceptions.PolarsError, ValueError) as e:
+        logger.warning("Could not sketch %s: %s", os.path.basename(path), e)
+        return None, None
+    if sketch.schema is None:  # no rows
+        return None, None
+
+    sketch.source = {'bytes': size, 'digest': digest}
+    info = {
+        'mode': 'append' if offset is not None else 'full',
+        'rows': sketch.rows,
+        'rows_processed': processed,
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+    logger.info("Sketched %s: %s", os.path.basename(path), info)
+    return sketch, info
@@ -0,0 +1,85 @@
+import glob
+import hashlib
+import os
+import time
+import uuid
+from django.conf import settings
+
+
+def spool_path(digest: str, suffix: str = '.csv') -> str:
+    return os.path.join(settings.UPLOAD_SPOOL_DIR, f"{digest}{suffix}")
+
+
+def decompressed_path(path: str) -> str:
+    """Where ingest unpacks a gzip/zstd spooled upload."""
+    return os.path.join(os.path.dirname(path), 'decompressed', os.path.basename(path).split('.')[0] + '.csv')
+
+
+def find_spooled(digest: str):
+    """Path of a previously spooled upload with this digest, or None."""
+    if not digest or not all(c in '0123456789abcdef' for c in digest):
+        return None
+    matches = glob.glob(os.path.join(settings.UPLOAD_SPOOL_DIR, f"{digest}.*"))
+    return matches[0] if matches else None
+
+
+def spool_upload(upload, transient=False):
+    """
+    Stream an uploaded file to the spool dir; returns (path, sha256 digest).
+    A `transient` upload gets a private name instead of the shared
+    content-addressed one, so the caller can discard_spooled() it as soon as
+    it is read without pulling the file from under another request or job.
+    """
+    os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+    suffix = os.path.splitext(getattr(upload, 'name', '') or '')[1].lower() or '.csv'
+    tmp_path = os.path.join(settings.UPLOAD_SPOOL_DIR, f".{uuid.uuid4().hex}.part")
+
+    sha = hashlib.sha256()
+    with open(tmp_path, 'wb') as out:
+        chunks = upload.chunks() if hasattr(upload, 'chunks') else iter(lambda: upload.read(1 << 20), b'')
+        for chunk in chunks:
+            sha.update(chunk)
+            out.write(chunk)
+
+    digest = sha.hexdigest()
+    path = spool_path(f"tmp-{uuid.uuid4().hex}" if transient else digest, suffix)
+    # Same bytes → same file, so a concurrent duplicate upload is harmless.
+    os.replace(tmp_path, path)
+    return path, digest
+
+
+def discard_spooled(path: str):
+    """Remove a spooled upload and its decompressed copy, if any."""
+    for candidate in (path, decompressed_path(path)):
+        try:
+            os.remove(candidate)
+        except FileNotFoundError:
+            pass
+
+
+def sweep_spool(max_age_seconds=None, keep=()):
+    """
+    Delete spooled uploads, decompressed copies and abandoned `.part` files
+    not modified for `max_age_seconds` (default UPLOAD_SPOOL_MAX_AGE_HOURS),
+    except the paths in `keep`. Returns the number of files removed.
+    """
+    if max_age_seconds is None:
+        max_age_seconds = settings.UPLOAD_SPOOL_MAX_AGE_HOURS * 3600
+    cutoff = time.time() - max_age_seconds
+    keep = {os.path.abspath(p) for path in keep for p in (path, decompressed_path(path))}
+    removed = 0
+    for directory in (settings.UPLOAD_SPOOL_DIR, os.path.join(settings.UPLOAD_SPOOL_DIR, 'decompressed')):
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if not entry.is_file() or os.path.abspath(entry.path) in keep:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:  # removed concurrently
+                pass
+    return removed
@@ -7,9 +7,12 @@ from rest_framework import status
 import pandas as pd
 from io import StringIO, BytesIO
 from django.contrib.auth.models import User
+from django.test import override_settings
+import tempfile
 import json
 
 # Create your tests here.
+@override_settings(UPLOAD_SPOOL_DIR=tempfile.mkdtemp(prefix='spool-test-'))
 class PredictAPIViewTest(APITestCase):
 
     def setUp(self):
@@ -41,6 +44,11 @@ class PredictAPIViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('predictions', response.data)
 
+@override_settings(
+    UPLOAD_SPOOL_DIR=tempfile.mkdtemp(prefix='spool-test-'),
+    BLOB_STORE_OPTIONS={'root': tempfile.mkdtemp(prefix='blobs-test-')},
+    METRICS_DIR=tempfile.mkdtemp(prefix='metrics-test-'),
+)
 class EDAAPIViewTest(APITestCase):
 
     def setUp(self):
@@ -85,20 +93,188 @@ class EDAAPIViewTest(APITestCase):
         if response.status_code != 200 or 'correlations' not in response.data:
             print("🔍 Full Response:", response.data)
 
+    def test_eda_rejects_oversized_upload(self):
+        with override_settings(INGEST_MAX_BYTES=10):
+            response = self.client.post(
+                self.eda_url,
+                {'file': BytesIO(b"feature1,target\n1,2\n3,4\n")},
+                format='multipart'
+            )
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_eda_lazy_graphs_render_on_demand(self):
+        csv_bytes = b"feature1,feature2,target\n1,4,7\n2,5,8\n3,6,9\n"
+        response = self.client.post(
+            self.eda_url,
+            {'file': BytesIO(csv_bytes), 'graphs': 'lazy'},
+            format='multipart'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['graphs'], {})
+        self.assertIn('correlation_matrix', response.data)
+        self.assertIn('kde_feature1', response.data['graph_manifest'])
+
+        graph_url = response.data['graph_urls']['kde_feature1']
+        first = self.client.get(graph_url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertFalse(first.data['cached'])
+        self.assertTrue(first.data['graph']['url'])
+
+        second = self.client.get(graph_url)
+        self.assertTrue(second.data['cached'])
+        self.assertEqual(second.data['graph'], first.data['graph'])
+
+        missing = self.client.get(reverse('eda-graph', args=[response.data['result_id'], 'nope']))
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+        # a manifest id the re-read sample no longer produces (e.g. a column typed differently)
+        saved = SavedResult.objects.get(pk=response.data['result_id'])
+        saved.eda_result['graph_manifest'].append('kde_feature3')
+        saved.save()
+        stale = self.client.get(reverse('eda-graph', args=[saved.id, 'kde_feature3']))
+        self.assertEqual(stale.status_code, status.HTTP_410_GONE)
+        self.assertIn('re-run EDA', stale.data['error'])
+
+    def test_eda_returns_chart_data_with_charts_json(self):
+        csv_bytes = b"feature1,feature2,product_type,target\n" + b"".join(
+            f"{i},{i % 7},{'abc'[i % 3]},{2 * i + i % 5}\n".encode() for i in range(60))
+
+        bad = self.client.post(self.eda_url, {'file': BytesIO(csv_bytes), 'charts': 'svg'}, format='multipart')
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.eda_url, {'file': BytesIO(csv_bytes), 'charts': 'json'},
+                                    format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        graphs = response.data['graphs']
+        self.assertEqual(graphs['kde_target']['type'], 'line')
+        self.assertEqual(graphs['violin_target_by_type']['groups_total'], 3)
+        self.assertEqual(sum(graphs['histogram']['series'][0]['counts']), 60)
+        self.assertEqual(graphs['scatter_feature1_vs_target']['shown'], 60)
+
+        lazy = self.client.post(self.eda_url, {'file': BytesIO(csv_bytes), 'charts': 'json', 'graphs': 'lazy'},
+                                format='multipart')
+        graph = self.client.get(lazy.data['graph_urls']['boxplot_target']).data['graph']
+        self.assertEqual(graph['type'], 'box')
+        self.assertEqual(graph['series'][0]['count'], 60)
+
+    def test_appended_upload_only_sketches_new_rows(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        rows = [f"2024-01-{d:02d},{d},{d * 3 % 7},p{d % 3}\n" for d in range(1, 29)]
+        header = "order_date,units,sales,product_name\n"
+        first = (header + ''.join(rows[:20])).encode()
+        appended = (header + ''.join(rows)).encode()
+
+        def upload(data):
+            return self.client.post(self.eda_url, {
+                'file': SimpleUploadedFile('sales.csv', data, content_type='text/csv'),
+                'graphs': 'lazy',
+                'stats': 'approximate',
+            }, format='multipart')
+
+        self.assertEqual(upload(first).data['sketch']['mode'], 'full')
+        response = upload(appended)
+        self.assertEqual(response.data['sketch']['mode'], 'append')
+        self.assertEqual(response.data['sketch']['rows_processed'], 8)
+        self.assertEqual(response.data['shape'], [28, 5])
+
+        saved = SavedResult.objects.get(owner=self.user, file_name='sales.csv', model_name='')
+        saved.eda_sketch = None
+        saved.save()
+        rebuilt = upload(appended)
+        self.assertEqual(rebuilt.data['sketch']['mode'], 'full')
+        for key in ('descriptive_stats', 'missing_values', 'unique_values', 'correlation_matrix'):
+            self.assertEqual(rebuilt.data[key], response.data[key])
+
+    def test_auto_stats_reuse_an_appended_sketch(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        rows = [f"2024-01-{d:02d},{d},{d * 3 % 7},p{d % 3}\n" for d in range(1, 29)]
+        header = "order_date,units,sales,product_name\n"
+
+        def upload(data):
+            return self.client.post(self.eda_url, {
+                'file': SimpleUploadedFile('sales.csv', data, content_type='text/csv'),
+                'graphs': 'lazy',
+            }, format='multipart')
+
+        with patch('prediction.views.eda_statistics') as exact_stats:
+            upload((header + ''.join(rows[:20])).encode())
+            response = upload((header + ''.join(rows)).encode())
+        exact_stats.assert_not_called()
+        self.assertEqual(response.data['sketch']['mode'], 'append')
+        self.assertEqual(response.data['approximation']['mode'], 'exact')
+        self.assertEqual(response.data['descriptive_stats']['units']['max'], 28.0)
+
+    def test_approximate_mode_reports_error_bounds(self):
+        csv_bytes = b"order_date,product_type,units,sales\n" + b"".join(
+            f"2024-{m:02d}-01,{'ab'[m % 3 == 0]},{m},{m * 10}\n".encode() for m in range(1, 13))
+
+        def eda(**data):
+            return self.client.post(self.eda_url, {'file': BytesIO(csv_bytes), **data}, format='multipart')
+
+        self.assertEqual(eda().data['approximation']['mode'], 'exact')
+        with override_settings(EDA_APPROX_ROWS=10, EDA_PLOT_ROWS=6):
+            auto = eda()
+            exact = eda(stats='exact')
+        self.assertEqual(exact.data['approximation']['mode'], 'exact')
+        approximation = auto.data['approximation']
+        self.assertEqual(approximation['mode'], 'approximate')
+        self.assertEqual(approximation['plot_strata'], 'product_type')
+        self.assertEqual(approximation['error_bounds']['units'],
+                         {'quantile_rank': 0.0, 'unique_relative': 0.0, 'freq': None})
+        self.assertEqual(approximation['error_bounds']['product_type']['freq'], 0)
+        self.assertIn('violin_target_by_type', auto.data['graphs'])
+        self.assertEqual(auto.data['descriptive_stats'], exact.data['descriptive_stats'])
+        self.assertEqual(eda(stats='fuzzy').status_code, status.HTTP_400_BAD_REQUEST)
+
 from io import BytesIO
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
 import pandas as pd
+import tempfile
+from django.test import SimpleTestCase, override_settings
+from database.models import SavedResult, TrainingJob
+from prediction.eda import generate_graphs
+from prediction.ingest import IngestLimitError, read_upload
+from prediction.preprocessing import CategoricalEncoder
+from prediction.explain import explain, sample_frame
+from prediction.profiling import Trace
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import gzip
+import os
+import time
+from prediction.jobs import claim_next_job, run_job
+from prediction.cache import invalidate_results
 
+@override_settings(
+    UPLOAD_SPOOL_DIR=tempfile.mkdtemp(prefix='spool-test-'),
+    RESULT_CACHE_DIR=tempfile.mkdtemp(prefix='result-cache-test-'),
+    BLOB_STORE_OPTIONS={'root': tempfile.mkdtemp(prefix='blobs-test-')},
+    ARTIFACT_STORE_OPTIONS={'root': tempfile.mkdtemp(prefix='artifacts-test-')},
+    METRICS_DIR=tempfile.mkdtemp(prefix='metrics-test-'),
+)
 class TrainModelAPIViewTest(APITestCase):
     def setUp(self):
         self.train_url = reverse('train')  # make sure your URL name is 'train'
+        invalidate_results()
         # create & authenticate a user
         self.user = User.objects.create_user(username='tester', password='testpass')
         self.client.force_authenticate(user=self.user)
 
+    def test_train_with_unknown_model(self):
+        file_obj = BytesIO(b"feature1,target\n1,2\n2,4\n")
+        file_obj.name = 'unknown.csv'
+        resp = self.client.post(self.train_url, {'file': file_obj, 'model': 'x' * 200}, format='multipart')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('model must be one of', resp.data['error'])
+        self.assertFalse(TrainingJob.objects.exists())
+
     def test_train_without_file(self):
         """POST without a file should return 400 and an 'error' key."""
         resp = self.client.post(self.train_url, {}, format='multipart')
@@ -107,8 +283,8 @@ class TrainModelAPIViewTest(APITestCase):
 
     def test_train_with_valid_file_default_model(self):
         """
-        POST a small CSV → 200 OK,
-        and response contains all expected fields.
+        POST a small CSV → 202 Accepted with a job id;
+        once the job has run, the status endpoint carries the full result.
         """
         # build a tiny training DataFrame
         df = pd.DataFrame({
@@ -118,6 +294,7 @@ class TrainModelAPIViewTest(APITestCase):
         })
         csv_buf = df.to_csv(index=False).encode()
         file_obj = BytesIO(csv_buf)
+        file_obj.name = 'train.csv'
 
         resp = self.client.post(
             self.train_url,
@@ -125,7 +302,19 @@ class TrainModelAPIViewTest(APITestCase):
             format='multipart'
         )
 
-        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(resp.data['status'], TrainingJob.STATUS_QUEUED)
+        self.assertEqual(resp.data['model_name'], 'random_forest')
+
+        # drain the queue in-process, as the worker pool would
+        self.assertEqual(claim_next_job(), resp.data['job_id'])
+        self.assertEqual(run_job(resp.data['job_id']), TrainingJob.STATUS_DONE)
+
+        status_resp = self.client.get(resp.data['status_url'])
+        self.assertEqual(status_resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(status_resp.data['status'], TrainingJob.STATUS_DONE)
+        self.assertEqual(status_resp.data['progress'], 100)
+        result = status_resp.data['result']
 
         # top‐level keys we expect from train_model_pipeline
         expected_keys = {
@@ -138,26 +327,896 @@ class TrainModelAPIViewTest(APITestCase):
         }
 
         for key in expected_keys:
-            self.assertIn(key, resp.data, msg=f"'{key}' key missing in response")
+            self.assertIn(key, result, msg=f"'{key}' key missing in job result")
 
         # spot‐check some types
-        self.assertIsInstance(resp.data['target_column'], str)
-        self.assertIsInstance(resp.data['features_used'], list)
-        self.assertIsInstance(resp.data['rmse'], (float, int))
-        self.assertIsInstance(resp.data['r2_score'], (float, int))
-        self.assertIsInstance(resp.data['sample_predictions'], list)
+        self.assertIsInstance(result['target_column'], str)
+        self.assertIsInstance(result['features_used'], list)
+        self.assertIsInstance(result['rmse'], (float, int))
+        self.assertIsInstance(result['r2_score'], (float, int))
+        self.assertIsInstance(result['sample_predictions'], list)
         # forecast_plot_base64 may be None if no 'month' column was present;
         # but since we dropped 'date', it's None here.  Just allow str or None:
         self.assertTrue(
-            resp.data['forecast_plot_base64'] is None
-            or isinstance(resp.data['forecast_plot_base64'], str),
+            result['forecast_plot_base64'] is None
+            or isinstance(result['forecast_plot_base64'], str),
             msg="'forecast_plot_base64' must be str or None"
         )
 
-        if 'diagnostic_graphs' in resp.data:
-            self.assertIsInstance(resp.data['diagnostic_graphs'], dict)
+        if 'diagnostic_graphs' in result:
+            self.assertIsInstance(result['diagnostic_graphs'], dict)
             # Optionally check specific graphs like:
-            self.assertIn('residuals_plot', resp.data['diagnostic_graphs'])
+            self.assertIn('residuals_plot', result['diagnostic_graphs'])
+            # graphs are blob references, not inline base64
+            blob_resp = self.client.get(result['diagnostic_graphs']['residuals_plot']['url'])
+            self.assertEqual(blob_resp['Content-Type'], 'image/png')
+
+        # the payload is persisted on the SavedResult row
+        saved = SavedResult.objects.get(pk=status_resp.data['result_id'])
+        self.assertEqual(saved.model_name, 'random_forest')
+        self.assertEqual(saved.model_result['target_column'], 'target')
+
+        # ?debug=1 exposes the per-stage trace
+        self.assertNotIn('trace', status_resp.data)
+        trace = self.client.get(resp.data['status_url'], {'debug': 1}).data['trace']
+        stages = [stage['name'] for stage in trace['stages']]
+        for name in ('ingest', 'fitting', 'rendering', 'render:residuals_plot', 'persist'):
+            self.assertIn(name, stages)
+        self.assertGreater(trace['total']['wall_s'], 0)
+
+        # the default 'standard' tier skips the learning curve and SHAP
+        self.assertEqual(result['diagnostics'], 'standard')
+        self.assertNotIn('learning_curve', stages)
+        self.assertNotIn('shap', stages)
+
+    def test_diagnostics_tiers(self):
+        csv_bytes = b"feature1,product,target\n" + b"".join(
+            f"{i},{'abc'[i % 3]},{3 * i + i % 3}\n".encode() for i in range(60))
+
+        def train(tier):
+            file_obj = BytesIO(csv_bytes)
+            file_obj.name = 'tiers.csv'
+            resp = self.client.post(self.train_url, {'file': file_obj, 'diagnostics': tier}, format='multipart')
+            if resp.status_code == status.HTTP_202_ACCEPTED:
+                run_job(resp.data['job_id'])
+            return resp
+
+        self.assertEqual(train('everything').status_code, status.HTTP_400_BAD_REQUEST)
+
+        fast = self.client.get(train('fast').data['status_url']).data
+        self.assertEqual(fast['diagnostics'], 'fast')
+        self.assertEqual(fast['result']['diagnostic_graphs'], {})
+        self.assertIsInstance(fast['result']['rmse'], (float, int))
+
+        # each tier is its own cache entry
+        full = train('full')
+        self.assertEqual(full.status_code, status.HTTP_202_ACCEPTED)
+        graphs = self.client.get(full.data['status_url']).data['result']['diagnostic_graphs']
+        self.assertIn('learning_curve', graphs)
+        self.assertIn('shap_summary', graphs)
+
+    def test_compare_models_builds_leaderboard(self):
+        csv_bytes = b"feature1,product,target\n" + b"".join(
+            f"{i},{'abc'[i % 3]},{3 * i + 10 * (i % 3)}\n".encode() for i in range(60))
+
+        def upload(url, **data):
+            file_obj = BytesIO(csv_bytes)
+            file_obj.name = 'compare.csv'
+            return self.client.post(url, dict(data, file=file_obj), format='multipart')
+
+        compare_url = reverse('compare-models')
+        self.assertEqual(upload(compare_url, models='linear_regression,bogus').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+        resp = upload(compare_url, models='linear_regression,decision_tree,xgboost', diagnostics='fast')
+        self.assertEqual(resp.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(resp.data['kind'], TrainingJob.KIND_COMPARE)
+        self.assertEqual(run_job(resp.data['job_id']), TrainingJob.STATUS_DONE)
+
+        job = self.client.get(resp.data['status_url'], {'debug': 1}).data
+        board = job['leaderboard']
+        self.assertEqual([row['rank'] for row in board], [1, 2, 3])
+        self.assertEqual([row['rmse'] for row in board], sorted(row['rmse'] for row in board))
+        self.assertIn('fit:xgboost', [stage['name'] for stage in job['trace']['stages']])
+        for row in board:
+            saved = SavedResult.objects.get(pk=row['result_id'])
+            self.assertEqual(saved.model_name, row['model_name'])
+            self.assertEqual(saved.model_result['rmse'], row['rmse'])
+            self.assertFalse(row['cached'])
+
+        # models fitted by the comparison are cache hits for single training
+        single = upload(self.train_url, model='decision_tree', diagnostics='fast')
+        self.assertEqual(single.status_code, status.HTTP_200_OK)
+
+    def test_tune_job_saves_tuned_result(self):
+        csv_bytes = b"feature1,feature2,target\n" + b"".join(
+            f"{i},{i % 5},{3 * i + 7 * (i % 5)}\n".encode() for i in range(300))
+
+        def upload(**data):
+            file_obj = BytesIO(csv_bytes)
+            file_obj.name = 'tune.csv'
+            return self.client.post(reverse('tune-model'), dict(data, file=file_obj), format='multipart')
+
+        self.assertEqual(upload(model='decision_tree', budget_seconds=0).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(upload(model='bogus').status_code, status.HTTP_400_BAD_REQUEST)
+
+        resp = upload(model='decision_tree', budget_seconds=5, diagnostics='fast')
+        self.assertEqual(resp.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(resp.data['kind'], TrainingJob.KIND_TUNE)
+        self.assertEqual(run_job(resp.data['job_id']), TrainingJob.STATUS_DONE)
+
+        result = self.client.get(resp.data['status_url']).data['result']
+        self.assertEqual(result['tuning']['budget_seconds'], 5)
+        self.assertGreaterEqual(result['tuning']['rungs'][0]['trials'], 1)
+        self.assertIn('rmse', result)
+        saved = SavedResult.objects.get(owner=self.user)
+        self.assertEqual(saved.model_name, 'decision_tree_tuned')
+
+    def test_trained_model_explains_new_data(self):
+        csv_bytes = b"feature1,product,target\n" + b"".join(
+            f"{i},{'abc'[i % 3]},{3 * i + 10 * (i % 3)}\n".encode() for i in range(60))
+        file_obj = BytesIO(csv_bytes)
+        file_obj.name = 'explain.csv'
+        resp = self.client.post(self.train_url, {'file': file_obj, 'model': 'decision_tree'}, format='multipart')
+        run_job(resp.data['job_id'])
+        explain_url = self.client.get(resp.data['status_url']).data['explain_url']
+
+        def explain():
+            data = BytesIO(csv_bytes)
+            data.name = 'new.csv'
+            return self.client.post(explain_url, {'file': data}, format='multipart')
+
+        first = explain()
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data['method'], 'tree')
+        self.assertEqual(first.data['rows'], 60)
+        self.assertEqual(set(first.data['feature_attributions']), {'feature1', 'product'})
+        self.assertEqual(len(first.data['shap_values'][0]), 2)
+        self.assertEqual(self.client.get(first.data['beeswarm']['url'])['Content-Type'], 'image/png')
+        self.assertFalse(first.data['cached'])
+        self.assertTrue(explain().data['cached'])
+
+    def test_repeat_upload_is_served_from_cache(self):
+        csv_bytes = b"feature1,target\n" + b"".join(f"{i},{3 * i + 1}\n".encode() for i in range(20))
+
+        def upload(model='linear_regression'):
+            file_obj = BytesIO(csv_bytes)
+            file_obj.name = 'repeat.csv'
+            return self.client.post(self.train_url, {'file': file_obj, 'model': model}, format='multipart')
+
+        first = upload()
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        run_job(first.data['job_id'])
+
+        # identical bytes + model → completed synchronously, no worker needed
+        second = upload()
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['status'], TrainingJob.STATUS_DONE)
+        self.assertIn('score_url', second.data)
+        self.assertEqual(second.data['dataset_hash'], first.data['dataset_hash'])
+        self.assertEqual(second.data['result']['rmse'],
+                         SavedResult.objects.get(pk=second.data['result_id']).model_result['rmse'])
+
+        # a different model is a different cache entry
+        self.assertEqual(upload('decision_tree').status_code, status.HTTP_202_ACCEPTED)
+
+        other = User.objects.create_user(username='evictor', password='pw')
+        self.client.force_authenticate(user=other)
+        resp = self.client.post(reverse('train-cache-invalidate'),
+                                {'dataset_hash': first.data['dataset_hash']}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=self.user)
+
+        resp = self.client.post(reverse('train-cache-invalidate'),
+                                {'dataset_hash': first.data['dataset_hash']}, format='json')
+        self.assertEqual(resp.data['removed'], 1)
+        self.assertEqual(upload().status_code, status.HTTP_202_ACCEPTED)
+
+    def test_trained_model_scores_new_data(self):
+        rows = [(i, ['a', 'b', 'c'][i % 3], 3 * i + (i % 3)) for i in range(30)]
+        csv_bytes = b"feature1,product,target\n" + b"".join(f"{x},{p},{t}\n".encode() for x, p, t in rows)
+        file_obj = BytesIO(csv_bytes)
+        file_obj.name = 'score.csv'
+        resp = self.client.post(self.train_url, {'file': file_obj, 'model': 'pytorch_nn'}, format='multipart')
+        run_job(resp.data['job_id'])
+
+        status_resp = self.client.get(resp.data['status_url'])
+        self.assertIn('score_url', status_resp.data)
+        # the pickled model is kept out of the public graph blob namespace
+        from database.models import TrainedModel
+        artifact = TrainedModel.objects.get(saved_result__owner=self.user).artifact
+        self.assertEqual(self.client.get(reverse('blob', args=[artifact])).status_code, status.HTTP_404_NOT_FOUND)
+
+        # unseen category 'z' and a missing value are tolerated; no target needed
+        new_data = BytesIO(b"feature1,product\n1,a\n2,z\n,b\n")
+        new_data.name = 'new.csv'
+        score = self.client.post(status_resp.data['score_url'], {'file': new_data}, format='multipart')
+        self.assertEqual(score.status_code, status.HTTP_200_OK)
+        self.assertEqual(score.data['rows'], 3)
+        self.assertEqual(score.data['target_column'], 'target')
+        self.assertTrue(all(isinstance(p, float) for p in score.data['predictions']))
+
+        with override_settings(SCORING_MAX_ROWS=2):
+            new_data.seek(0)
+            capped = self.client.post(status_resp.data['score_url'], {'file': new_data}, format='multipart')
+        self.assertEqual(capped.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        bad = BytesIO(b"other\n1\n")
+        bad.name = 'bad.csv'
+        score = self.client.post(status_resp.data['score_url'], {'file': bad}, format='multipart')
+        self.assertEqual(score.status_code, status.HTTP_400_BAD_REQUEST)
+
+        other = User.objects.create_user(username='intruder', password='pw')
+        self.client.force_authenticate(user=other)
+        score = self.client.post(status_resp.data['score_url'], {'file': BytesIO(csv_bytes)}, format='multipart')
+        self.assertEqual(score.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stale_running_job_is_reaped(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from prediction.jobs import reap_stale_jobs
+
+        def running_job(minutes_ago):
+            return TrainingJob.objects.create(
+                owner=self.user, file_name='x.csv', model_name='linear_regression', upload_path='x.csv',
+                status=TrainingJob.STATUS_RUNNING,
+                started_at=timezone.now() - timedelta(minutes=minutes_ago))
+
+        stale, mine, fresh = running_job(120), running_job(120), running_job(5)
+        self.assertEqual(reap_stale_jobs(exclude=[mine.id], max_minutes=60), 1)
+        statuses = [TrainingJob.objects.get(pk=job.pk).status for job in (stale, mine, fresh)]
+        self.assertEqual(statuses, [TrainingJob.STATUS_FAILED, TrainingJob.STATUS_RUNNING,
+                                    TrainingJob.STATUS_RUNNING])
+
+    def test_train_job_failure_is_recorded(self):
+        file_obj = BytesIO(b"a,b\n1,2\n3,4\n")
+        file_obj.name = 'no_target.csv'
+        resp = self.client.post(self.train_url, {'file': file_obj}, format='multipart')
+
+        self.assertEqual(run_job(resp.data['job_id']), TrainingJob.STATUS_FAILED)
+        status_resp = self.client.get(resp.data['status_url'])
+        self.assertEqual(status_resp.data['status'], TrainingJob.STATUS_FAILED)
+        self.assertIn('Target column not found', status_resp.data['error'])
+
+    def test_train_job_status_is_owner_only(self):
+        file_obj = BytesIO(b"x,target\n1,2\n")
+        file_obj.name = 'mine.csv'
+        resp = self.client.post(self.train_url, {'file': file_obj}, format='multipart')
+
+        other = User.objects.create_user(username='intruder', password='pw')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(resp.data['status_url']).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_sampling_strategy_is_validated_and_reported(self):
+        rows = [(i, i % 12 + 1, 3 * i + i % 5) for i in range(200)]
+        csv_bytes = b"x,month_no,sales\n" + b"".join(f"{a},{b},{c}\n".encode() for a, b, c in rows)
+
+        def upload(sampling):
+            file_obj = BytesIO(csv_bytes)
+            file_obj.name = 'sampled.csv'
+            return self.client.post(self.train_url, {'file': file_obj, 'model': 'linear_regression',
+                                                     'diagnostics': 'fast', 'sampling': sampling},
+                                    format='multipart')
+
+        self.assertEqual(upload('everything').status_code, status.HTTP_400_BAD_REQUEST)
+        resp = upload('stratified')
+        self.assertEqual(resp.data['sampling'], 'stratified')
+        run_job(resp.data['job_id'])
+        sampling = self.client.get(resp.data['status_url']).data['result']['sampling']
+        self.assertEqual(sampling['strategy'], 'stratified')
+        self.assertEqual(sampling['rows'], 200)
+
+        # a different strategy is a different cache entry
+        self.assertEqual(upload('none').status_code, status.HTTP_202_ACCEPTED)
+
+    def test_forecast_endpoint_is_cached_and_saved(self):
+        days = pd.date_range('2024-01-01', periods=120, freq='D')
+        frame = pd.DataFrame({'date': days.strftime('%Y-%m-%d'),
+                              'target': [10 + 5 * (d.dayofweek >= 5) + i % 3 for i, d in enumerate(days)]})
+
+        def post(**options):
+            file_obj = BytesIO(frame.to_csv(index=False).encode())
+            file_obj.name = 'daily.csv'
+            return self.client.post(reverse('forecast'), {'file': file_obj, **options}, format='multipart')
+
+        first = post(horizon=14)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertFalse(first.data['cached'])
+        self.assertEqual(first.data['frequency'], 'D')
+        self.assertEqual(len(first.data['forecast']), 14)
+        self.assertEqual(first.data['forecast'][0]['ds'], '2024-04-30')
+        self.assertEqual(SavedResult.objects.get(pk=first.data['result_id']).model_name, 'forecast')
+
+        second = post(horizon=14)
+        self.assertTrue(second.data['cached'])
+        self.assertEqual(second.data['forecast'], first.data['forecast'])
+
+        self.assertEqual(post(horizon=0).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(post(date='missing').status_code, status.HTTP_400_BAD_REQUEST)
+
+class GraphRenderingTest(SimpleTestCase):
+    def test_pool_rendering_matches_serial_order(self):
+        frame = pd.DataFrame({'a': [1, 2, 3, 4], 'b': [4, 3, 2, 1], 'target': [1, 3, 2, 4]})
+
+        with override_settings(GRAPH_RENDER_WORKERS=1):
+            serial = generate_graphs(frame)
+        with override_settings(GRAPH_RENDER_WORKERS=2):
+            pooled = generate_graphs(frame)
+
+        self.assertEqual(list(pooled), list(serial))
+        self.assertEqual(pooled, serial)
+
+class IngestTest(SimpleTestCase):
+    def setUp(self):
+        handle = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        handle.write("id,sales\n" + "".join(f"{i},{i * 2}\n" for i in range(1000)))
+        handle.close()
+        self.path = handle.name
+
+    def test_small_file_is_read_whole(self):
+        df, stats = read_upload(self.path, sample_rows=5000)
+        self.assertEqual(df.height, 1000)
+        self.assertFalse(stats.sampled)
+        self.assertEqual(stats.as_dict()['rows'], 1000)
+
+    @override_settings(INGEST_BATCH_ROWS=64)
+    def test_reservoir_sample_is_bounded_and_ordered(self):
+        df, stats = read_upload(self.path, sample_rows=100, columns=['id'])
+        self.assertEqual(df.columns, ['id'])
+        self.assertEqual(df.height, 100)
+        self.assertEqual((stats.rows, stats.rows_loaded, stats.sampled), (1000, 100, True))
+
+        ids = df['id'].to_list()
+        self.assertEqual(ids, sorted(ids))          # file order is kept
+        self.assertGreater(ids[-1] - ids[0], 500)   # spread across the file, not a head()
+        again, _ = read_upload(self.path, sample_rows=100, columns=['id'])
+        self.assertEqual(again['id'].to_list(), ids)
+
+    def test_row_and_byte_limits(self):
+        df, stats = read_upload(self.path, max_rows=10)
+        self.assertEqual(df.height, 10)
+        self.assertTrue(stats.truncated)
+        df, stats = read_upload(self.path, max_rows=1000)
+        self.assertEqual((df.height, stats.rows, stats.truncated), (1000, 1000, False))
+        self.assertTrue(read_upload(self.path, max_rows=999)[1].truncated)
+        with self.assertRaises(IngestLimitError):
+            read_upload(self.path, max_bytes=100)
+
+    def test_columnar_and_compressed_uploads(self):
+        frame = pl.read_csv(self.path)
+        base = tempfile.mkdtemp(prefix='ingest-test-')
+        frame.write_parquet(f"{base}/a.parquet")
+        frame.write_ipc(f"{base}/b.arrow")
+        with open(self.path, 'rb') as src, gzip.open(f"{base}/c.csv.gz", 'wb') as out:
+            out.write(src.read())
+        with open(self.path, 'rb') as src, pa.output_stream(f"{base}/d.csv.zst", compression='zstd') as out:
+            out.write(src.read())
+
+        for name, fmt in [('a.parquet', 'parquet'), ('b.arrow', 'ipc'),
+                          ('c.csv.gz', 'gzip'), ('d.csv.zst', 'zstd')]:
+            df, stats = read_upload(f"{base}/{name}")
+            self.assertEqual(stats.format, fmt)
+            self.assertTrue(df.equals(frame), name)
+
+            sample, stats = read_upload(f"{base}/{name}", sample_rows=100, columns=['sales'])
+            self.assertEqual((sample.height, sample.columns, stats.rows), (100, ['sales'], 1000))
+
+        # the byte limit also bounds the decompressed size
+        with self.assertRaises(IngestLimitError):
+            read_upload(f"{base}/c.csv.gz", max_bytes=os.path.getsize(f"{base}/c.csv.gz") + 1)
+
+    def test_spool_expiry_and_transient_uploads(self):
+        from prediction.spool import decompressed_path, discard_spooled, spool_upload, sweep_spool
+
+        def upload(name, data):
+            file_obj = BytesIO(data)
+            file_obj.name = name
+            return file_obj
+
+        with override_settings(UPLOAD_SPOOL_DIR=tempfile.mkdtemp(prefix='spool-test-')):
+            path, _ = spool_upload(upload('once.csv', b"a\n1\n"), transient=True)
+            self.assertTrue(os.path.basename(path).startswith('tmp-'))
+            discard_spooled(path)
+            self.assertFalse(os.path.exists(path))
+
+            old, _ = spool_upload(upload('old.csv.gz', gzip.compress(b"a\n1\n")))
+            kept, _ = spool_upload(upload('kept.csv', b"a\n2\n"))
+            fresh, _ = spool_upload(upload('fresh.csv', b"a\n3\n"))
+            read_upload(old)
+            stale = time.time() - 7200
+            for stale_path in (old, decompressed_path(old), kept):
+                os.utime(stale_path, (stale, stale))
+
+            self.assertEqual(sweep_spool(3600, keep=[kept]), 2)
+            self.assertEqual([os.path.exists(p) for p in (old, decompressed_path(old), kept, fresh)],
+                             [False, False, True, True])
+
+    def test_parquet_native_dates_train_and_profile(self):
+        from prediction.eda import prepare_eda_frame
+        from prediction.models import train_model_pipeline
+
+        path = f"{tempfile.mkdtemp(prefix='ingest-test-')}/dated.parquet"
+        days = pl.date_range(pl.date(2024, 1, 1), pl.date(2024, 12, 31), eager=True)
+        pl.DataFrame({'date': days, 'units': np.arange(days.len()) % 17,
+                      'sales': np.arange(days.len()) * 1.5}).write_parquet(path)
+        df, _ = read_upload(path)
+        self.assertEqual(df.schema['date'], pl.Date)
+
+        report = train_model_pipeline(df, 'linear_regression', diagnostics='fast')
+        self.assertIn('month', report['features_used'])
+        eda_df, date_column = prepare_eda_frame(df)
+        self.assertEqual(date_column, 'date')
+        self.assertEqual(eda_df['month'].max(), 12)
+
+
+@override_settings(METRICS_DIR=tempfile.mkdtemp(prefix='metrics-test-'), METRICS_TOKEN='s3cret')
+class ProfilingTest(SimpleTestCase):
+    def test_trace_stages_are_exported_as_prometheus_metrics(self):
+        trace = Trace('unit')
+        with trace.stage('load'):
+            bytearray(8 * 1024 * 1024)
+        trace.mark('fit')
+        trace.add('render:scatter_a"b\\c\nd_vs_sales', 0.01)
+        trace.add('render:boxplot_units', 0.02)
+        result = trace.finish()
+
+        stages = [s for s in result['stages'] if not s['name'].startswith('render:')]
+        self.assertEqual([s['name'] for s in stages], ['load', 'fit'])
+        self.assertTrue(all(s['wall_s'] >= 0 and s['peak_rss_mb'] > 0 for s in stages))
+
+        resp = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(resp.status_code, 200)
+        body = resp.content.decode()
+        self.assertIn('revenue_stage_duration_seconds_count{pipeline="unit",stage="load"} 1', body)
+        self.assertIn('revenue_stage_duration_seconds_bucket{pipeline="unit",stage="total",le="+Inf"} 1', body)
+        self.assertIn('revenue_stage_peak_rss_bytes{pipeline="unit",stage="fit"}', body)
+        # per-figure stages (column names) share one series
+        self.assertIn('revenue_stage_duration_seconds_count{pipeline="unit",stage="render"} 2', body)
+        self.assertNotIn('scatter', body)
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+    def test_metric_label_values_are_escaped(self):
+        from prediction.profiling import _labels
+
+        self.assertEqual(_labels('train', 'a"b\\c\nd'), 'pipeline="train",stage="a\\"b\\\\c\\nd"')
+
+    def test_rss_without_proc(self):
+        from prediction.profiling import rss_bytes
+
+        with patch('prediction.profiling.open', side_effect=FileNotFoundError, create=True):
+            self.assertGreater(rss_bytes(), 0)  # getrusage high-water mark
+            with patch.dict('sys.modules', {'resource': None}):
+                self.assertIsNone(rss_bytes())
+                trace = Trace('no-proc')
+                trace.mark('fit')
+                result = trace.finish()
+        self.assertIsNone(result['stages'][0]['peak_rss_mb'])
+        self.assertIsNone(result['total']['peak_rss_mb'])
+
+
+class EDAStatisticsTest(SimpleTestCase):
+    def test_polars_statistics_match_pandas(self):
+        import datetime
+        from prediction.eda import eda_statistics
+        from prediction.serialization import sanitize_for_json
+
+        df = pl.DataFrame({
+            'when': [datetime.datetime(2024, 1, d) for d in (1, 3, 9)] + [None],
+            'a': [1.0, None, 3.0, 4.0],
+            'b': [2, 5, 7, 7],
+            'c': [1.0, 2.0, float('nan'), 3.0],
+            'name': ['x', 'y', 'x', None],
+        })
+        df_pd = df.to_pandas()
+        stats = sanitize_for_json(eda_statistics(df))
+        self.assertEqual(stats['descriptive_stats'],
+                         sanitize_for_json(df_pd.describe(include='all').fillna('').to_dict()))
+        self.assertEqual(stats['correlation_matrix'],
+                         sanitize_for_json(df_pd.corr(numeric_only=True).round(2).to_dict()))
+        self.assertEqual(stats['missing_values'], df.null_count().to_dict(as_series=False))
+        self.assertEqual(stats['unique_values'], {'when': 4, 'a': 4, 'b': 3, 'c': 4, 'name': 3})
+        self.assertEqual(stats['example_rows'][1]['name'], 'y')
+
+
+class SketchTest(SimpleTestCase):
+    def test_trimmed_top_k_bounds_its_undercount(self):
+        from prediction.sketches import TopK
+
+        rng = np.random.default_rng(3)
+        batches = [rng.choice(list('abcdefgh'), size=200, p=[.3, .2, .15, .1, .1, .05, .05, .05])
+                   for _ in range(10)]
+        top = TopK(k=3)
+        for batch in batches:
+            top = TopK.from_dict(json.loads(json.dumps(top.to_dict())))  # stored between appends
+            top.update(pl.Series(batch))
+        truth = pl.Series(np.concatenate(batches)).value_counts(name='count')
+        self.assertFalse(top.exact)
+        self.assertGreater(top.error, 0)
+        for value, count in truth.iter_rows():
+            self.assertLessEqual(count - top.counts.get(value, 0), top.error)
+            self.assertGreaterEqual(count, top.counts.get(value, 0))
+
+    def test_compressed_digest_stays_within_its_error_bound(self):
+        from prediction.sketches import TDigest
+
+        values = np.random.default_rng(1).normal(size=50_000)
+        digest = TDigest()
+        for chunk in np.array_split(values, 20):
+            digest.update(chunk)
+        self.assertFalse(digest.exact)
+        self.assertLess(len(digest.means), digest.buffer)
+        for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+            rank = np.mean(values <= digest.quantile(q))
+            self.assertLessEqual(abs(rank - q), digest.rank_error(q))
+
+    def test_stratified_sample_keeps_small_strata(self):
+        from prediction.eda import stratified_sample
+
+        df = pl.DataFrame({'type': ['a'] * 9000 + ['b'] * 900 + ['c'] * 90 + [None] * 10, 'row': range(10_000)})
+        sample = stratified_sample(df, 'type', 1000)
+        sizes = dict(sample.group_by('type').len().iter_rows())
+        self.assertLessEqual(sample.height, 1000)
+        self.assertEqual((sizes['c'], sizes[None]), (90, 10))
+        self.assertGreater(sizes['a'], sizes['b'])
+        self.assertTrue(sample['row'].is_sorted())
+
+    def test_merged_batches_match_exact_statistics(self):
+        import datetime
+        from prediction.eda import eda_statistics
+        from prediction.serialization import sanitize_for_json
+        from prediction.sketches import FrameSketch
+
+        rng = np.random.default_rng(0)
+        df = pl.DataFrame({
+            'when': [datetime.datetime(2024, 1, 1) + datetime.timedelta(days=int(d)) for d in rng.integers(0, 90, 300)],
+            'a': [None if r < 0.1 else x for r, x in zip(rng.random(300), rng.normal(size=300))],
+            'b': rng.integers(0, 20, 300),
+            'c': np.where(rng.random(300) < 0.05, np.nan, rng.normal(size=300)),
+            'name': rng.choice(['x', 'y', 'z'], 300),
+        })
+        sketch = FrameSketch()
+        for start in range(0, 300, 70):
+            sketch.update(df.slice(start, 70))
+        sketch = FrameSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+
+        exact, merged = sanitize_for_json(eda_statistics(df)), sanitize_for_json(sketch.statistics())
+        for key in ('missing_values', 'unique_values', 'correlation_matrix', 'example_rows'):
+            self.assertEqual(merged[key], exact[key], key)
+        for col, stats in exact['descriptive_stats'].items():
+            for stat, value in stats.items():
+                if isinstance(value, float):
+                    self.assertAlmostEqual(merged['descriptive_stats'][col][stat], value, places=9)
+                elif col != 'when' or stat not in ('mean', '25%', '50%', '75%'):  # µs rounding
+                    self.assertEqual(merged['descriptive_stats'][col][stat], value, (col, stat))
+
+
+class SerializationTest(SimpleTestCase):
+    def test_sanitize_matches_the_json_contract(self):
+        import datetime
+        from prediction.serialization import ORJSONRenderer, sanitize_for_json
+
+        payload = {
+            'shape': (3, 2),
+            'stats': {'mean': np.float64('nan'), 'max': np.float32('inf'), 'count': np.int64(3), 'ok': 1.5},
+            'values': np.array([1.0, np.nan, -np.inf]),
+            'when': [datetime.date(2024, 1, 2), pd.Timestamp('2024-01-02 03:04:05')],
+            'missing': float('nan'),
+            'counts': {1: 2},
+        }
+        self.assertEqual(sanitize_for_json(payload), {
+            'shape': [3, 2],
+            'stats': {'mean': None, 'max': None, 'count': 3, 'ok': 1.5},
+            'values': [1.0, None, None],
+            'when': ['2024-01-02', '2024-01-02T03:04:05'],
+            'missing': None,
+            'counts': {'1': 2},
+        })
+
+        # types orjson can't encode fall back to the recursive walk and are kept
+        marker = object()
+        self.assertEqual(sanitize_for_json({'x': [np.float64('nan'), marker]}), {'x': [None, marker]})
+
+        rendered = ORJSONRenderer().render({'a': np.arange(3), 'b': float('nan')})
+        self.assertEqual(json.loads(rendered), {'a': [0, 1, 2], 'b': None})
+
+
+class CompareModelsTest(SimpleTestCase):
+    @override_settings(COMPARE_WORKERS=2)
+    def test_pool_fits_match_serial_fits(self):
+        from prediction.compare import compare_models
+        from prediction.models import prepare_training_data
+
+        df = pl.DataFrame({'x': list(range(200)), 'target': [2.0 * i + i % 7 for i in range(200)]})
+        data = prepare_training_data(df)
+        names = ['linear_regression', 'decision_tree']
+        pooled = dict(compare_models(data, names, 'fast'))
+        with override_settings(COMPARE_WORKERS=1):
+            serial = dict(compare_models(data, names, 'fast'))
+        for name in names:
+            self.assertEqual(pooled[name].report['rmse'], serial[name].report['rmse'])
+            self.assertIsNotNone(pooled[name].bundle)
+
+
+class TuningTest(SimpleTestCase):
+    @override_settings(TUNING_CANDIDATES=9, COMPARE_WORKERS=1)
+    def test_successive_halving_keeps_a_third_and_never_loses_to_the_defaults(self):
+        from prediction.models import fit_model, prepare_training_data
+        from prediction.tuning import tune
+
+        rng = np.random.default_rng(0)
+        x = rng.uniform(0, 10, 3000)
+        df = pl.DataFrame({'x': x, 'noise': rng.normal(size=3000), 'target': np.sin(x) * 10 + x ** 2})
+        data = prepare_training_data(df)
+
+        params, report = tune(data, 'lightgbm', 60)
+        self.assertEqual(report['resource'], 'rounds')
+        self.assertFalse(report['budget_exhausted'])
+        self.assertEqual(report['rungs'][0]['trials'], 9)
+        self.assertEqual([rung['resource'] for rung in report['rungs']], [111, 333, 1000][:len(report['rungs'])])
+        self.assertLessEqual(report['best_validation_rmse'], report['default_validation_rmse'])
+        self.assertLessEqual(params['n_estimators'], 1000)
+        with patch('prediction.models.record_throughput') as record:
+            fit_model(data, 'lightgbm', diagnostics='fast', params=params)  # the tuned refit
+            record.assert_not_called()
+            fit_model(data, 'lightgbm', diagnostics='fast')
+            record.assert_called_once()
+
+        params, report = tune(data, 'random_forest', 1)  # cut short: only part of the first rung runs
+        self.assertTrue(report['budget_exhausted'])
+        self.assertGreaterEqual(params['n_estimators'], 100)
+
+    @override_settings(COMPARE_WORKERS=1)
+    def test_a_failing_configuration_is_dropped_and_counted(self):
+        from prediction.models import prepare_training_data
+        from prediction.tuning import tune
+
+        rng = np.random.default_rng(0)
+        df = pl.DataFrame({'x': rng.uniform(0, 10, 600), 'target': rng.normal(size=600)})
+        configs = [{}, {'fit_intercept': 'bogus'}, {'positive': True}]
+        with patch('prediction.tuning.candidates', return_value=configs):
+            params, report = tune(prepare_training_data(df), 'linear_regression', 60)
+        self.assertEqual(report['failed_trials'], 1)
+        self.assertEqual(report['rungs'][0]['failed'], 1)
+        self.assertNotEqual(params.get('fit_intercept'), 'bogus')
+
+        with patch('prediction.tuning.candidates', return_value=[{'fit_intercept': 'bogus'}]):
+            with self.assertRaisesRegex(ValueError, 'failed to train'):
+                tune(prepare_training_data(df), 'linear_regression', 60)
+
+
+class ChartsTest(SimpleTestCase):
+    def test_chart_statistics_match_the_plotting_libraries(self):
+        from matplotlib.cbook import boxplot_stats
+        from scipy.stats import gaussian_kde
+        from prediction.charts import MAX_POINTS, box_stats, correlation_chart, kde, scatter
+
+        rng = np.random.default_rng(0)
+        values = np.concatenate([rng.normal(0, 1, 5000), rng.normal(6, 0.5, 1000), [30.0]])
+
+        x, density = kde(values)
+        exact = gaussian_kde(values)(x)
+        self.assertLess(np.max(np.abs(np.array(density) - exact)), 0.01 * exact.max())
+
+        expected = boxplot_stats(values)[0]
+        box = box_stats(values)
+        self.assertAlmostEqual(box['median'], expected['med'], places=3)
+        self.assertAlmostEqual(box['q3'], expected['q3'], places=3)
+        self.assertAlmostEqual(box['whiskers'][1], expected['whishi'], places=3)
+        self.assertEqual(box['outlier_count'], len(expected['fliers']))
+
+        chart = scatter(values, values, 't', 'x', 'y')
+        self.assertEqual((chart['rows'], chart['shown'], len(chart['x'])), (len(values), MAX_POINTS, MAX_POINTS))
+
+        df = pl.DataFrame({'a': [1.0, 2, 3, None, 5, 6], 'b': [2.0, 1, 4, 3, None, 7], 'c': [3, 2, 1, 0, 1, 2]})
+        corr = correlation_chart(df)['values']
+        np.testing.assert_allclose(np.array(corr, dtype=float), df.to_pandas().corr().to_numpy(), atol=1e-4)
+
+    def test_full_diagnostics_as_chart_data_rasterize_for_export(self):
+        from database.blobs import resolve_graph
+        from prediction.models import train_model_pipeline
+
+        rng = np.random.default_rng(0)
+        df = pl.DataFrame({'date': [f"2024-{m:02d}-01" for m in rng.integers(1, 13, 300)],
+                           'units': rng.uniform(0, 100, 300)}).with_columns(
+            (pl.col('units') * 3 + rng.normal(0, 5, 300)).alias('sales'))
+        report = train_model_pipeline(df, 'decision_tree', diagnostics='full', charts='json')
+
+        graphs = report['diagnostic_graphs']
+        self.assertEqual(set(graphs), {'residuals_plot', 'pred_vs_actual', 'feature_importance',
+                                       'learning_curve', 'error_histogram', 'shap_summary'})
+        self.assertEqual(graphs['shap_summary']['type'], 'beeswarm')
+        self.assertEqual(report['forecast_plot']['series'][0]['x'], [1, 2, 3, 4, 5])
+        self.assertIsNone(report['forecast_plot_base64'])
+        json.dumps(report)
+        for chart in list(graphs.values()) + [report['forecast_plot']]:
+            self.assertTrue(resolve_graph(chart).startswith(b'\x89PNG'))
+
+
+class ExplainTest(SimpleTestCase):
+    def test_attributions_add_up_to_predictions(self):
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.linear_model import LinearRegression
+        from sklearn.tree import DecisionTreeRegressor
+        from xgboost import XGBRegressor
+        from lightgbm import LGBMRegressor
+
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.normal(size=(300, 4)), columns=list('abcd'))
+        y = 3 * X['a'] - 2 * X['b'] + rng.normal(scale=0.1, size=300)
+        models = {
+            'random_forest': (RandomForestRegressor(n_estimators=10, random_state=0), 'tree'),
+            'decision_tree': (DecisionTreeRegressor(max_depth=4), 'tree'),
+            'xgboost': (XGBRegressor(n_estimators=20, verbosity=0), 'native'),
+            'lightgbm': (LGBMRegressor(n_estimators=20, verbose=-1), 'native'),
+            'linear_regression': (LinearRegression(), 'generic'),
+        }
+        for name, (model, method) in models.items():
+            with self.subTest(model=name):
+                model.fit(X, y)
+                sample = sample_frame(X, 50)
+                attributions = explain(model, name, sample, background=X, background_rows=20)
+                self.assertEqual(attributions.method, method)
+                self.assertEqual(attributions.values.shape, (50, 4))
+                np.testing.assert_allclose(attributions.values.sum(axis=1) + attributions.base_value,
+                                           model.predict(sample), rtol=1e-3, atol=1e-3)
+                self.assertEqual(list(attributions.mean_abs())[:2], ['a', 'b'])
+
+
+@override_settings(RESULT_CACHE_DIR=tempfile.mkdtemp(prefix='result-cache-test-'),
+                   SAMPLING_FIT_SECONDS=1, SAMPLING_MIN_ROWS=100, SAMPLING_MAX_ROWS=10_000)
+class SamplingTest(SimpleTestCase):
+    def test_strata_are_kept_and_budget_follows_measured_throughput(self):
+        from prediction.sampling import SamplePlan, draw_sample, record_throughput, row_budget
+
+        rng = np.random.default_rng(0)
+        days = [f"2024-{m:02d}-01" for m in rng.choice(12, 5000, p=[0.01] + [0.09] * 11) + 1]
+        df = pl.DataFrame({'date': days, 'sales': rng.lognormal(3, 1, 5000)})
+
+        sample, info = draw_sample(df, SamplePlan('time', 500), 'sales')
+        self.assertEqual(info['strata'], 12)
+        self.assertEqual(sample['date'].n_unique(), 12)
+        self.assertGreaterEqual((sample['date'] == '2024-01-01').sum(), 20)  # rare month keeps its floor
+
+        sample, info = draw_sample(df, SamplePlan('stratified', 500), 'sales')
+        self.assertEqual(info['rows'], 500)
+        self.assertLess(abs(sample['sales'].median() - df['sales'].median()), 0.1 * df['sales'].median())
+
+        self.assertEqual(row_budget(['lightgbm'], 10), (10_000, 'default'))
+        record_throughput('lightgbm', rows=5000, features=10, seconds=10)  # 5000 cells/s
+        self.assertEqual(row_budget(['lightgbm'], 10), (500, 'measured'))
+        self.assertEqual(row_budget(['lightgbm', 'random_forest'], 10)[1], 'default')
+
+    def test_progressive_sample_stops_when_validation_error_plateaus(self):
+        from prediction.sampling import progressive_rows
+
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame({'a': rng.normal(size=20_000)})
+        y = 2 * X['a'] + rng.normal(scale=0.1, size=20_000)
+        rows, steps = progressive_rows(X, y, 'linear_regression')
+
+        self.assertEqual([step['rows'] for step in steps], [1000, 2000])
+        self.assertEqual(len(rows), 1250)
+        self.assertTrue(np.all(np.diff(rows) > 0))
+
+
+@override_settings(COMPUTE_CORES=2, COMPUTE_LOCK_DIR=tempfile.mkdtemp(prefix='compute-test-'),
+                   COMPUTE_POLL_INTERVAL=0.01)
+class ComputeBudgetTest(SimpleTestCase):
+    def test_calls_wait_for_free_cores_and_nested_slots_reuse_the_grant(self):
+        import threading
+        import time
+        import torch
+        from prediction.compute import compute_slot, cores_in_use
+
+        events = []
+
+        def other_call():
+            with compute_slot(1) as threads:
+                events.append(('granted', threads, time.perf_counter()))
+
+        with compute_slot(4) as threads:
+            self.assertEqual(threads, 2)  # capped at COMPUTE_CORES
+            self.assertEqual(torch.get_num_threads(), 2)
+            self.assertEqual(cores_in_use(), 2)
+            with compute_slot(1) as nested:
+                self.assertEqual(nested, 2)
+            waiter = threading.Thread(target=other_call)
+            waiter.start()
+            time.sleep(0.2)
+            self.assertEqual(events, [])
+            released = time.perf_counter()
+        waiter.join(5)
+
+        self.assertEqual(events[0][:2], ('granted', 1))
+        self.assertGreaterEqual(events[0][2], released)
+        self.assertEqual(cores_in_use(), 0)
+
+
+class ForecastTest(SimpleTestCase):
+    def test_backtest_beats_seasonal_naive_and_intervals_bracket_forecast(self):
+        from prediction.forecasting import ForecastSpec, forecast
+
+        rng = np.random.default_rng(0)
+        days = pl.date_range(pl.date(2023, 1, 1), pl.date(2023, 12, 31), eager=True)
+        rows = []
+        for shop, scale in (('north', 1.0), ('south', 2.0)):
+            trend = np.linspace(50, 80, days.len())
+            weekly = 10 * (days.dt.weekday().to_numpy() >= 6)
+            rows.append(pl.DataFrame({'date': days, 'shop': shop,
+                                      'units': scale * (trend + weekly + rng.normal(0, 2, days.len()))}))
+        lf = pl.concat(rows).lazy()
+
+        report = forecast(lf, ForecastSpec(horizon=28, date_column='date', target_column='units',
+                                           group_column='shop'))
+        self.assertEqual(report['frequency'], 'D')
+        self.assertEqual(report['history']['series'], 2)
+        self.assertLess(report['backtest']['mae'], report['backtest']['baseline']['mae'])
+        self.assertEqual(len(report['forecast']), 2 * 28)
+        self.assertEqual(len(report['total']), 28)
+        self.assertEqual(report['total'][0]['ds'], '2024-01-01')
+        for row in report['forecast'] + report['total']:
+            self.assertLessEqual(row['lower'], row['prediction'])
+            self.assertLessEqual(row['prediction'], row['upper'])
+
+
+class CategoricalEncoderTest(SimpleTestCase):
+    def test_codes_match_label_encoder_and_unseen_is_minus_one(self):
+        from sklearn.preprocessing import LabelEncoder
+
+        train = pl.DataFrame({'shop': ['b', 'a', None, 'c', 'a'], 'units': [1, 2, 3, 4, 5]})
+        encoder = CategoricalEncoder()
+        encoded = encoder.fit_transform(train)
+
+        self.assertEqual(encoder.columns, ['shop'])
+        expected = LabelEncoder().fit_transform(train['shop'].to_pandas().fillna('MISSING'))
+        self.assertEqual(encoded['shop'].to_list(), expected.tolist())
+        self.assertEqual(encoded['units'].to_list(), train['units'].to_list())
+
+        restored = CategoricalEncoder.from_dict(json.loads(json.dumps(encoder.to_dict())))
+        fresh = restored.transform(pl.DataFrame({'shop': ['c', 'zzz', None]}))
+        self.assertEqual(fresh['shop'].to_list(), [3, -1, 0])  # MISSING sorts first
+
+    def test_bundles_pickled_with_label_encoders_still_load(self):
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import LabelEncoder
+        from prediction.registry import ModelBundle, dump_bundle, load_bundle
+
+        X = pd.DataFrame({'shop': [0, 1, 2, 0], 'units': [1.0, 2.0, 3.0, 4.0]})
+        bundle = ModelBundle('linear_regression', LinearRegression().fit(X, [1.0, 5.0, 9.0, 4.0]),
+                             ['shop', 'units'], 'sales')
+        # the layout before CategoricalEncoder replaced per-column LabelEncoders
+        del bundle.__dict__['encoder']
+        bundle.__dict__['encoders'] = {'shop': LabelEncoder().fit(['a', 'b', 'c'])}
+
+        restored = load_bundle(dump_bundle(bundle))
+        self.assertEqual(restored.encoder.categories, {'shop': ['a', 'b', 'c']})
+        scored = restored.transform(pl.DataFrame({'shop': ['c', 'zzz'], 'units': [1.0, 2.0]}))
+        self.assertEqual(scored['shop'].to_list(), [2.0, -1.0])
+        self.assertEqual(len(restored.predict(pl.DataFrame({'shop': ['a'], 'units': [1.0]}))), 1)
+
+
+class NeuralRegressorTest(SimpleTestCase):
+    def test_early_stopping_scaling_and_traced_inference(self):
+        import pickle
+        from sklearn.base import clone
+        from prediction.nn import NeuralRegressor
+
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame({'units': rng.uniform(0, 1000, 2000), 'month': rng.integers(1, 13, 2000)})
+        y = 5000 + 3 * X['units'] - 40 * X['month'] + rng.normal(0, 20, 2000)
+
+        model = clone(NeuralRegressor(max_epochs=500)).fit(X[:1600], y[:1600])
+        self.assertLess(model.n_epochs_, 500)
+        self.assertGreater(model.score(X[1600:], y[1600:]), 0.95)
+
+        expected = model.predict(X[1600:])
+        traced = pickle.loads(pickle.dumps(model.set_params(inference='torchscript')))
+        np.testing.assert_allclose(traced.predict(X[1600:]), expected, rtol=1e-5)
+
 
 class AuthViewsTest(APITestCase):
     def setUp(self):
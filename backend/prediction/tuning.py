@@ -0,0 +1,297 @@
+import logging
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import TimeoutError as FutureTimeout, as_completed, wait
+from dataclasses import dataclass, field
+from functools import lru_cache
+import numpy as np
+from django.conf import settings
+from scipy.stats import loguniform, uniform
+from sklearn.model_selection import ParameterSampler
+
+# Hyperparameter search by successive halving.
+#
+# Random configurations (the defaults always among them) are all trained on
+# a small resource; the best 1/ETA of them move on to ETA times as much,
+# until one is left or the wall-clock budget runs out. The resource is
+# what each model family can grow without starting over:
+#   xgboost / lightgbm  – boosting rounds; a promoted trial continues its
+#                         booster (xgb_model / init_model) and every fit
+#                         early-stops on the validation rows, so a trial that
+#                         stopped is never trained further
+#   random_forest       – trees, added with warm_start
+#   everything else     – training rows (nested prefixes of one shuffle)
+#
+# Trials are scored on a validation slice of the training split, never on
+# the test split, which stays for the final report. Each rung runs on the
+# comparison process pool (prediction.compare); the arrays are written once
+# as .npy files that workers memory-map. When the budget runs out,
+# unstarted trials are cancelled, running ones get OVERRUN_SECONDS to
+# finish, and the best finished one wins. A trial that raises (e.g. a
+# configuration the library rejects) is dropped and counted. The
+# winner is then refitted through the regular pipeline (fit_model with
+# its params), so the tuned result has the same metrics, plots and
+# registry bundle as any other.
+
+logger = logging.getLogger(__name__)
+
+ETA = 3
+EARLY_STOPPING_ROUNDS = 20
+VALIDATION_FRACTION = 0.2
+MIN_ROWS = 100
+
+SEARCH_SPACES = {
+    'xgboost': {
+        'learning_rate': loguniform(0.01, 0.3),
+        'max_depth': [3, 4, 6, 8, 10],
+        'min_child_weight': [1, 3, 5, 10],
+        'subsample': uniform(0.6, 0.4),
+        'colsample_bytree': uniform(0.5, 0.5),
+        'reg_lambda': loguniform(0.1, 10),
+    },
+    'lightgbm': {
+        'learning_rate': loguniform(0.01, 0.3),
+        'num_leaves': [15, 31, 63, 127],
+        'min_child_samples': [5, 10, 20, 50],
+        'subsample': uniform(0.6, 0.4),
+        'subsample_freq': [1],
+        'colsample_bytree': uniform(0.5, 0.5),
+        'reg_lambda': loguniform(1e-3, 10),
+    },
+    'random_forest': {
+        'max_depth': [None, 8, 16, 32],
+        'min_samples_leaf': [1, 2, 5, 10],
+        'max_features': [1.0, 'sqrt', 0.5],
+    },
+    'decision_tree': {
+        'max_depth': [None, 4, 6, 8, 12, 16],
+        'min_samples_leaf': [1, 2, 5, 10, 20],
+        'max_features': [None, 'sqrt', 0.5],
+    },
+    'linear_regression': {
+        'fit_intercept': [True, False],
+        'positive': [False, True],
+    },
+    'pytorch_nn': {
+        'learning_rate': loguniform(1e-3, 3e-2),
+        'batch_size': [128, 256, 512],
+        'patience': [5, 10],
+    },
+}
+RESOURCES = {'xgboost': 'rounds', 'lightgbm': 'rounds', 'random_forest': 'trees'}
+MAX_ROUNDS = 1000
+MAX_TREES = 300
+# How long past the deadline a rung waits for trials already running.
+OVERRUN_SECONDS = 5
+
+
+def resolve_budget(value=None):
+    """Wall-clock budget in seconds from a request value; raises ValueError when out of range."""
+    if value in (None, ''):
+        return settings.TUNING_DEFAULT_SECONDS
+    try:
+        seconds = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("budget_seconds must be an integer.")
+    if not 1 <= seconds <= settings.TUNING_MAX_SECONDS:
+        raise ValueError(f"budget_seconds must be between 1 and {settings.TUNING_MAX_SECONDS}.")
+    return seconds
+
+
+def candidates(model_name, n, seed=42):
+    """`n` configurations for `model_name`: the defaults ({}) first, then random draws."""
+    space = SEARCH_SPACES[model_name]
+    grid_size = math.prod(len(v) if isinstance(v, list) else math.inf for v in space.values())
+    draws = list(ParameterSampler(space, n_iter=int(min(n - 1, grid_size)), random_state=seed))
+    return [{}] + [{k: (v.item() if isinstance(v, np.generic) else v) for k, v in d.items()} for d in draws]
+
+
+def schedule(model_name, n_configs, fit_rows):
+    """Resource per rung: ETA× more at each rung, the last one at the family's maximum."""
+    rungs = max(1, int(math.log(n_configs, ETA) + 1e-9) + 1)
+    kind = RESOURCES.get(model_name, 'rows')
+    top = {'rounds': MAX_ROUNDS, 'trees': MAX_TREES}.get(kind, fit_rows)
+    floor = MIN_ROWS if kind == 'rows' else 1
+    return kind, [max(floor, min(top, int(top / ETA ** (rungs - 1 - i)))) for i in range(rungs)]
+
+
+# ─── TRIALS ─────────────────────────────────────────────────
+
+@dataclass
+class Trial:
+    config: dict
+    rmse: float = math.inf
+    resource: int = 0
+    model: object = None       # kept for warm starts (rounds / trees)
+    rounds: int = None         # boosting: best number of rounds so far
+    stopped: bool = False      # boosting: early stopping fired, more rounds won't help
+    history: list = field(default_factory=list)
+
+
+@lru_cache(maxsize=2)
+def _arrays(directory):
+    return tuple(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+                 for name in ('X', 'y', 'X_val', 'y_val'))
+
+
+def advance(model_name, trial: Trial, resource, directory, threads):
+    """Train `trial` up to `resource` and score it on the validation rows; returns the trial."""
+    import lightgbm
+    from .compute import compute_slot
+    from .models import make_model
+
+    X, y, X_val, y_val = _arrays(directory)
+    kind = RESOURCES.get(model_name, 'rows')
+    with compute_slot(threads) as threads:
+        if kind == 'rounds':
+            done = trial.resource if trial.model is not None else 0
+            model = make_model(model_name, threads, trial.config)
+            model.set_params(n_estimators=resource - done)
+            if model_name == 'xgboost':
+                model.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+                previous = trial.model.get_booster() if trial.model is not None else None
+                model.fit(X, y, eval_set=[(X_val, y_val)], verbose=False, xgb_model=previous)
+                trained, trial.rounds = model.get_booster().num_boosted_rounds(), model.best_iteration + 1
+            else:
+                previous = trial.model.booster_ if trial.model is not None else None
+                model.fit(X, y, eval_set=[(X_val, y_val)], init_model=previous,
+                          callbacks=[lightgbm.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)])
+                trained = model.booster_.current_iteration()
+                trial.rounds = model.best_iteration_ or trained
+            trial.stopped = trained < resource
+        elif kind == 'trees':
+            model = trial.model or make_model(model_name, threads, dict(trial.config, warm_start=True))
+            model.set_params(n_estimators=resource, n_jobs=threads).fit(X, y)
+        else:
+            model = make_model(model_name, threads, trial.config).fit(X[:resource], y[:resource])
+        predictions = model.predict(X_val)
+
+    trial.rmse = float(np.sqrt(np.mean((predictions - y_val) ** 2)))
+    trial.resource = resource
+    trial.model = model if kind != 'rows' else None
+    trial.history.append({'resource': resource, 'rmse': round(trial.rmse, 4)})
+    return trial
+
+
+def _write_arrays(data, seed=42):
+    """Shuffle the training split, cut the validation rows off it and save both as .npy."""
+    order = np.random.default_rng(seed).permutation(len(data.X_train))
+    n_val = max(1, int(len(order) * VALIDATION_FRACTION))
+    X = data.X_train.to_numpy(dtype=np.float32)[order]
+    y = data.y_train.to_numpy(dtype=np.float64)[order]
+    directory = tempfile.mkdtemp(prefix='tune-')
+    for name, values in (('X', X[n_val:]), ('y', y[n_val:]), ('X_val', X[:n_val]), ('y_val', y[:n_val])):
+        np.save(os.path.join(directory, f"{name}.npy"), values)
+    return directory, len(order) - n_val
+
+
+def _run_rung(model_name, trials, resource, directory, deadline):
+    """
+    Advance every trial in the rung; returns (finished trials, number that
+    failed). Trials not finished shortly after `deadline` are dropped.
+    """
+    from .compare import compare_workers, get_compare_pool, threads_per_model
+
+    done, failed = [], 0
+    workers = min(compare_workers(), len(trials))
+    if workers <= 1:
+        for trial in trials:
+            if time.monotonic() >= deadline:
+                break
+            try:
+                done.append(advance(model_name, trial, resource, directory, threads_per_model(1)))
+            except Exception as e:
+                logger.warning("Tuning trial %s failed: %s", trial.config, e)
+                failed += 1
+        return done, failed
+
+    pool = get_compare_pool(compare_workers())
+    threads = threads_per_model(compare_workers())
+    futures = {pool.submit(advance, model_name, trial, resource, directory, threads): trial
+               for trial in trials}
+    try:
+        for _ in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+            pass
+    except FutureTimeout:
+        for future in futures:
+            future.cancel()
+        # trials already running can't be interrupted; keep what they produce in time
+        wait([f for f in futures if not f.cancelled()], timeout=OVERRUN_SECONDS)
+    for future, trial in futures.items():
+        if future.cancelled() or not future.done():
+            continue
+        try:
+            done.append(future.result())
+        except Exception as e:
+            logger.warning("Tuning trial %s failed: %s", trial.config, e)
+            failed += 1
+    return done, failed
+
+
+def tune(data, model_name, budget_seconds, progress=None, seed=42):
+    """
+    Successive halving for `model_name` on TrainingData `data` within
+    `budget_seconds`; returns (best params for make_model, tuning report).
+    """
+    start = time.monotonic()
+    deadline = start + budget_seconds
+    directory, fit_rows = _write_arrays(data, seed)
+    try:
+        configs = candidates(model_name, settings.TUNING_CANDIDATES, seed)
+        kind, resources = schedule(model_name, len(configs), fit_rows)
+        trials = [Trial(config) for config in configs]
+        rungs, best, default, exhausted, failed = [], None, None, False, 0
+        for i, resource in enumerate(resources):
+            if progress is not None:
+                progress(10 + 60 * i // len(resources), f"tuning rung {i + 1}/{len(resources)}")
+            ready = [t for t in trials if t.stopped]  # early-stopped boosters keep their score
+            finished, rung_failed = _run_rung(model_name, [t for t in trials if not t.stopped], resource,
+                                              directory, deadline)
+            failed += rung_failed
+            scored = ready + finished
+            scored.sort(key=lambda t: t.rmse)
+            default = next((t for t in scored if not t.config), default)
+            if scored:
+                best = scored[0] if best is None or scored[0].rmse <= best.rmse else best
+            rungs.append({'resource': resource, 'trials': len(scored), 'failed': rung_failed,
+                          'best_rmse': round(scored[0].rmse, 4) if scored else None})
+            if time.monotonic() >= deadline:
+                exhausted = i < len(resources) - 1 or len(scored) + rung_failed < len(trials)
+                break
+            trials = scored[:max(1, len(scored) // ETA)]
+            if not trials:
+                break
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    from .models import make_model
+
+    if best is None:
+        if failed and not exhausted:
+            raise ValueError(f"All {failed} tuning configurations failed to train.")
+        raise ValueError("The tuning budget ran out before any configuration was trained.")
+    params = dict(best.config)
+    if kind == 'rounds':
+        params['n_estimators'] = best.rounds
+    elif kind == 'trees':
+        # more trees never hurt a forest; a budget cut short must not leave fewer than the default
+        params['n_estimators'] = max(best.resource, make_model(model_name).n_estimators)
+    report = {
+        'budget_seconds': budget_seconds,
+        'seconds': round(time.monotonic() - start, 4),
+        'budget_exhausted': exhausted,
+        'resource': kind,
+        'eta': ETA,
+        'candidates': len(configs),
+        'failed_trials': failed,
+        'rungs': rungs,
+        'best_params': params,
+        'best_validation_rmse': round(best.rmse, 4),
+        'best_history': best.history,
+        # the default configuration, at the largest resource it reached
+        'default_validation_rmse': round(default.rmse, 4) if default is not None else None,
+    }
+    return params, report
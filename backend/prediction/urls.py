@@ -1,6 +1,8 @@
 from django.urls import path
 from .views import (
-    PredictAPIView, eda_view, train_model_view,
+    PredictAPIView, eda_view, eda_graph_view, train_model_view, training_job_view,
+    invalidate_training_cache_view, score_model_view, explain_model_view, compare_models_view, forecast_view,
+    tune_model_view,
     signup_view, whoami_view, GoogleLoginView 
 )
 from rest_framework_simplejwt.views import (
@@ -8,20 +10,30 @@ from rest_framework_simplejwt.views import (
 )
 from dj_rest_auth.registration.views import SocialLoginView
 from allauth.socialaccount.providers.google.views import GoogleOAuth2Adapter
-from database.views import save_result_view, get_saved_results, delete_result_view, edit_saved_result, download_saved_result, contact_form_view
+from database.views import save_result_view, get_saved_results, delete_result_view, edit_saved_result, download_saved_result, contact_form_view, blob_view, saved_result_detail
 from allauth.socialaccount.providers.oauth2.views import OAuth2CallbackView
 
 urlpatterns = [
     # APP 
     path('predict/', PredictAPIView.as_view(), name='predict'),
     path('predict/eda/', eda_view, name='eda'),
+    path('predict/eda/graphs/<int:result_id>/<path:graph_id>/', eda_graph_view, name='eda-graph'),
     path('predict/train/', train_model_view, name='train'),
+    path('predict/train/jobs/<int:job_id>/', training_job_view, name='train-job'),
+    path('predict/compare/', compare_models_view, name='compare-models'),
+    path('predict/tune/', tune_model_view, name='tune-model'),
+    path('predict/forecast/', forecast_view, name='forecast'),
+    path('predict/train/cache/invalidate/', invalidate_training_cache_view, name='train-cache-invalidate'),
+    path('predict/models/<int:result_id>/score/', score_model_view, name='score-model'),
+    path('predict/models/<int:result_id>/explain/', explain_model_view, name='explain-model'),
     # Database
     path('save-result/', save_result_view, name='save-result'),
     path('saved-results/', get_saved_results, name='get-saved-results'),
+    path('saved-results/<int:pk>/', saved_result_detail, name='saved-result-detail'),
     path('saved-results/delete/<int:result_id>/', delete_result_view, name='delete-result'),
     path('saved-results/edit/<int:pk>/', edit_saved_result),
     path('saved-results/download/<int:pk>/<str:file_type>/', download_saved_result, name='download-result-file'),
+    path('blobs/<str:digest>/', blob_view, name='blob'),
     # Contact Us
     path('contact/', contact_form_view, name='contact-form'),
     # auth
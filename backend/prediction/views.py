@@ -7,17 +7,30 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework import status, permissions
 import polars as pl
 from .utils import process_and_predict
-from .eda import generate_graphs
+from .eda import (
+    eda_statistics, generate_graphs, graph_manifest, render_graph,
+    prepare_eda_frame, infer_product_columns, load_eda_frame, plot_strata, stratified_sample,
+)
+from .spool import discard_spooled, spool_upload, find_spooled
+from .ingest import IngestLimitError, IngestStats, check_upload_size, detect_format, read_upload
+from .sketches import sketch_upload
+from .charts import CHART_JSON, CHART_PNG, beeswarm_chart, resolve_charts
+from .profiling import Trace, render_metrics
+from .serialization import sanitize_for_json
+from django.conf import settings
 import re
-import numpy as np
 import matplotlib
 matplotlib.use('Agg')  # Use a non-GUI backend for servers
-from .models import train_model_pipeline
-from database.models import SavedResult
+from .jobs import enqueue_comparison_job, enqueue_training_job, enqueue_tuning_job, serialize_job
+from .cache import invalidate_results
+from database.models import SavedResult, TrainingJob, TrainedModel
+from database.blobs import externalize_graphs, store_graph
+from django.urls import reverse
+from django.http import HttpResponse
 from .serializers import SignUpSerializer, UserSerializer
 from google.oauth2 import id_token
 from google.auth.transport import requests
-import datetime
+import time
 
 class PredictAPIView(APIView):
     parser_classes = [MultiPartParser]
@@ -28,44 +41,20 @@ class PredictAPIView(APIView):
             return Response({'error': 'No file uploaded'}, status=400)
 
         try:
-            df = pl.read_csv(file)
+            check_upload_size(file.size)
+            path, _ = spool_upload(file, transient=True)
+            try:
+                df, _ = read_upload(path)
+            finally:
+                discard_spooled(path)
             results = process_and_predict(df)
             return Response(results)
+        except IngestLimitError as e:
+            return Response({'error': str(e)}, status=413)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
 
-# ─── SANITIZE ───────────────────────────────────────────────
-
-def sanitize_for_json(data):
-    if isinstance(data, dict):
-        return {k: sanitize_for_json(v) for k, v in data.items()}
-
-    elif isinstance(data, list):
-        return [sanitize_for_json(i) for i in data]
-
-    elif isinstance(data, (datetime.date, datetime.datetime)):
-        return data.isoformat()
-
-    elif isinstance(data, (np.integer, np.int64, np.int32, np.int16, np.int8)):
-        return int(data)
-
-    elif isinstance(data, (np.floating, np.float64, np.float32)):
-        if np.isnan(data) or np.isinf(data):
-            return None
-        return float(data)
-
-    elif isinstance(data, tuple):
-        return [sanitize_for_json(i) for i in data]
-
-    elif isinstance(data, float):
-        if np.isnan(data) or np.isinf(data):
-            return None
-        return data
-
-    return data
-
-
 def inter_target_column(df: pl.DataFrame):
     """Try to detect the most likely target column eg., revenue, sales, profit."""
     target_keywords = ["revenue", "target", "sales", "income", "profit", "earning"]
@@ -76,7 +65,24 @@ def inter_target_column(df: pl.DataFrame):
     return None
 
 
+def debug_requested(request):
+    """`?debug=1` (or a `debug` form field) asks for profiling traces in the response."""
+    value = request.query_params.get('debug') or request.data.get('debug') or ''
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
 # ─── EDA ────────────────────────────────────────────────────
+# 'eager' renders every graph inline (base64); 'lazy' returns a manifest of
+# graph ids and renders each one via eda_graph_view when first requested.
+# `charts` (png / json) applies to both: json returns chart data
+# (prediction.charts) instead of images.
+EDA_GRAPH_MODES = ('eager', 'lazy')
+# 'exact' computes statistics on the loaded rows; 'approximate' reads them
+# from the upload's sketch (every row, with error bounds) and draws graphs
+# from a stratified sample; 'auto' is approximate above EDA_APPROX_ROWS rows.
+EDA_STATS_MODES = ('auto', 'exact', 'approximate')
+
+
 @api_view(['POST'])
 @parser_classes([MultiPartParser])
 @permission_classes([IsAuthenticated])
@@ -85,68 +91,169 @@ def eda_view(request):
     if not file:
         return Response({"error": "No file uploaded."}, status=400)
 
-    df = pl.read_csv(file)
+    graph_mode = request.data.get('graphs', 'eager')
+    if graph_mode not in EDA_GRAPH_MODES:
+        return Response({"error": f"graphs must be one of {', '.join(EDA_GRAPH_MODES)}."}, status=400)
+    stats_mode = request.data.get('stats', 'auto')
+    if stats_mode not in EDA_STATS_MODES:
+        return Response({"error": f"stats must be one of {', '.join(EDA_STATS_MODES)}."}, status=400)
+    try:
+        charts = resolve_charts(request.data.get('charts'))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    try:
+        check_upload_size(file.size)
+    except IngestLimitError as e:
+        return Response({"error": str(e)}, status=413)
+
+    trace = Trace('eda')
+    try:
+        eda_payload = _run_eda(request, file, graph_mode, stats_mode, charts, trace)
+    finally:
+        trace_dict = trace.finish()
+    if debug_requested(request):
+        eda_payload['trace'] = trace_dict
+    return Response(eda_payload)
 
-    # 1) date → month
-    date_column = None
-    for col in df.columns:
-        if 'date' in col.lower():
-            try:
-                df = df.with_columns([
-                    pl.col(col).str.strptime(pl.Datetime, strict=False).alias(col)
-                ])
-                df = df.with_columns([
-                    df[col].dt.month().alias("month")
-                ])
-                date_column = col
-                break
-            except Exception:
-                continue
 
-    # 2) infer target & product columns
-    target_col = inter_target_column(df)
-    product_name_col = next((c for c in df.columns if 'product' in c.lower() and 'name' in c.lower()), None)
-    product_type_col = next((c for c in df.columns if 'product' in c.lower() and ('type' in c.lower() or 'category' in c.lower())), None)
+def _run_eda(request, file, graph_mode, stats_mode, charts, trace):
+    # Profile a bounded sample streamed from the spooled upload; the spool
+    # also lets lazy graphs be rendered later on request. The upload is also
+    # sketched (prediction.sketches) – every row, and an upload that appends
+    # to the previous file of the same name only sketches the new rows.
+    # Statistics come from the sketch when approximate, and also when it is
+    # still exact or was only merged/reused (append, unchanged) – recomputing
+    # them on the sample would undo the incremental refresh. Lazy graphs need
+    # no rows now, so in that case the sample isn't read at all.
+    trace.mark('ingest')
+    path, digest = spool_upload(file)
+    filename = file.name
+    saved_obj = SavedResult.objects.filter(owner=request.user, file_name=filename, model_name='').first()
 
-    # Convert Polars → Pandas for some EDA ops
-    df_pd = df.to_pandas()
+    sketch, sketch_info = None, None
+    if settings.EDA_INCREMENTAL or stats_mode != 'exact':
+        sketch, sketch_info = sketch_upload(path, digest, saved_obj.eda_sketch if saved_obj else None)
+    approximate = sketch is not None and (
+        stats_mode == 'approximate' or (stats_mode == 'auto' and sketch.rows > settings.EDA_APPROX_ROWS))
+    from_sketch = approximate or (sketch is not None and stats_mode == 'auto' and (
+        sketch.exact or sketch_info['mode'] != 'full'))
+
+    if from_sketch and graph_mode == 'lazy':
+        df, date_column = sketch.empty_frame(), sketch.date_column
+        ingest_stats = IngestStats(format=detect_format(path), rows=sketch.rows, columns=len(sketch.raw_schema),
+                                   bytes=sketch.source['bytes'], rows_loaded=0, sampled=False,
+                                   truncated=False, seconds=sketch_info['seconds'])
+    else:
+        df, ingest_stats = read_upload(path, sample_rows=settings.EDA_SAMPLE_ROWS)
+        # 1) date → month
+        df, date_column = prepare_eda_frame(df)
 
-    # 3) build payload
+    # 2) infer target & product columns
+    trace.mark('stats')
+    target_col = inter_target_column(df)
+    product_name_col, product_type_col = infer_product_columns(df)
+
+    # 3) build payload – statistics in one Polars query (or from the
+    # sketch); pandas is only materialized (inside generate_graphs) if
+    # graphs are drawn now
+    if from_sketch:
+        approximation = {'mode': 'exact' if sketch.exact and not approximate else 'approximate',
+                         'rows': sketch.rows,
+                         'error_bounds': sketch.error_bounds()}
+    else:
+        approximation = {'mode': 'exact', 'rows': df.height}
+    if approximate:
+        strata = plot_strata(df, product_type_col)
+        approximation.update(plot_rows=settings.EDA_PLOT_ROWS, plot_strata=strata)
     eda_payload = {
-        'shape': df.shape,
+        'shape': (ingest_stats.rows, df.width),
         'columns': df.columns,
         'dtypes': {c: str(df[c].dtype) for c in df.columns},
-        'missing_values': df.null_count().to_dict(as_series=False),
-        'descriptive_stats': df_pd.describe(include='all').fillna('').to_dict(),
-        'correlation_matrix': df_pd.corr(numeric_only=True).round(2).to_dict(),
-        'unique_values': {c: df[c].n_unique() for c in df.columns},
-        'example_rows': df.head(5).to_pandas().to_dict(orient='records'),
+        **(sketch.statistics() if from_sketch else eda_statistics(df)),
         'inferred_target': target_col,
         'date_column_used': date_column,
         'month_feature_added': 'month' in df.columns,
-        'graphs': generate_graphs(df_pd, product_name_col, product_type_col)
+        'ingest': ingest_stats.as_dict(),
+        'approximation': approximation,
+        'sketch': sketch_info,
+        'charts': charts,
     }
-    eda_payload = sanitize_for_json(eda_payload)
+    trace.mark('graphs')
+    if graph_mode == 'lazy':
+        eda_payload['graphs'] = {}
+        eda_payload['graph_manifest'] = graph_manifest(df, product_name_col, product_type_col)
+        eda_payload['dataset_hash'] = digest
+    else:
+        plot_df = stratified_sample(df, strata, settings.EDA_PLOT_ROWS) if approximate else df
+        eda_payload['graphs'] = generate_graphs(plot_df, product_name_col, product_type_col, trace=trace,
+                                                charts=charts)
+    trace.mark('persist')
+    eda_payload = externalize_graphs(sanitize_for_json(eda_payload))
+    eda_sketch = sketch.to_dict() if sketch is not None else None
 
     # 4) save/update with owner=request.user
-    filename = file.name
-    saved_obj = SavedResult.objects.filter(owner=request.user, file_name=filename, model_name='').first()
     if saved_obj:
         saved_obj.eda_result = eda_payload
+        saved_obj.eda_sketch = eda_sketch
         saved_obj.inferred_target = target_col or saved_obj.inferred_target
-        saved_obj.data_shape = f"{df.shape[0]} rows, {df.shape[1]} columns"
+        saved_obj.data_shape = f"{ingest_stats.rows} rows, {df.width} columns"
         saved_obj.save()
     else:
-        SavedResult.objects.create(
+        saved_obj = SavedResult.objects.create(
             owner=request.user,
             file_name=filename,
             model_name='',
             eda_result=eda_payload,
+            eda_sketch=eda_sketch,
             inferred_target=target_col or '',
-            data_shape=f"{df.shape[0]} rows, {df.shape[1]} columns"
+            data_shape=f"{ingest_stats.rows} rows, {df.width} columns"
         )
 
-    return Response(eda_payload)
+    if graph_mode == 'lazy':
+        eda_payload = dict(eda_payload, result_id=saved_obj.id, graph_urls={
+            graph_id: reverse('eda-graph', args=[saved_obj.id, graph_id])
+            for graph_id in eda_payload['graph_manifest']
+        })
+    return eda_payload
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def eda_graph_view(request, result_id, graph_id):
+    """Render one EDA graph from a lazy-mode result on first request, then serve it from the row."""
+    saved_obj = SavedResult.objects.filter(pk=result_id, owner=request.user).defer('eda_sketch').first()
+    if not saved_obj:
+        return Response({'error': 'Not found or not yours'}, status=404)
+
+    eda_result = saved_obj.eda_result or {}
+    graphs = eda_result.get('graphs') or {}
+    if graph_id in graphs:
+        return Response({'graph_id': graph_id, 'graph': graphs[graph_id], 'cached': True})
+
+    if graph_id not in eda_result.get('graph_manifest', []):
+        return Response({'error': f"Unknown graph '{graph_id}'"}, status=404)
+
+    path = find_spooled(eda_result.get('dataset_hash'))
+    if not path:
+        return Response({'error': 'Dataset is no longer available; re-run EDA.'}, status=410)
+
+    plot_rows = (eda_result.get('approximation') or {}).get('plot_rows')
+    df_pd, product_name_col, product_type_col = load_eda_frame(path, plot_rows)
+    try:
+        graph = store_graph(render_graph(df_pd, graph_id, product_name_col, product_type_col,
+                                         eda_result.get('charts', CHART_PNG)))
+    except KeyError:
+        # The manifest may come from the sketch's full-file schema, while the
+        # sample read here can infer another dtype, so the graph ids differ.
+        return Response({'error': f"Graph '{graph_id}' no longer matches the dataset; re-run EDA."},
+                        status=410)
+
+    graphs[graph_id] = graph
+    eda_result['graphs'] = graphs
+    saved_obj.eda_result = eda_result
+    saved_obj.save(update_fields=['eda_result'])
+    return Response({'graph_id': graph_id, 'graph': graph, 'cached': False})
 
 
 # ─── TRAIN ──────────────────────────────────────────────────
@@ -154,39 +261,305 @@ def eda_view(request):
 @parser_classes([MultiPartParser])
 @permission_classes([IsAuthenticated])
 def train_model_view(request):
+    """
+    Enqueue a training job; poll `status_url` for progress and the result.
+    `diagnostics` (fast / standard / full) picks how much is computed
+    beyond the metrics; `sampling` picks the training sample strategy
+    (prediction.sampling); `charts` (png / json) picks rendered images or
+    chart data (prediction.charts).
+    """
     file = request.FILES.get('file')
     if not file:
         return Response({'error': 'No file uploaded'}, status=400)
 
-    df = pl.read_csv(file)
     model_name = request.data.get('model', 'random_forest')
+    try:
+        job = enqueue_training_job(request.user, file, model_name, request.data.get('diagnostics'),
+                                   request.data.get('sampling'), request.data.get('charts'))
+    except IngestLimitError as e:
+        return Response({'error': str(e)}, status=413)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    payload = serialize_job(job)
+    payload['status_url'] = reverse('train-job', args=[job.id])
+    # Cache hits complete synchronously; everything else is still queued.
+    if job.status == TrainingJob.STATUS_DONE:
+        return Response(payload, status=status.HTTP_200_OK)
+    return Response(payload, status=status.HTTP_202_ACCEPTED)
 
-    result = train_model_pipeline(df, model_name)
-    result = sanitize_for_json(result)
 
-    filename = file.name
-    saved_obj = SavedResult.objects.filter(
-        owner=request.user,
-        file_name=filename,
-        model_name=model_name
-    ).first()
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+@permission_classes([IsAuthenticated])
+def compare_models_view(request):
+    """
+    Enqueue one job that fits several models (`models`, default all) on a
+    single parse of the upload; the finished job carries a leaderboard and
+    each model's result is saved as its own SavedResult.
+    """
+    from .models import MODEL_NAMES
 
-    if saved_obj:
-        saved_obj.model_result = result
-        saved_obj.inferred_target = result.get('target_column') or saved_obj.inferred_target
-        saved_obj.data_shape = f"{df.shape[0]} rows, {df.shape[1]} columns"
-        saved_obj.save()
-    else:
-        SavedResult.objects.create(
-            owner=request.user,
-            file_name=filename,
-            model_name=model_name,
-            model_result=result,
-            inferred_target=result.get('target_column') or '',
-            data_shape=f"{df.shape[0]} rows, {df.shape[1]} columns"
-        )
+    file = request.FILES.get('file')
+    if not file:
+        return Response({'error': 'No file uploaded'}, status=400)
 
-    return Response(result)
+    model_names = [name.strip() for value in request.data.getlist('models')
+                   for name in value.split(',') if name.strip()] or list(MODEL_NAMES)
+    try:
+        job = enqueue_comparison_job(request.user, file, model_names, request.data.get('diagnostics'),
+                                     request.data.get('sampling'), request.data.get('charts'))
+    except IngestLimitError as e:
+        return Response({'error': str(e)}, status=413)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    payload = serialize_job(job)
+    payload['status_url'] = reverse('train-job', args=[job.id])
+    if job.status == TrainingJob.STATUS_DONE:
+        return Response(payload, status=status.HTTP_200_OK)
+    return Response(payload, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+@permission_classes([IsAuthenticated])
+def tune_model_view(request):
+    """
+    Enqueue a hyperparameter search (successive halving, prediction.tuning)
+    for `model` within `budget_seconds` of wall-clock time. The finished
+    job's result is the tuned model, saved as `<model>_tuned`, with a
+    `tuning` block describing the search.
+    """
+    file = request.FILES.get('file')
+    if not file:
+        return Response({'error': 'No file uploaded'}, status=400)
+
+    try:
+        job = enqueue_tuning_job(request.user, file, request.data.get('model', 'random_forest'),
+                                 request.data.get('budget_seconds'), request.data.get('diagnostics'),
+                                 request.data.get('sampling'), request.data.get('charts'))
+    except IngestLimitError as e:
+        return Response({'error': str(e)}, status=413)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    payload = serialize_job(job)
+    payload['status_url'] = reverse('train-job', args=[job.id])
+    if job.status == TrainingJob.STATUS_DONE:
+        return Response(payload, status=status.HTTP_200_OK)
+    return Response(payload, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def training_job_view(request, job_id):
+    job = (TrainingJob.objects
+           .select_related('saved_result')
+           .filter(pk=job_id, owner=request.user)
+           .first())
+    if not job:
+        return Response({'error': 'Not found or not yours'}, status=404)
+    return Response(serialize_job(job, debug=debug_requested(request)))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def invalidate_training_cache_view(request):
+    """
+    Drop cached results for a dataset hash (optionally one model). Users may
+    only clear datasets they trained on themselves; staff may clear any, or all.
+    """
+    digest = request.data.get('dataset_hash')
+    model_name = request.data.get('model')
+    if not request.user.is_staff:
+        if not digest:
+            return Response({'error': 'dataset_hash is required'}, status=400)
+        if not TrainingJob.objects.filter(owner=request.user, dataset_digest=digest).exists():
+            return Response({'error': 'No training job of yours used this dataset'}, status=404)
+
+    removed = invalidate_results(digest, model_name)
+    return Response({'removed': removed})
+
+# ─── SCORE ──────────────────────────────────────────────────
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+@permission_classes([IsAuthenticated])
+def score_model_view(request, result_id):
+    """Score an uploaded dataset with the model trained for SavedResult `result_id`."""
+    from .registry import get_bundle
+
+    trained = (TrainedModel.objects
+               .select_related('saved_result')
+               .filter(saved_result_id=result_id, saved_result__owner=request.user)
+               .first())
+    if not trained:
+        return Response({'error': 'No trained model for this result'}, status=404)
+
+    file = request.FILES.get('file')
+    if not file:
+        return Response({'error': 'No file uploaded'}, status=400)
+
+    try:
+        check_upload_size(file.size)
+    except IngestLimitError as e:
+        return Response({'error': str(e)}, status=413)
+
+    start = time.perf_counter()
+    path, _ = spool_upload(file, transient=True)
+    try:
+        df, ingest_stats = read_upload(path, max_rows=settings.SCORING_MAX_ROWS)
+    finally:
+        discard_spooled(path)
+    if ingest_stats.truncated:
+        # Predictions are returned inline, so the response grows with the upload.
+        return Response({'error': f"Scoring is limited to {settings.SCORING_MAX_ROWS} rows per request; "
+                                  f"split the file."}, status=413)
+    try:
+        predictions = get_bundle(trained.artifact).predict(df)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    return Response({
+        'result_id': result_id,
+        'model_name': trained.model_name,
+        'target_column': trained.target_column,
+        'rows': len(predictions),
+        'predictions': sanitize_for_json(predictions.tolist()),
+        'seconds': round(time.perf_counter() - start, 4),
+        'ingest': ingest_stats.as_dict(),
+    })
+
+
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+@permission_classes([IsAuthenticated])
+def explain_model_view(request, result_id):
+    """
+    SHAP attributions of the model trained for SavedResult `result_id` on an
+    uploaded dataset (a sample of at most SHAP_SAMPLE_ROWS rows), plus a
+    beeswarm plot (or its chart data with charts=json). Cached per (model,
+    dataset, chart format).
+    """
+    from .compute import compute_slot
+    from .explain import cache_explanation, explain, get_cached_explanation, plot_beeswarm
+    from .registry import get_bundle
+
+    trained = (TrainedModel.objects
+               .filter(saved_result_id=result_id, saved_result__owner=request.user)
+               .first())
+    if not trained:
+        return Response({'error': 'No trained model for this result'}, status=404)
+
+    file = request.FILES.get('file')
+    if not file:
+        return Response({'error': 'No file uploaded'}, status=400)
+
+    try:
+        charts = resolve_charts(request.data.get('charts'))
+        check_upload_size(file.size)
+    except IngestLimitError as e:
+        return Response({'error': str(e)}, status=413)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    start = time.perf_counter()
+    path, digest = spool_upload(file, transient=True)
+    rows = settings.SHAP_SAMPLE_ROWS
+    try:
+        payload = get_cached_explanation(trained.artifact, digest, rows, charts)
+        cached = payload is not None
+        if not cached:
+            df, _ = read_upload(path, sample_rows=rows)
+    finally:
+        discard_spooled(path)
+    if not cached:
+        bundle = get_bundle(trained.artifact)
+        try:
+            X = bundle.transform(df).to_pandas()
+            with compute_slot():
+                attributions = explain(bundle.model, bundle.model_name, X)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        payload = sanitize_for_json(attributions.as_dict())
+        if charts == CHART_JSON:
+            payload['beeswarm'] = beeswarm_chart(attributions)
+        else:
+            payload['beeswarm'] = store_graph(plot_beeswarm(attributions))
+        cache_explanation(trained.artifact, digest, rows, payload, charts)
+
+    return Response(dict(
+        payload,
+        result_id=result_id,
+        model_name=trained.model_name,
+        cached=cached,
+        seconds=round(time.perf_counter() - start, 4),
+    ))
+
+
+# ─── FORECAST ───────────────────────────────────────────────
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+@permission_classes([IsAuthenticated])
+def forecast_view(request):
+    """
+    Multi-step forecast of the target over the upload's date axis, with
+    backtest accuracy and prediction intervals (prediction.forecasting).
+    Options: horizon, frequency, model, coverage, date, target, group.
+    Cached per (dataset, options) and saved as the file's 'forecast' result.
+    """
+    from .forecasting import cache_forecast, forecast, get_cached_forecast, parse_spec
+    from .ingest import scan_upload
+    from .jobs import persist_model_result
+
+    file = request.FILES.get('file')
+    if not file:
+        return Response({'error': 'No file uploaded'}, status=400)
+    try:
+        spec = parse_spec(request.data)
+        check_upload_size(file.size)
+    except IngestLimitError as e:
+        return Response({'error': str(e)}, status=413)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    trace = Trace('forecast')
+    try:
+        trace.mark('ingest')
+        path, digest = spool_upload(file)
+        payload = get_cached_forecast(spec, digest)
+        cached = payload is not None
+        if not cached:
+            try:
+                payload = forecast(scan_upload(path), spec, trace=trace)
+            except (ValueError, pl.exceptions.PolarsError) as e:
+                return Response({'error': str(e)}, status=400)
+            trace.mark('persist')
+            payload = externalize_graphs(sanitize_for_json(payload))
+            cache_forecast(spec, digest, payload)
+        history = payload['history']
+        saved = persist_model_result(request.user, file.name, 'forecast', payload,
+                                     f"{history['periods']} periods, {history['series']} series")
+    finally:
+        trace_dict = trace.finish()
+
+    payload = dict(payload, result_id=saved.id, cached=cached)
+    if debug_requested(request):
+        payload['trace'] = trace_dict
+    return Response(payload)
+
+# ─── METRICS ────────────────────────────────────────────────
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint for pipeline stage metrics (plain Django view).
+    Disabled (404) unless METRICS_TOKEN is set; scrapes must send it as a Bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=404)
+    if request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # ─── SIGNUP / WHOAMI ──────────────────────────────────────────────────────────
 
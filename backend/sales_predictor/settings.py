@@ -65,6 +65,10 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'prediction.serialization.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 
@@ -208,4 +212,120 @@ SOCIALACCOUNT_PROVIDERS = {
 }
 
 LOGIN_REDIRECT_URL        = '/'
-ACCOUNT_LOGOUT_REDIRECT_URL = '/'
\ No newline at end of file
+ACCOUNT_LOGOUT_REDIRECT_URL = '/'
+
+# Uploads & training jobs
+# Uploaded datasets are spooled to disk (content-addressed by SHA-256) so that
+# training jobs can be picked up by the `run_training_worker` process pool.
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR', os.path.join(BASE_DIR, 'media', 'uploads'))
+# The training worker sweeps spooled uploads (and decompressed copies) older
+# than this, except those of queued / running jobs; `manage.py sweep_uploads`
+# does the same by hand. Lazy EDA graphs of a swept upload answer 410.
+UPLOAD_SPOOL_MAX_AGE_HOURS = float(os.getenv('UPLOAD_SPOOL_MAX_AGE_HOURS', '24'))
+TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', '2'))
+TRAINING_POLL_INTERVAL = float(os.getenv('TRAINING_POLL_INTERVAL', '1.0'))
+# A job still `running` this long after it started is assumed orphaned (its
+# worker was killed) and marked failed by the next worker housekeeping pass.
+TRAINING_JOB_TIMEOUT_MINUTES = float(os.getenv('TRAINING_JOB_TIMEOUT_MINUTES', '60'))
+# Model comparison jobs fit up to this many models at once, each in its own
+# spawned process with cpu_count // COMPARE_WORKERS threads (1 = serial).
+COMPARE_WORKERS = int(os.getenv('COMPARE_WORKERS', str(min(6, os.cpu_count() or 1))))
+# Hyperparameter tuning (prediction.tuning): wall-clock budget when the
+# request doesn't give one, the most a request may ask for, and how many
+# configurations the first successive-halving rung starts with.
+TUNING_DEFAULT_SECONDS = int(os.getenv('TUNING_DEFAULT_SECONDS', '60'))
+TUNING_MAX_SECONDS = int(os.getenv('TUNING_MAX_SECONDS', '900'))
+TUNING_CANDIDATES = int(os.getenv('TUNING_CANDIDATES', '27'))
+# CPU budget (prediction.compute): training, forecasting and SHAP share
+# COMPUTE_CORES cores (0 = all of them) across every process on the host,
+# one lock file per core in COMPUTE_LOCK_DIR. A call asks for
+# COMPUTE_JOB_THREADS (0 = cores / TRAINING_WORKERS), gets what is free and
+# waits when every core is taken.
+COMPUTE_CORES = int(os.getenv('COMPUTE_CORES', '0'))
+COMPUTE_JOB_THREADS = int(os.getenv('COMPUTE_JOB_THREADS', '0'))
+COMPUTE_LOCK_DIR = os.getenv('COMPUTE_LOCK_DIR', os.path.join(BASE_DIR, 'media', 'compute'))
+COMPUTE_POLL_INTERVAL = float(os.getenv('COMPUTE_POLL_INTERVAL', '0.05'))
+# Training sample (prediction.sampling): the default strategy (none / uniform /
+# stratified / time / progressive) and the row budget – as many rows as the
+# slowest model in the job fits in about SAMPLING_FIT_SECONDS at its measured
+# throughput, clamped to [SAMPLING_MIN_ROWS, SAMPLING_MAX_ROWS].
+SAMPLING_STRATEGY = os.getenv('SAMPLING_STRATEGY', 'uniform')
+SAMPLING_FIT_SECONDS = float(os.getenv('SAMPLING_FIT_SECONDS', '5'))
+SAMPLING_MIN_ROWS = int(os.getenv('SAMPLING_MIN_ROWS', '5000'))
+SAMPLING_MAX_ROWS = int(os.getenv('SAMPLING_MAX_ROWS', '200000'))
+
+# Ingestion limits (0 = unlimited). Oversized uploads are rejected with 413;
+# files longer than INGEST_MAX_ROWS are read up to the cap. EDA profiles a
+# uniform sample of at most EDA_SAMPLE_ROWS rows, streamed in batches.
+INGEST_MAX_BYTES = int(os.getenv('INGEST_MAX_BYTES', str(2 * 1024 ** 3)))
+INGEST_MAX_ROWS = int(os.getenv('INGEST_MAX_ROWS', '0'))
+INGEST_BATCH_ROWS = int(os.getenv('INGEST_BATCH_ROWS', '50000'))
+EDA_SAMPLE_ROWS = int(os.getenv('EDA_SAMPLE_ROWS', '200000'))
+# Uploads are summarized by mergeable sketches over every row, stored with
+# the result; re-uploading a CSV that only gained appended rows sketches just
+# the new rows (prediction.sketches).
+EDA_INCREMENTAL = os.getenv('EDA_INCREMENTAL', 'True') == 'True'
+# Above EDA_APPROX_ROWS rows, EDA defaults to approximate statistics (from
+# the sketch, with error bounds) and graphs drawn from a stratified sample of
+# at most EDA_PLOT_ROWS rows; requests can ask for stats=exact/approximate.
+EDA_APPROX_ROWS = int(os.getenv('EDA_APPROX_ROWS', '1000000'))
+EDA_PLOT_ROWS = int(os.getenv('EDA_PLOT_ROWS', '20000'))
+
+# Forecasting (prediction.forecasting): default / maximum horizon in periods
+# and the number of time-ordered backtest folds behind the accuracy figures
+# and prediction intervals.
+FORECAST_DEFAULT_HORIZON = int(os.getenv('FORECAST_DEFAULT_HORIZON', '12'))
+FORECAST_MAX_HORIZON = int(os.getenv('FORECAST_MAX_HORIZON', '366'))
+FORECAST_FOLDS = int(os.getenv('FORECAST_FOLDS', '3'))
+
+# Graph rendering: figures are fanned out to this many spawned processes
+# (1 = render serially in the calling process).
+GRAPH_RENDER_WORKERS = int(os.getenv('GRAPH_RENDER_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Default graph format when a request doesn't pass `charts`: 'png' renders
+# images, 'json' returns chart data for the client to draw
+# (prediction.charts). Exports rasterize chart data on demand.
+CHART_FORMAT = os.getenv('CHART_FORMAT', 'png')
+
+# Content-addressed training result cache (diskcache, LRU, size-bounded)
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'True') == 'True'
+RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', os.path.join(BASE_DIR, 'media', 'cache', 'results'))
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Trained-model registry: scoring batch size, the most rows one scoring
+# request may send (predictions come back inline; 413 beyond it) and how many
+# deserialized models each process keeps hot.
+SCORING_BATCH_ROWS = int(os.getenv('SCORING_BATCH_ROWS', '100000'))
+SCORING_MAX_ROWS = int(os.getenv('SCORING_MAX_ROWS', '1000000'))
+MODEL_CACHE_SIZE = int(os.getenv('MODEL_CACHE_SIZE', '8'))
+# How the pytorch_nn model runs at predict time (prediction.nn): eager,
+# torchscript (traced on first use) or compile (torch.compile).
+NN_INFERENCE = os.getenv('NN_INFERENCE', 'eager')
+
+# Training diagnostics tier when a request doesn't pick one: fast (metrics
+# only), standard (+ cheap plots) or full (+ learning curve and SHAP). SHAP
+# explains at most SHAP_SAMPLE_ROWS rows; models without a tree explainer
+# use SHAP_BACKGROUND_ROWS k-means centroids as background.
+DEFAULT_DIAGNOSTICS = os.getenv('DEFAULT_DIAGNOSTICS', 'standard')
+SHAP_SAMPLE_ROWS = int(os.getenv('SHAP_SAMPLE_ROWS', '200'))
+SHAP_BACKGROUND_ROWS = int(os.getenv('SHAP_BACKGROUND_ROWS', '100'))
+
+# Blob store for graph PNGs (content-addressed; SavedResult JSON keeps refs)
+BLOB_STORE_BACKEND = os.getenv('BLOB_STORE_BACKEND', 'database.blobs.FileSystemBlobStore')
+BLOB_STORE_OPTIONS = {
+    'root': os.getenv('BLOB_STORE_ROOT', os.path.join(BASE_DIR, 'media', 'blobs')),
+}
+# Trained models (pickled prediction.registry bundles) go to a separate store
+# of the same kind, which no URL serves.
+ARTIFACT_STORE_BACKEND = os.getenv('ARTIFACT_STORE_BACKEND', 'database.blobs.FileSystemBlobStore')
+ARTIFACT_STORE_OPTIONS = {
+    'root': os.getenv('ARTIFACT_STORE_ROOT', os.path.join(BASE_DIR, 'media', 'artifacts')),
+}
+
+# Profiling: per-stage traces are logged and aggregated into Prometheus
+# metrics (shared by web + worker processes) served at /metrics, which
+# requires `Authorization: Bearer <METRICS_TOKEN>` and is off while
+# METRICS_TOKEN is unset.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(BASE_DIR, 'media', 'cache', 'metrics'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
@@ -16,11 +16,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import include, path
-from prediction.views import PredictAPIView
+from prediction.views import PredictAPIView, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('prediction.urls')),
+    path('metrics', metrics_view, name='metrics'),
     # dj-rest-auth core endpoints (login/logout/password reset, etc.)
     path('api/auth/', include('dj_rest_auth.urls')),
 
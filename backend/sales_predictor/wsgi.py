@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sales_predictor.settings')
 
 application = get_wsgi_application()
+
+# Start the graph rendering pool now (matplotlib/seaborn pre-imported in each
+# worker) so the first EDA request doesn't pay the process start-up cost.
+from prediction.rendering import warm_render_pool  # noqa: E402
+warm_render_pool()
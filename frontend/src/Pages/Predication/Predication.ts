@@ -114,7 +114,11 @@ async function handleTrain() {
     method: "POST",
     body: formData
   });
-  const data = await res.json();
+  let data = await res.json();
+  // Training runs as a background job: poll until it finishes.
+  if (data.job_id) {
+    data = await waitForTrainingJob(data.status_url);
+  }
   lastModelResult = data;
 
   if (data.error) {
@@ -126,6 +130,18 @@ async function handleTrain() {
   }
 }
 
+async function waitForTrainingJob(statusUrl: string, intervalMs = 2000, timeoutMs = 30 * 60 * 1000): Promise<any> {
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    const res = await AuthService.fetchWithAuth(`${API_URL}${statusUrl}`);
+    const job = await res.json();
+    if (job.status === 'failed' || !job.status) return { error: job.error || 'Training failed.' };
+    if (job.status === 'done') return job.result || {};
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+  return { error: 'Training is taking too long; check the job again later.' };
+}
+
 async function handleSaveResult() {
   if (!lastEDAResult && !lastModelResult) {
     showToast("Generate EDA or train a model first before saving.", "error");
@@ -269,6 +285,13 @@ async function downloadResult(id: number, fileType: 'json' | 'csv' | 'xlsx' = 'j
 // ——————————————————————————————————————————————————————————————————————————
 // (You can pull out these render helpers to reduce duplication.)
 
+// Graphs are blob references ({ blob, url }) or, for older results, raw base64.
+function graphSrc(graph: any) {
+  return graph && typeof graph === 'object'
+    ? `${API_URL}${graph.url}`
+    : `data:image/png;base64,${graph}`;
+}
+
 function renderEDAOutput(data: any) {
   return `
     <h3>EDA Report</h3>
@@ -292,9 +315,9 @@ function renderEDAOutput(data: any) {
     <h4>Graphs</h4>
     ${
       data.graphs && typeof data.graphs === 'object'
-        ? Object.entries(data.graphs).map(([title, b64]) =>
+        ? Object.entries(data.graphs).map(([title, graph]) =>
             `<p><strong>${title}</strong></p>
-             <img src="data:image/png;base64,${b64}" style="max-width:100%; margin-top:1rem;" />`
+             <img src="${graphSrc(graph)}" style="max-width:100%; margin-top:1rem;" />`
           ).join('')
         : '<p>No graphs available</p>'
     }
@@ -312,11 +335,11 @@ function renderTrainOutput(data: any) {
     shap_summary: 'SHAP Summary'
   };
 
-  const graphHtml = Object.entries(diagnosticGraphs).map(([key, b64]) => {
+  const graphHtml = Object.entries(diagnosticGraphs).map(([key, graph]) => {
     const title = graphTitles[key] || key;
     return `
       <h4>${title}</h4>
-      <img src="data:image/png;base64,${b64}" alt="${title}" style="max-width:100%; margin-top:1rem;" />
+      <img src="${graphSrc(graph)}" alt="${title}" style="max-width:100%; margin-top:1rem;" />
     `;
   }).join('');
 
@@ -329,9 +352,10 @@ function renderTrainOutput(data: any) {
     <p><strong>R² Score:</strong> ${data.r2_score}</p>
     <p><strong>Sample Predictions:</strong> ${Array.isArray(data.sample_predictions) ? data.sample_predictions.join(', ') : 'N/A'}</p>
     ${
-      data.forecast_plot_base64
-        ? `<h4>Forecast Plot</h4>
-           <img src="data:image/png;base64,${data.forecast_plot_base64}" style="max-width:100%; margin-top:1rem;" />`
+      data.forecast_plot || data.forecast_plot_base64
+        ? `<h4>Predicted ${data.target_column} by Month</h4>
+           <p>Other features held at their median. This is not a forecast; use /api/predict/forecast/ for one.</p>
+           <img src="${graphSrc(data.forecast_plot || data.forecast_plot_base64)}" style="max-width:100%; margin-top:1rem;" />`
         : ''
     }
     ${graphHtml}